@@ -1,118 +1,111 @@
 """Analytics API endpoints."""
 
+import heapq
+
 from fastapi import APIRouter, HTTPException
-from app.services.db import get_db
+from app.models.schemas import DistrictAnalytics, StateAnalytics
+from app.services.db import fetch_all_async, get_async_db
+from app.services.response_cache import invalidate_responses, response_cache_stats
 
 router = APIRouter()
 
 
-@router.get("/district/{district_id}")
+@router.get("/district/{district_id}", response_model=DistrictAnalytics)
 async def district_analytics(district_id: int):
-    """Get analytics for a specific district."""
-    db = get_db()
-
-    # District info
-    district = db.table("si_districts").select("*").eq("id", district_id).single().execute()
-    if not district.data:
+    """Get analytics for a specific district.
+
+    Aggregation runs in the database (si_district_analytics RPC); only the
+    totals and per-level / per-infra-type counts are transferred.
+    """
+    db = get_async_db()
+    stats = (await db.rpc("si_district_analytics", {"p_district_id": district_id}).execute()).data
+    if not stats:
         raise HTTPException(status_code=404, detail="District not found")
 
-    # Schools in district
-    schools = db.table("si_schools_view").select("*").eq("district_id", district_id).execute()
-    school_list = schools.data or []
-
-    # Demand plans
-    demands = db.table("si_demand_plans_view").select("*").eq("district_id", district_id).execute()
-    demand_list = demands.data or []
-
-    # Compute metrics
-    total_enrolment = sum(s.get("total_enrolment", 0) or 0 for s in school_list)
-    avg_enrolment = total_enrolment / max(len(school_list), 1)
-
-    priority_dist = {}
-    for s in school_list:
-        level = s.get("priority_level", "UNKNOWN") or "UNKNOWN"
-        priority_dist[level] = priority_dist.get(level, 0) + 1
-
-    infra_gaps = {}
-    total_physical = 0
-    total_financial = 0.0
-    for d in demand_list:
-        itype = d.get("infra_type", "OTHER")
-        infra_gaps[itype] = infra_gaps.get(itype, 0) + d.get("physical_count", 0)
-        total_physical += d.get("physical_count", 0)
-        total_financial += d.get("financial_amount", 0.0)
+    total_enrolment = stats["total_enrolment"] or 0
+    avg_enrolment = total_enrolment / max(stats["total_schools"], 1)
 
     return {
         "district_id": district_id,
-        "district_name": district.data["district_name"],
-        "total_schools": len(school_list),
+        "district_name": stats["district_name"],
+        "total_schools": stats["total_schools"],
         "total_enrolment": total_enrolment,
         "avg_enrolment": round(avg_enrolment, 1),
-        "total_demand_physical": total_physical,
-        "total_demand_financial": round(total_financial, 2),
-        "priority_distribution": priority_dist,
-        "infra_gaps": infra_gaps,
+        "total_demand_physical": stats["total_demand_physical"],
+        "total_demand_financial": round(stats["total_demand_financial"], 2),
+        "priority_distribution": stats["priority_distribution"],
+        "infra_gaps": stats["infra_gaps"],
     }
 
 
-@router.get("/state")
+@router.get("/state", response_model=StateAnalytics)
 async def state_analytics():
-    """Get state-level analytics summary."""
-    db = get_db()
+    """Get state-level analytics summary.
 
-    # All schools
-    schools = db.table("si_schools_view").select("*").execute()
-    school_list = schools.data or []
+    Reads the per-district rollup tables (si_district_rollup,
+    si_district_infra_rollup), which database triggers keep current as demand
+    plans, enrolment and priority scores change.
+    """
+    db = get_async_db()
 
-    # All demands
-    demands = db.table("si_demand_plans").select("*").execute()
-    demand_list = demands.data or []
-
-    # Districts
-    districts = db.table("si_districts").select("*").execute()
-    mandals = db.table("si_mandals").select("*").execute()
-
-    total_enrolment = sum(s.get("total_enrolment", 0) or 0 for s in school_list)
-    total_financial = sum(d.get("financial_amount", 0.0) for d in demand_list)
+    districts = await fetch_all_async(lambda: db.table("si_district_rollup").select("*").order("district_id"))
+    infra = await fetch_all_async(
+        lambda: db.table("si_district_infra_rollup").select("*").order("district_id").order("infra_type")
+    )
 
     priority_dist = {}
-    for s in school_list:
-        level = s.get("priority_level", "UNKNOWN") or "UNKNOWN"
-        priority_dist[level] = priority_dist.get(level, 0) + 1
+    for d in districts:
+        for level, count in (d.get("priority_distribution") or {}).items():
+            priority_dist[level] = priority_dist.get(level, 0) + count
 
     infra_by_type = {}
-    for d in demand_list:
-        itype = d.get("infra_type", "OTHER")
-        infra_by_type[itype] = infra_by_type.get(itype, 0) + d.get("physical_count", 0)
-
-    # Top priority districts
-    district_scores = {}
-    for s in school_list:
-        did = s.get("district_id")
-        dname = s.get("district_name", "Unknown")
-        if did:
-            if did not in district_scores:
-                district_scores[did] = {"district_name": dname, "critical": 0, "high": 0, "schools": 0}
-            district_scores[did]["schools"] += 1
-            level = (s.get("priority_level") or "").upper()
-            if level == "CRITICAL":
-                district_scores[did]["critical"] += 1
-            elif level == "HIGH":
-                district_scores[did]["high"] += 1
-
-    top_districts = sorted(
-        district_scores.values(),
-        key=lambda x: (x["critical"], x["high"]),
-        reverse=True,
-    )[:10]
+    total_financial = 0.0
+    for row in infra:
+        itype = row["infra_type"]
+        infra_by_type[itype] = infra_by_type.get(itype, 0) + row["physical_count"]
+        total_financial += row["financial_amount"]
+
+    # Top priority districts (district_id 0 collects schools without a district)
+    district_scores = [
+        {
+            "district_name": d.get("district_name") or "Unknown",
+            "critical": d["critical_schools"],
+            "high": d["high_schools"],
+            "schools": d["total_schools"],
+        }
+        for d in districts
+        if d["district_id"] and d["total_schools"]
+    ]
+    top_districts = heapq.nlargest(10, district_scores, key=lambda x: (x["critical"], x["high"]))
 
     return {
-        "total_schools": len(school_list),
-        "total_districts": len(districts.data or []),
-        "total_mandals": len(mandals.data or []),
-        "total_enrolment": total_enrolment,
+        "total_schools": sum(d["total_schools"] for d in districts),
+        "total_districts": sum(1 for d in districts if d["district_id"]),
+        "total_mandals": sum(d["total_mandals"] for d in districts),
+        "total_enrolment": sum(d["total_enrolment"] for d in districts),
         "total_demand_financial": round(total_financial, 2),
         "priority_distribution": priority_dist,
         "infra_demand_by_type": infra_by_type,
         "top_priority_districts": top_districts,
     }
+
+
+@router.post("/state/refresh")
+async def refresh_state_analytics():
+    """Rebuild the state rollup from scratch (e.g. after loading data with triggers disabled)."""
+    db = get_async_db()
+    refreshed = (await db.rpc("si_refresh_state_rollup", {}).execute()).data
+    invalidate_responses()
+    return {"districts_refreshed": refreshed}
+
+
+@router.get("/cache")
+async def analytics_cache_stats():
+    """Response cache counters (hits, misses, evictions); not cached itself."""
+    return response_cache_stats()
+
+
+@router.post("/cache/invalidate")
+async def invalidate_analytics_cache():
+    """Drop cached analytics responses, e.g. after writing to Supabase directly."""
+    return {"invalidated": invalidate_responses()}
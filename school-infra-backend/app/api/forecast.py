@@ -1,9 +1,13 @@
 """Enrolment forecasting API endpoints."""
 
 from fastapi import APIRouter, HTTPException
-from app.models.schemas import ForecastResponse, BatchForecastRequest
-from app.services.forecast_service import forecast_school, save_forecasts
-from app.services.db import get_db
+from app.models.schemas import ForecastResponse, BatchForecastRequest, CacheInvalidateRequest
+from app.services.forecast_service import (
+    forecast_school, save_forecasts, remember_forecast,
+    warm_enrolment_cache, invalidate_enrolment_cache, enrolment_cache_stats,
+)
+from app.services.jobs import submit_job, get_job
+from app.services.offload import LaneFull, run_blocking
 
 router = APIRouter()
 
@@ -12,12 +16,14 @@ router = APIRouter()
 async def forecast_enrolment(school_id: int, years_ahead: int = 1):
     """Predict next year's enrolment for a specific school."""
     try:
-        result = forecast_school(school_id, years_ahead)
+        result = await run_blocking("forecast", forecast_school, school_id, years_ahead)
         if not result["forecasts"]:
             raise HTTPException(status_code=404, detail="No enrolment data found for school")
 
-        # Save forecasts to DB
-        save_forecasts(school_id, result["forecasts"])
+        # Save forecasts to DB, unless this exact forecast was already saved
+        if not result["cached"]:
+            await run_blocking("io", save_forecasts, school_id, result["forecasts"])
+            remember_forecast(school_id, result)
 
         return ForecastResponse(
             school_id=school_id,
@@ -25,37 +31,46 @@ async def forecast_enrolment(school_id: int, years_ahead: int = 1):
             overall_trend=result["overall_trend"],
             growth_rate=result["growth_rate"],
         )
-    except HTTPException:
+    except (HTTPException, LaneFull):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/batch")
+@router.post("/batch", status_code=202)
 async def batch_forecast(req: BatchForecastRequest):
-    """Run forecasting for all schools."""
-    db = get_db()
-    schools = db.table("si_schools").select("id").execute()
-
-    results = []
-    errors = []
-    for school in schools.data:
-        try:
-            result = forecast_school(school["id"], req.years_ahead)
-            if result["forecasts"]:
-                save_forecasts(school["id"], result["forecasts"])
-                results.append({
-                    "school_id": school["id"],
-                    "trend": result["overall_trend"],
-                    "growth_rate": result["growth_rate"],
-                    "forecast_count": len(result["forecasts"]),
-                })
-        except Exception as e:
-            errors.append({"school_id": school["id"], "error": str(e)})
-
-    return {
-        "total_processed": len(results),
-        "total_errors": len(errors),
-        "results": results[:20],  # Return first 20
-        "errors": errors[:10],
-    }
+    """Run forecasting for all schools as a background job.
+
+    The job is sharded and checkpointed by district; with `parallel`, shards
+    run on a process pool. Poll the returned status URL for progress.
+    """
+    job_id = await run_blocking("io", submit_job, "forecast_batch", req.model_dump())
+    return {"job_id": job_id, "status_url": f"/api/jobs/{job_id}"}
+
+
+@router.get("/batch/{job_id}")
+async def batch_forecast_status(job_id: str):
+    """Progress of a batch forecast job (same as GET /api/jobs/{job_id})."""
+    job = await run_blocking("io", get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return job
+
+
+@router.get("/cache")
+async def cache_stats():
+    """Enrolment history cache counters (hits, misses, evictions)."""
+    return enrolment_cache_stats()
+
+
+@router.post("/cache/warm/{district_id}")
+async def warm_cache(district_id: int):
+    """Preload a district's enrolment history in a single query."""
+    cached = await run_blocking("io", warm_enrolment_cache, district_id)
+    return {"district_id": district_id, "schools_cached": cached}
+
+
+@router.post("/cache/invalidate")
+async def invalidate_cache(req: CacheInvalidateRequest):
+    """Drop cached history, e.g. after new enrolment is seeded or upserted."""
+    return {"invalidated": await run_blocking("io", invalidate_enrolment_cache, req.school_ids)}
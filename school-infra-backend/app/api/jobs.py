@@ -0,0 +1,37 @@
+"""Background job API endpoints."""
+
+from typing import Optional
+from fastapi import APIRouter, HTTPException
+from app.services.jobs import get_job, list_jobs, resume_job
+from app.services.offload import run_blocking
+
+router = APIRouter()
+
+
+@router.get("")
+async def jobs(limit: int = 20, status: Optional[str] = None):
+    """Recent jobs, newest first."""
+    return await run_blocking("io", list_jobs, limit, status)
+
+
+@router.get("/{job_id}")
+async def job_status(job_id: str):
+    """Status, progress (done/total, ETA) and, once finished, the result."""
+    job = await run_blocking("io", get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("/{job_id}/resume")
+async def resume(job_id: str):
+    """Re-run a failed job; checkpointed districts are skipped.
+
+    Jobs interrupted by a restart are resumed automatically at startup.
+    """
+    job = await run_blocking("io", get_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not await run_blocking("io", resume_job, job_id):
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}; only FAILED jobs can be resumed")
+    return await run_blocking("io", get_job, job_id)
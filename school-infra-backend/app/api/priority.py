@@ -0,0 +1,71 @@
+"""School priority scoring API endpoints."""
+
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from app.models.schemas import PriorityBatchRequest
+from app.services.jobs import submit_job
+from app.services.offload import run_blocking
+from app.services.ranking_service import ensure_priority_index, get_priority_index, refresh_priority_index
+
+router = APIRouter()
+
+
+@router.post("/batch", status_code=202)
+async def batch_priority(req: PriorityBatchRequest = PriorityBatchRequest()):
+    """Re-score school priorities as a background job.
+
+    Only schools whose enrolment, demand plans, assessments or school row
+    were written since the previous pass are scored and upserted into
+    si_school_priority_scores; the first pass, or incremental=false, scores
+    every school. Poll the returned status URL for the result.
+    """
+    job_id = await run_blocking("io", submit_job, "priority_batch", req.model_dump())
+    return {"job_id": job_id, "status_url": f"/api/jobs/{job_id}"}
+
+
+@router.get("/top")
+async def top_priority_schools(
+    k: int = Query(10, ge=1, le=1000),
+    district_id: Optional[int] = None,
+    mandal_id: Optional[int] = None,
+    level: Optional[str] = None,
+):
+    """Highest-priority schools of a mandal, a district or the whole state.
+
+    Served from the in-memory ranking index; ``level`` (e.g. CRITICAL) keeps
+    only schools of that priority level.
+    """
+    index = await ensure_priority_index()
+    ranked, schools = index.top(k, district_id=district_id, mandal_id=mandal_id, level=level)
+    scope = "mandal" if mandal_id is not None else "district" if district_id is not None else "state"
+    return {
+        "scope": scope,
+        "district_id": district_id,
+        "mandal_id": mandal_id,
+        "level": level.upper() if level else None,
+        "ranked_schools": ranked,
+        "schools": schools,
+    }
+
+
+@router.get("/rank/{school_id}")
+async def school_priority_rank(school_id: int):
+    """A school's priority rank in the state, its district and its mandal."""
+    index = await ensure_priority_index()
+    ranked = index.rank(school_id)
+    if ranked is None:
+        raise HTTPException(status_code=404, detail="School not found")
+    return ranked
+
+
+@router.get("/index")
+async def priority_index_stats():
+    """Size and age of the in-memory ranking index."""
+    return get_priority_index().stats()
+
+
+@router.post("/index/refresh")
+async def refresh_priority_index_now():
+    """Rebuild the ranking index from si_schools_view (e.g. after scores were written elsewhere)."""
+    return {"schools_loaded": await refresh_priority_index()}
@@ -2,8 +2,10 @@
 
 from fastapi import APIRouter, HTTPException
 from app.models.schemas import DemandValidationRequest, DemandValidationResponse, ValidationResult
-from app.services.validation_service import validate_demand_plans, get_all_demand_plans
-from app.services.db import get_db
+from app.services.validation_service import save_validation_results, validate_demand_plans, verdict_fields
+from app.services.anomaly_model import model_info
+from app.services.jobs import submit_job
+from app.services.offload import LaneFull, run_blocking
 
 router = APIRouter()
 
@@ -13,74 +15,49 @@ async def validate_demands(req: DemandValidationRequest):
     """Validate demand plans using ML + rules."""
     try:
         demands = [d.model_dump() for d in req.demands]
-        results = validate_demand_plans(demands)
+        results = await run_blocking("validate", validate_demand_plans, demands)
 
         validation_results = [ValidationResult(**r) for r in results]
         total_flagged = sum(1 for r in results if r["validation_status"] == "FLAGGED")
         total_approved = sum(1 for r in results if r["validation_status"] == "APPROVED")
 
-        # Update validation status in DB
-        db = get_db()
-        for r in results:
-            db.table("si_demand_plans") \
-                .update({
-                    "validation_status": r["validation_status"],
-                    "validation_score": r["confidence"],
-                    "validation_flags": r["reasons"],
-                }) \
-                .eq("school_id", r["school_id"]) \
-                .eq("infra_type", r["infra_type"]) \
-                .execute()
+        # Update validation status in DB, in bulk
+        write_back = await run_blocking("io", save_validation_results, [
+            {"school_id": r["school_id"], "infra_type": r["infra_type"], **verdict_fields(r)}
+            for r in results
+        ])
 
         return DemandValidationResponse(
             results=validation_results,
             total_flagged=total_flagged,
             total_approved=total_approved,
+            write_back=write_back,
         )
+    except LaneFull:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/batch")
+@router.post("/batch", status_code=202)
 async def batch_validate():
-    """Validate all pending demand plans."""
-    try:
-        db = get_db()
-        pending = db.table("si_demand_plans_view") \
-            .select("*") \
-            .eq("validation_status", "PENDING") \
-            .execute()
-
-        if not pending.data:
-            return {"message": "No pending demand plans", "total_processed": 0}
-
-        demands = [{
-            "school_id": d["school_id"],
-            "infra_type": d["infra_type"],
-            "physical_count": d["physical_count"],
-            "financial_amount": d["financial_amount"],
-            "school_category": d.get("school_category"),
-            "total_enrolment": None,
-        } for d in pending.data]
-
-        results = validate_demand_plans(demands)
-
-        # Update DB
-        for r, orig in zip(results, pending.data):
-            db.table("si_demand_plans") \
-                .update({
-                    "validation_status": r["validation_status"],
-                    "validation_score": r["confidence"],
-                    "validation_flags": r["reasons"],
-                }) \
-                .eq("id", orig["id"]) \
-                .execute()
-
-        return {
-            "total_processed": len(results),
-            "approved": sum(1 for r in results if r["validation_status"] == "APPROVED"),
-            "flagged": sum(1 for r in results if r["validation_status"] == "FLAGGED"),
-            "rejected": sum(1 for r in results if r["validation_status"] == "REJECTED"),
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    """Validate all pending demand plans as a background job."""
+    job_id = await run_blocking("io", submit_job, "validate_batch", {})
+    return {"job_id": job_id, "status_url": f"/api/jobs/{job_id}"}
+
+
+@router.get("/model")
+async def anomaly_model_info():
+    """Metadata of the active anomaly model."""
+    # First use loads the model from disk
+    info = await run_blocking("io", model_info)
+    if info is None:
+        raise HTTPException(status_code=404, detail="No anomaly model trained yet")
+    return info
+
+
+@router.post("/model/train", status_code=202)
+async def train_anomaly_model():
+    """Retrain the anomaly model on all demand plans as a background job."""
+    job_id = await run_blocking("io", submit_job, "train_anomaly_model", {})
+    return {"job_id": job_id, "status_url": f"/api/jobs/{job_id}"}
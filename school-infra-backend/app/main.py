@@ -3,16 +3,27 @@ School Infrastructure Planning — FastAPI ML Backend
 
 Endpoints:
   POST /api/forecast/enrolment/{school_id}  — Predict next year's enrolment
-  POST /api/forecast/batch                  — Batch forecast for all schools
+  POST /api/forecast/batch                  — Batch forecast for all schools (job)
   POST /api/validate/demand-plan            — ML-based anomaly detection
+  POST /api/validate/batch                  — Validate all pending plans (job)
+  GET  /api/validate/model                  — Active anomaly model
+  POST /api/validate/model/train            — Retrain the anomaly model (job)
+  POST /api/priority/batch                  — Re-score changed schools' priority (job)
+  GET  /api/priority/top                    — Top-K schools of the state / a district / a mandal
+  GET  /api/priority/rank/{school_id}       — A school's state, district and mandal rank
+  GET  /api/jobs/{job_id}                   — Background job status
   GET  /api/analytics/district/{district_id} — District analytics
   GET  /api/analytics/state                 — State-level summary
+  POST /api/analytics/state/refresh         — Rebuild the state rollup
   GET  /health                              — Health check
+  GET  /health/offload                      — Blocking-work pool: running / queued per lane
 """
 
 import os
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -20,13 +31,40 @@ load_dotenv()
 from app.api.forecast import router as forecast_router
 from app.api.validate import router as validate_router
 from app.api.analytics import router as analytics_router
+from app.api.priority import router as priority_router
+from app.api.jobs import router as jobs_router
+from app.services import batch_service  # noqa: F401 — registers batch job handlers
+from app.services import anomaly_model, db, jobs, offload, priority_service
+from app.services.response_cache import ResponseCacheMiddleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the newest saved anomaly model once; requests only score with it
+    anomaly_model.load_model()
+    # Thread pool for blocking service calls made by async endpoints
+    offload.start()
+    # Pick up batches a previous process was running; checkpoints skip finished districts
+    jobs.resume_unfinished_jobs()
+    # Re-score schools as their inputs change (PRIORITY_POLL_INTERVAL > 0)
+    priority_service.start_watcher()
+    yield
+    priority_service.stop_watcher()
+    jobs.shutdown()
+    offload.shutdown()
+    await db.close_async_db()
+    db.close_db()
+
 
 app = FastAPI(
     title="School Infrastructure AI Backend",
     version="1.0.0",
     description="AI-powered enrolment forecasting and demand validation for school infrastructure planning",
+    lifespan=lifespan,
 )
 
+# Inside CORS, so cached responses get the CORS headers of each request
+app.add_middleware(ResponseCacheMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -38,8 +76,21 @@ app.add_middleware(
 app.include_router(forecast_router, prefix="/api/forecast", tags=["Forecast"])
 app.include_router(validate_router, prefix="/api/validate", tags=["Validation"])
 app.include_router(analytics_router, prefix="/api/analytics", tags=["Analytics"])
+app.include_router(priority_router, prefix="/api/priority", tags=["Priority"])
+app.include_router(jobs_router, prefix="/api/jobs", tags=["Jobs"])
+
+
+@app.exception_handler(offload.LaneFull)
+async def lane_full(request: Request, exc: offload.LaneFull):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
 
 
 @app.get("/health")
 async def health():
     return {"status": "ok", "service": "school-infra-backend"}
+
+
+@app.get("/health/offload")
+async def offload_health():
+    """Offload pool lanes: limit, running, waiting (queue depth), rejections, timings."""
+    return offload.offload_stats()
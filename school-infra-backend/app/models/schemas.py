@@ -35,6 +35,20 @@ class ForecastResponse(BaseModel):
 
 class BatchForecastRequest(BaseModel):
     years_ahead: int = 1
+    chunk_size: Optional[int] = None  # rows per bulk upsert; server default if None
+    parallel: bool = False  # run shards on a process pool
+    workers: Optional[int] = None  # worker processes; server default if None
+    incremental: bool = False  # skip schools whose history is unchanged since their last save
+
+
+class PriorityBatchRequest(BaseModel):
+    score_year: int = 2025
+    incremental: bool = True  # only schools changed since the last pass; False re-scores all
+    chunk_size: Optional[int] = None  # rows per bulk upsert; server default if None
+
+
+class CacheInvalidateRequest(BaseModel):
+    school_ids: Optional[list[int]] = None  # None drops every cached school
 
 
 class DemandPlanInput(BaseModel):
@@ -60,10 +74,22 @@ class DemandValidationRequest(BaseModel):
     demands: list[DemandPlanInput]
 
 
+class WriteBackSummary(BaseModel):
+    rows_sent: int
+    rows_updated: int
+    chunks: int
+    failed_chunks: int
+    failed_rows: int
+    elapsed_s: float
+    rows_per_sec: Optional[float] = None
+    errors: list[dict] = []
+
+
 class DemandValidationResponse(BaseModel):
     results: list[ValidationResult]
     total_flagged: int
     total_approved: int
+    write_back: Optional[WriteBackSummary] = None
 
 
 class DistrictAnalytics(BaseModel):
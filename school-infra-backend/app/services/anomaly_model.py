@@ -0,0 +1,336 @@
+"""
+Anomaly Model Registry — pre-trained Isolation Forests for demand validation.
+
+One forest per infra_type is trained offline on that type's share of the
+si_demand_plans population (a CWSN resource room and a ramp differ by 20x in
+unit cost, so one shared feature space hides anomalies among cheap items),
+plus a fallback forest over all plans for types too rare to model alone.
+Models are saved to ANOMALY_MODEL_DIR as a numbered version and loaded once
+at startup, so requests only call decision_function and every demand is
+judged against the same population regardless of batch size.
+
+Per-type feature matrices are cached in ANOMALY_MODEL_DIR with a fingerprint:
+a retrain refits only the types whose data changed, and --from-cache refits
+(e.g. after changing ANOMALY_CONTAMINATION) without reading the database.
+Fits and scores of the per-type models run in parallel.
+
+Usage (from school-infra-backend/):
+    python -m app.services.anomaly_model train [--from-cache]
+    python -m app.services.anomaly_model info
+"""
+
+import argparse
+import datetime
+import hashlib
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import joblib
+import numpy as np
+import sklearn
+from sklearn.ensemble import IsolationForest
+
+from app.services.db import get_db, fetch_all
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+ANOMALY_MODEL_DIR = os.environ.get("ANOMALY_MODEL_DIR", os.path.join(BACKEND_DIR, "model_registry"))
+
+ANOMALY_CONTAMINATION = float(os.environ.get("ANOMALY_CONTAMINATION", "0.15"))
+ANOMALY_N_ESTIMATORS = int(os.environ.get("ANOMALY_N_ESTIMATORS", "100"))
+
+# Threads fitting / scoring per-type models (tree building and traversal release the GIL)
+ANOMALY_WORKERS = int(os.environ.get("ANOMALY_WORKERS", os.cpu_count() or 1))
+
+# Fewer plans than this cannot describe "normal" well enough to be worth saving;
+# infra types below it are scored by the fallback model
+MIN_TRAINING_SAMPLES = 20
+
+# School ids per ``in.(...)`` filter when looking up enrolment
+IN_FILTER_CHUNK = 500
+
+FEATURE_CACHE_FILE = "feature_cache.npz"
+FALLBACK_KEY = "__all__"
+
+FEATURES = ["physical_count", "financial_amount", "unit_cost", "cost_per_student", "total_enrolment"]
+# Enrolment the features assume for a school with none recorded (see recorded_enrolment)
+DEFAULT_ENROLMENT = 100
+
+_MODEL_FILE = re.compile(r"^isolation_forest_v(\d+)\.joblib$")
+
+_lock = threading.Lock()
+_active: dict | None = None
+_loaded = False
+_executor: ThreadPoolExecutor | None = None
+
+
+def build_features(demands: list[dict]) -> np.ndarray:
+    """Feature matrix (one row per demand, columns as in FEATURES).
+
+    Training, the feature cache and scoring all build their rows here, from
+    demands that went through attach_enrolment().
+    """
+    physical = np.array([d.get("physical_count", 0) or 0 for d in demands], dtype=np.float64)
+    financial = np.array([d.get("financial_amount", 0.0) or 0.0 for d in demands], dtype=np.float64)
+    enrolment = np.array(recorded_enrolment(demands), dtype=np.float64)
+    enrolment[enrolment == 0] = DEFAULT_ENROLMENT
+    return np.column_stack([
+        physical,
+        financial,
+        financial / np.maximum(physical, 1),
+        financial / np.maximum(enrolment, 1),
+        enrolment,
+    ])
+
+
+def recorded_enrolment(demands: list[dict]) -> list:
+    """Each demand's school enrolment, 0 where none is recorded (missing, zero or negative).
+
+    The rules skip their enrolment checks for 0 and build_features() puts
+    DEFAULT_ENROLMENT in its place, so a missing value reads the same way in
+    training and in scoring.
+    """
+    return [e if e is not None and e > 0 else 0 for e in (d.get("total_enrolment") for d in demands)]
+
+
+def new_forest() -> IsolationForest:
+    """Unfitted forest with the registry's hyper-parameters."""
+    return IsolationForest(
+        contamination=ANOMALY_CONTAMINATION,
+        random_state=42,
+        n_estimators=ANOMALY_N_ESTIMATORS,
+    )
+
+
+def load_training_demands() -> list[dict]:
+    """Every demand plan, with its school's latest enrolment."""
+    db = get_db()
+    plans = fetch_all(lambda: db.table("si_demand_plans")
+                      .select("id,school_id,infra_type,physical_count,financial_amount")
+                      .order("id"))
+    schools = fetch_all(lambda: db.table("si_schools_view").select("id,total_enrolment").order("id"))
+    return attach_enrolment(plans, {s["id"]: s.get("total_enrolment") for s in schools})
+
+
+def attach_enrolment(demands: list[dict], enrolment: dict[int, int | None] | None = None) -> list[dict]:
+    """Fill in each demand's total_enrolment from si_schools_view, the source the forests are trained on.
+
+    Every path into build_features() goes through here: training, and
+    validate_demand_plans() for requests and batch validation alike.
+
+    Demands that already carry an enrolment keep it. ``enrolment`` maps
+    school id to enrolment when the caller has read the view already;
+    otherwise only the schools that need a value are looked up.
+    """
+    missing = sorted({d["school_id"] for d in demands if d.get("total_enrolment") is None and d.get("school_id")})
+    if enrolment is None:
+        enrolment = school_enrolment(missing)
+    for d in demands:
+        if d.get("total_enrolment") is None:
+            d["total_enrolment"] = enrolment.get(d.get("school_id"))
+    return demands
+
+
+def school_enrolment(school_ids: list[int]) -> dict[int, int | None]:
+    """Latest total_enrolment of each school, from si_schools_view."""
+    db = get_db()
+    enrolment = {}
+    for i in range(0, len(school_ids), IN_FILTER_CHUNK):
+        chunk = school_ids[i:i + IN_FILTER_CHUNK]
+        rows = fetch_all(lambda: db.table("si_schools_view")
+                         .select("id,total_enrolment")
+                         .in_("id", chunk)
+                         .order("id"))
+        enrolment.update({r["id"]: r.get("total_enrolment") for r in rows})
+    return enrolment
+
+
+def build_feature_matrices(demands: list[dict]) -> dict[str, np.ndarray]:
+    """Feature matrix per infra_type, rows in input order."""
+    by_type = {}
+    for d in demands:
+        by_type.setdefault(d.get("infra_type", ""), []).append(d)
+    return {infra_type: build_features(rows) for infra_type, rows in sorted(by_type.items())}
+
+
+def train_model(demands: list[dict] | None = None, from_cache: bool = False) -> dict:
+    """Fit per-type forests, save them as the next version and activate it.
+
+    Types whose feature matrix (and hyper-parameters) are unchanged since the
+    active version keep their fitted forest instead of being refitted.
+    """
+    if from_cache:
+        matrices = load_feature_cache()
+        if matrices is None:
+            raise ValueError(f"No cached feature matrices in {ANOMALY_MODEL_DIR}")
+    else:
+        demands = load_training_demands() if demands is None else attach_enrolment(demands)
+        matrices = build_feature_matrices(demands)
+
+    n_samples = sum(len(X) for X in matrices.values())
+    if n_samples < MIN_TRAINING_SAMPLES:
+        raise ValueError(f"Need at least {MIN_TRAINING_SAMPLES} demand plans to train, got {n_samples}")
+
+    previous = get_model() or {}
+    previous_types = previous.get("per_type", {})
+    previous_models = previous.get("models", {})
+
+    # The fallback forest is fitted on every plan and keyed like a type
+    fits = {infra_type: X for infra_type, X in matrices.items() if len(X) >= MIN_TRAINING_SAMPLES}
+    fits[FALLBACK_KEY] = np.vstack(list(matrices.values()))
+
+    per_type, models, to_fit = {}, {}, {}
+    for infra_type, X in fits.items():
+        fingerprint = _fingerprint(X)
+        per_type[infra_type] = {"n_samples": len(X), "fingerprint": fingerprint, "refit": True}
+        old = previous_types.get(infra_type)
+        if old and old["fingerprint"] == fingerprint and infra_type in previous_models:
+            models[infra_type] = previous_models[infra_type]
+            per_type[infra_type]["refit"] = False
+        else:
+            to_fit[infra_type] = X
+
+    for infra_type, forest in zip(to_fit, _map(lambda X: new_forest().fit(X), to_fit.values())):
+        models[infra_type] = forest
+
+    with _lock:
+        version = (_saved_versions() or [0])[-1] + 1
+        bundle = {
+            "version": version,
+            "trained_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "n_samples": n_samples,
+            "features": FEATURES,
+            "contamination": ANOMALY_CONTAMINATION,
+            "n_estimators": ANOMALY_N_ESTIMATORS,
+            "sklearn_version": sklearn.__version__,
+            "per_type": per_type,
+            "models": models,
+        }
+        os.makedirs(ANOMALY_MODEL_DIR, exist_ok=True)
+        path = _model_path(version)
+        joblib.dump(bundle, path + ".tmp")
+        os.replace(path + ".tmp", path)
+        if not from_cache:
+            _save_feature_cache(matrices)
+        _activate(bundle)
+    return model_info()
+
+
+def decision_scores(demands: list[dict], bundle: dict) -> np.ndarray:
+    """decision_function of each demand under its infra_type's forest (negative = anomaly)."""
+    X = build_features(demands)
+    models = bundle.get("models")
+    if models is None:
+        # Version 1 bundles hold a single forest for every type
+        return bundle["model"].decision_function(X)
+
+    groups = {}
+    for i, d in enumerate(demands):
+        groups.setdefault(d.get("infra_type", ""), []).append(i)
+
+    scores = np.empty(len(demands))
+    rows = [np.array(idx) for idx in groups.values()]
+    forests = [models.get(infra_type, models[FALLBACK_KEY]) for infra_type in groups]
+    for idx, group_scores in zip(rows, _map(lambda pair: pair[0].decision_function(X[pair[1]]), zip(forests, rows))):
+        scores[idx] = group_scores
+    return scores
+
+
+def load_feature_cache() -> dict[str, np.ndarray] | None:
+    """Per-type feature matrices of the last training run read from the database."""
+    path = os.path.join(ANOMALY_MODEL_DIR, FEATURE_CACHE_FILE)
+    if not os.path.exists(path):
+        return None
+    with np.load(path, allow_pickle=False) as cache:
+        return {name: cache[name] for name in cache.files}
+
+
+def load_model(version: int | None = None) -> dict | None:
+    """Load a saved version (default: the newest) and make it the active model."""
+    with _lock:
+        versions = _saved_versions()
+        if version is None:
+            version = versions[-1] if versions else None
+        elif version not in versions:
+            raise ValueError(f"Anomaly model version {version} not found in {ANOMALY_MODEL_DIR}")
+        _activate(joblib.load(_model_path(version)) if version is not None else None)
+        return _active
+
+
+def get_model() -> dict | None:
+    """The active model bundle, loading the newest saved version on first use."""
+    if not _loaded:
+        load_model()
+    return _active
+
+
+def model_info() -> dict | None:
+    """Metadata of the active model (everything but the estimator itself)."""
+    bundle = get_model()
+    if bundle is None:
+        return None
+    info = {k: v for k, v in bundle.items() if k not in ("model", "models")}
+    info["path"] = _model_path(bundle["version"])
+    info["saved_versions"] = _saved_versions()
+    return info
+
+
+def _map(fn, items) -> list:
+    """fn over items on the shared thread pool (inline for a single item)."""
+    items = list(items)
+    if len(items) <= 1 or ANOMALY_WORKERS <= 1:
+        return [fn(item) for item in items]
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=ANOMALY_WORKERS, thread_name_prefix="anomaly")
+    return list(_executor.map(fn, items))
+
+
+def _fingerprint(X: np.ndarray) -> str:
+    """Identity of a training matrix and the hyper-parameters it would be fitted with."""
+    digest = hashlib.sha1(np.ascontiguousarray(X).tobytes())
+    digest.update(f"{X.shape}|{ANOMALY_CONTAMINATION}|{ANOMALY_N_ESTIMATORS}|{sklearn.__version__}".encode())
+    return digest.hexdigest()
+
+
+def _save_feature_cache(matrices: dict[str, np.ndarray]):
+    path = os.path.join(ANOMALY_MODEL_DIR, FEATURE_CACHE_FILE)
+    with open(path + ".tmp", "wb") as f:
+        np.savez(f, **matrices)
+    os.replace(path + ".tmp", path)
+
+
+def _activate(bundle: dict | None):
+    global _active, _loaded
+    _active, _loaded = bundle, True
+
+
+def _model_path(version: int) -> str:
+    return os.path.join(ANOMALY_MODEL_DIR, f"isolation_forest_v{version}.joblib")
+
+
+def _saved_versions() -> list[int]:
+    if not os.path.isdir(ANOMALY_MODEL_DIR):
+        return []
+    matches = (_MODEL_FILE.match(name) for name in os.listdir(ANOMALY_MODEL_DIR))
+    return sorted(int(m.group(1)) for m in matches if m)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train or inspect the demand anomaly model")
+    parser.add_argument("command", choices=["train", "info"])
+    parser.add_argument("--from-cache", action="store_true",
+                        help="refit from the cached feature matrices instead of the database")
+    args = parser.parse_args()
+
+    info = train_model(from_cache=args.from_cache) if args.command == "train" else model_info()
+    if info is None:
+        print(f"No anomaly model saved in {ANOMALY_MODEL_DIR}")
+        return
+    for key, value in info.items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
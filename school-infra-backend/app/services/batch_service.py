@@ -0,0 +1,328 @@
+"""
+Batch Jobs — state-wide forecast and validation runs.
+
+Both run as background jobs (see jobs.py), sharded by district, with every
+finished district checkpointed so an interrupted run resumes where it
+stopped. Forecast shards can also run on a process pool: each worker
+fetches, forecasts and saves its own district and hands a partial summary
+back as soon as it finishes.
+
+Priority scoring is a single vectorized pass over the schools changed since
+the previous pass (every school on the first or a full pass), so it runs
+(and, if interrupted, re-runs) as one unit.
+"""
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from app.services.anomaly_model import train_model
+from app.services.db import get_db, fetch_all
+from app.services.forecast_service import forecast_schools, save_forecasts_bulk, saved_forecast_schools
+from app.services.job_store import get_job_store
+from app.services.priority_service import DEFAULT_SCORE_YEAR, rescore_priority_scores
+from app.services.jobs import JobContext, job_handler
+from app.services.validation_service import validate_pending_plans
+
+# Worker processes for parallel batch runs
+FORECAST_BATCH_WORKERS = int(os.environ.get("FORECAST_BATCH_WORKERS", os.cpu_count() or 1))
+
+# Large districts are split so no single shard dominates the run
+MAX_SHARD_SCHOOLS = int(os.environ.get("FORECAST_MAX_SHARD_SCHOOLS", "2000"))
+
+# Keep job payloads small
+MAX_REPORTED_RESULTS = 20
+MAX_REPORTED_ERRORS = 10
+
+# Checkpoint keys of districts whose validation write-back only partly succeeded
+PARTIAL_MARK = ":partial:"
+
+
+def get_district_shards(max_shard_schools: int = MAX_SHARD_SCHOOLS) -> list[tuple[str, int | None, list[int]]]:
+    """Group all school ids by district as (shard_key, district_id, school_ids).
+
+    Districts larger than the cap are split. A job stores the shards of its
+    first run (JobContext.shards), so a resume after schools were added or
+    moved still maps each checkpointed key to the same schools.
+    """
+    db = get_db()
+    schools = fetch_all(lambda: db.table("si_schools").select("id,district_id").order("id"))
+
+    by_district = {}
+    for s in schools:
+        by_district.setdefault(s["district_id"], []).append(s["id"])
+
+    shards = []
+    for district_id, ids in by_district.items():
+        for part, i in enumerate(range(0, len(ids), max_shard_schools)):
+            shards.append((f"district:{district_id}:{part}", district_id, ids[i:i + max_shard_schools]))
+    # Biggest shards first so stragglers don't extend the tail of the run
+    shards.sort(key=lambda shard: len(shard[2]), reverse=True)
+    return shards
+
+
+def forecast_shard(district_id: int | None, school_ids: list[int], years_ahead: int,
+                   chunk_size: int | None = None, incremental: bool = False) -> dict:
+    """Forecast and save one shard. Runs inside a worker process in parallel mode.
+
+    With `incremental`, schools whose enrolment history fingerprint matches
+    their last saved forecast are skipped, provided that forecast is still in
+    si_enrolment_forecasts: fingerprints live in the local job store, which
+    does not see forecasts deleted in the database (or a store rebuilt
+    elsewhere), so they only count for schools whose rows are still there.
+    """
+    store = get_job_store()
+    known = None
+    if incremental:
+        known = store.fingerprints(school_ids)
+        saved = saved_forecast_schools(list(known))
+        known = {sid: fp for sid, fp in known.items() if sid in saved}
+    results = forecast_schools(school_ids, years_ahead, known_fingerprints=known)
+    forecasted = [r for r in results if r["forecasts"]]
+
+    rows = [
+        {**f, "school_id": r["school_id"]}
+        for r in forecasted
+        for f in r["forecasts"]
+    ]
+    failed = {}
+    for err in save_forecasts_bulk(rows, chunk_size):
+        for school_id in err["school_ids"]:
+            failed[school_id] = err["error"]
+    store.save_fingerprints({
+        r["school_id"]: r["fingerprint"] for r in forecasted if r["school_id"] not in failed
+    })
+
+    return {
+        "district_id": district_id,
+        "schools": len(school_ids),
+        "unchanged": sum(1 for r in results if r["unchanged"]),
+        "forecasts_saved": sum(len(r["forecasts"]) for r in forecasted if r["school_id"] not in failed),
+        "total_processed": len(forecasted) - len(failed),
+        "results": [{
+            "school_id": r["school_id"],
+            "trend": r["overall_trend"],
+            "growth_rate": r["growth_rate"],
+            "forecast_count": len(r["forecasts"]),
+        } for r in forecasted if r["school_id"] not in failed],
+        "errors": [{"school_id": sid, "error": msg} for sid, msg in failed.items()],
+    }
+
+
+@job_handler("forecast_batch")
+def run_forecast_batch(ctx: JobContext) -> dict:
+    """Forecast every school, one checkpointed district shard at a time."""
+    years_ahead = ctx.params.get("years_ahead", 1)
+    chunk_size = ctx.params.get("chunk_size")
+    workers = ctx.params.get("workers") or FORECAST_BATCH_WORKERS
+    incremental = ctx.params.get("incremental", False)
+
+    shards = ctx.shards(get_district_shards)
+    todo = [s for s in shards if s[0] not in ctx.completed]
+    done = sum(cp["schools"] for cp in ctx.completed.values())
+    ctx.progress(
+        unit="schools",
+        total=sum(len(ids) for _, _, ids in shards),
+        done=done,
+        done_at_start=done,
+        resumed_at=time.time(),
+        shards_total=len(shards),
+        shards_done=len(shards) - len(todo),
+        unchanged=sum(cp.get("unchanged", 0) for cp in ctx.completed.values()),
+        errors=sum(cp["total_errors"] for cp in ctx.completed.values()),
+    )
+
+    if ctx.params.get("parallel"):
+        shard_results = _forecast_shards_parallel(todo, years_ahead, chunk_size, incremental, workers)
+    else:
+        shard_results = _forecast_shards_inline(todo, years_ahead, chunk_size, incremental)
+
+    failed_shards = 0
+    for shard_key, schools, partial, exc in shard_results:
+        if exc is not None:
+            # Not checkpointed, so a resume retries this shard
+            failed_shards += 1
+            continue
+        ctx.checkpoint(shard_key, _trim(partial))
+        done += schools
+        ctx.progress(
+            done=done,
+            shards_done=len(ctx.completed),
+            unchanged=sum(cp.get("unchanged", 0) for cp in ctx.completed.values()),
+            errors=sum(cp["total_errors"] for cp in ctx.completed.values()),
+        )
+
+    if failed_shards:
+        raise RuntimeError(f"{failed_shards} of {len(shards)} shards failed; resume the job to retry them")
+    return _combine(ctx.completed.values())
+
+
+def _forecast_shards_inline(shards, years_ahead, chunk_size, incremental):
+    for shard_key, district_id, ids in shards:
+        try:
+            yield shard_key, len(ids), forecast_shard(district_id, ids, years_ahead, chunk_size, incremental), None
+        except Exception as e:
+            yield shard_key, len(ids), None, e
+
+
+def _forecast_shards_parallel(shards, years_ahead, chunk_size, incremental, workers):
+    """Yield each shard's partial summary as soon as its worker finishes."""
+    if not shards:
+        return
+    # spawn, not fork: each worker must open its own database connection
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        futures = {
+            pool.submit(forecast_shard, district_id, ids, years_ahead, chunk_size, incremental): (shard_key, len(ids))
+            for shard_key, district_id, ids in shards
+        }
+        for future in as_completed(futures):
+            shard_key, schools = futures[future]
+            try:
+                yield shard_key, schools, future.result(), None
+            except Exception as e:
+                yield shard_key, schools, None, e
+
+
+def _trim(partial: dict) -> dict:
+    """Checkpoint record: counters plus a bounded sample of results/errors."""
+    return {
+        **partial,
+        "total_errors": len(partial["errors"]),
+        "results": partial["results"][:MAX_REPORTED_RESULTS],
+        "errors": partial["errors"][:MAX_REPORTED_ERRORS],
+    }
+
+
+def _combine(partials) -> dict:
+    partials = list(partials)
+    results = [r for p in partials for r in p["results"]]
+    errors = [e for p in partials for e in p["errors"]]
+    return {
+        "total_processed": sum(p["total_processed"] for p in partials),
+        "total_errors": sum(p["total_errors"] for p in partials),
+        "total_unchanged": sum(p.get("unchanged", 0) for p in partials),
+        "forecasts_saved": sum(p["forecasts_saved"] for p in partials),
+        "results": results[:MAX_REPORTED_RESULTS],
+        "errors": errors[:MAX_REPORTED_ERRORS],
+    }
+
+
+@job_handler("validate_batch")
+def run_validation_batch(ctx: JobContext) -> dict:
+    """Validate all pending demand plans, one checkpointed district at a time.
+
+    Plans of finished districts are no longer PENDING, so a resumed job only
+    fetches what is left.
+    """
+    db = get_db()
+    pending = fetch_all(lambda: db.table("si_demand_plans_view")
+                        .select("*")
+                        .eq("validation_status", "PENDING")
+                        .order("id"))
+
+    by_district = {}
+    for plan in pending:
+        by_district.setdefault(f"district:{plan.get('district_id')}", []).append(plan)
+    todo = {k: v for k, v in by_district.items() if k not in ctx.completed}
+
+    if not todo and not ctx.completed:
+        return {"message": "No pending demand plans", "total_processed": 0}
+
+    districts_done = sum(1 for k in ctx.completed if PARTIAL_MARK not in k)
+    done = sum(cp["total_processed"] for cp in ctx.completed.values())
+    ctx.progress(
+        unit="demand_plans",
+        total=done + sum(len(plans) for plans in todo.values()),
+        done=done,
+        done_at_start=done,
+        resumed_at=time.time(),
+        shards_total=districts_done + len(todo),
+        shards_done=districts_done,
+    )
+
+    failed_shards, first_error = 0, None
+    for shard_key, plans in todo.items():
+        summary = validate_pending_plans(plans)
+        errors = summary["write_back"].pop("errors")
+        if errors:
+            # Record what was written under a partial key; the district stays
+            # unfinished, its unwritten plans are still PENDING and a resume retries them
+            failed_shards += 1
+            first_error = first_error or errors[0]["error"]
+            ctx.checkpoint(f"{shard_key}{PARTIAL_MARK}{len(ctx.completed)}", summary)
+        else:
+            districts_done += 1
+            ctx.checkpoint(shard_key, summary)
+        done += summary["total_processed"]
+        ctx.progress(done=done, shards_done=districts_done)
+
+    if failed_shards:
+        raise RuntimeError(
+            f"Write-back failed for {failed_shards} of {len(todo)} districts ({first_error}); "
+            "resume the job to retry them"
+        )
+
+    totals = list(ctx.completed.values())
+    write_backs = [cp["write_back"] for cp in totals if "write_back" in cp]
+    rows_sent = sum(w["rows_sent"] for w in write_backs)
+    elapsed = sum(w["elapsed_s"] for w in write_backs)
+    return {
+        "total_processed": sum(cp["total_processed"] for cp in totals),
+        "approved": sum(cp["approved"] for cp in totals),
+        "flagged": sum(cp["flagged"] for cp in totals),
+        "rejected": sum(cp["rejected"] for cp in totals),
+        "write_back": {
+            "rows_sent": rows_sent,
+            "rows_updated": sum(w["rows_updated"] for w in write_backs),
+            "chunks": sum(w["chunks"] for w in write_backs),
+            "failed_chunks": sum(w["failed_chunks"] for w in write_backs),
+            "failed_rows": sum(w["failed_rows"] for w in write_backs),
+            "elapsed_s": round(elapsed, 3),
+            "rows_per_sec": round(rows_sent / elapsed, 1) if elapsed > 0 else None,
+        },
+    }
+
+
+@job_handler("train_anomaly_model")
+def run_anomaly_training(ctx: JobContext) -> dict:
+    """Train the demand anomaly model on every demand plan and activate the new version."""
+    ctx.progress(stage="training")
+    return train_model()
+
+
+@job_handler("priority_batch")
+def run_priority_batch(ctx: JobContext) -> dict:
+    """Re-score the schools changed since the last pass (every school when
+    ``incremental`` is off) and bulk-upsert si_school_priority_scores."""
+    score_year = ctx.params.get("score_year") or DEFAULT_SCORE_YEAR
+    rescored = rescore_priority_scores(
+        score_year,
+        incremental=ctx.params.get("incremental", True),
+        chunk_size=ctx.params.get("chunk_size"),
+        progress=ctx.progress,
+    )
+    scores, errors = rescored["scores"], rescored["errors"]
+    failed = {school_id for err in errors for school_id in err["school_ids"]}
+    ctx.progress(done=len(scores) - len(failed))
+    if scores and len(failed) == len(scores):
+        raise RuntimeError(f"Saving priority scores failed: {errors[0]['error']}")
+
+    distribution = {}
+    for row in scores:
+        if row["school_id"] not in failed:
+            distribution[row["priority_level"]] = distribution.get(row["priority_level"], 0) + 1
+    return {
+        "score_year": score_year,
+        "mode": rescored["mode"],
+        "watermark": rescored["watermark"],
+        "total_scored": len(scores),
+        "scores_saved": len(scores) - len(failed),
+        "total_errors": len(failed),
+        "priority_distribution": distribution,
+        "errors": [
+            {"school_ids": err["school_ids"][:MAX_REPORTED_RESULTS], "rows": err["rows"], "error": err["error"]}
+            for err in errors[:MAX_REPORTED_ERRORS]
+        ],
+    }
@@ -1,15 +1,133 @@
-"""Supabase database client."""
+"""Supabase database clients.
+
+Both clients talk to PostgREST over a pooled httpx connection pool, so
+requests reuse keep-alive connections instead of opening one per query.
+
+    get_async_db()  — AsyncPostgrestClient awaited by the API endpoints
+    get_db()        — synchronous adapter for services run in job threads,
+                      worker processes and scripts
+
+They accept the same query builders (``.table(...)``, ``.rpc(...)``); only
+``.execute()`` differs (awaited on the async client).
+
+DB_BACKEND=sqlite swaps both for the embedded local database in local_db,
+which serves the same builders from a SQLite file built from schema.sql.
+"""
 
 import os
-from supabase import create_client, Client
 
-_client: Client | None = None
+import httpx
+from postgrest import AsyncPostgrestClient, SyncPostgrestClient
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_HEADERS
+
+from app.services import local_db
+
+# "supabase" (hosted PostgREST) or "sqlite" (embedded local database)
+DB_BACKEND = os.environ.get("DB_BACKEND", "supabase")
+
+# PostgREST caps every response at this many rows by default.
+PAGE_SIZE = 1000
 
+# Connection pool, per client (the async and sync clients each keep one)
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "20"))
+DB_POOL_KEEPALIVE = int(os.environ.get("DB_POOL_KEEPALIVE", "10"))
+DB_KEEPALIVE_EXPIRY = float(os.environ.get("DB_KEEPALIVE_EXPIRY", "30"))
 
-def get_db() -> Client:
+# Per-request timeouts in seconds (DB_TIMEOUT covers read, write and waiting for a pooled connection)
+DB_TIMEOUT = float(os.environ.get("DB_TIMEOUT", "30"))
+DB_CONNECT_TIMEOUT = float(os.environ.get("DB_CONNECT_TIMEOUT", "5"))
+
+_client: SyncPostgrestClient | local_db.LocalClient | None = None
+_async_client: AsyncPostgrestClient | local_db.AsyncLocalClient | None = None
+
+
+def get_db() -> SyncPostgrestClient | local_db.LocalClient:
+    """Shared synchronous client."""
     global _client
     if _client is None:
-        url = os.environ.get("SUPABASE_URL", "https://yiihjrxfupuohxzubusv.supabase.co")
-        key = os.environ.get("SUPABASE_SERVICE_KEY", os.environ.get("SUPABASE_KEY", ""))
-        _client = create_client(url, key)
+        if DB_BACKEND == "sqlite":
+            _client = local_db.LocalClient()
+        else:
+            _client = SyncPostgrestClient(
+                _rest_url(), headers=_headers(), http_client=httpx.Client(**_pool_options())
+            )
     return _client
+
+
+def get_async_db() -> AsyncPostgrestClient | local_db.AsyncLocalClient:
+    """Shared async client, bound to the running event loop until close_async_db()."""
+    global _async_client
+    if _async_client is None:
+        if DB_BACKEND == "sqlite":
+            _async_client = local_db.AsyncLocalClient(get_db())
+        else:
+            _async_client = AsyncPostgrestClient(
+                _rest_url(), headers=_headers(), http_client=httpx.AsyncClient(**_pool_options())
+            )
+    return _async_client
+
+
+async def close_async_db():
+    """Close the async client's pooled connections (called at app shutdown)."""
+    global _async_client
+    if _async_client is not None:
+        client, _async_client = _async_client, None
+        await client.aclose()
+
+
+def close_db():
+    """Close the sync client's pooled connections (or the local database)."""
+    global _client
+    if _client is not None:
+        client, _client = _client, None
+        client.aclose()
+
+
+def fetch_all(build_query, page_size: int = PAGE_SIZE) -> list[dict]:
+    """Fetch every row of a query, paging past the PostgREST row cap.
+
+    `build_query` must return a fresh, deterministically ordered query
+    builder on each call (builders are mutable, so one cannot be re-ranged).
+    """
+    rows = []
+    start = 0
+    while True:
+        page = build_query().range(start, start + page_size - 1).execute().data or []
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        start += page_size
+
+
+async def fetch_all_async(build_query, page_size: int = PAGE_SIZE) -> list[dict]:
+    """fetch_all for builders of the async client."""
+    rows = []
+    start = 0
+    while True:
+        page = (await build_query().range(start, start + page_size - 1).execute()).data or []
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        start += page_size
+
+
+def _rest_url() -> str:
+    url = os.environ.get("SUPABASE_URL", "https://yiihjrxfupuohxzubusv.supabase.co")
+    return f"{url.rstrip('/')}/rest/v1"
+
+
+def _headers() -> dict:
+    key = os.environ.get("SUPABASE_SERVICE_KEY", os.environ.get("SUPABASE_KEY", ""))
+    return {**DEFAULT_POSTGREST_CLIENT_HEADERS, "apikey": key, "Authorization": f"Bearer {key}"}
+
+
+def _pool_options() -> dict:
+    return {
+        "limits": httpx.Limits(
+            max_connections=DB_POOL_SIZE,
+            max_keepalive_connections=DB_POOL_KEEPALIVE,
+            keepalive_expiry=DB_KEEPALIVE_EXPIRY,
+        ),
+        "timeout": httpx.Timeout(DB_TIMEOUT, connect=DB_CONNECT_TIMEOUT),
+        "follow_redirects": True,
+    }
@@ -4,58 +4,440 @@ Enrolment Forecasting Service
 Models:
 1. Linear Regression — trend extrapolation (baseline)
 2. Cohort Progression — track student cohorts across grades/years
+
+Single-school and batch forecasts share one pipeline: enrolment history is
+pivoted into (school × year) matrices and every trend line is solved at once
+with closed-form least squares, so both paths return identical results.
+Set FORECAST_ENGINE=sklearn to fit with LinearRegression instead. Both engines
+save the same numbers: schools whose results sit on a truncation / rounding
+edge are refit with LinearRegression by the numpy engine.
 """
 
+import copy
+import hashlib
+import os
+from functools import lru_cache
+
 import numpy as np
+from postgrest import ReturnMethod
 from sklearn.linear_model import LinearRegression
-from app.services.db import get_db
+from app.services.cache import TTLCache
+from app.services.db import get_db, fetch_all
+
+# Max school ids per `in.(...)` filter, keeps the request URL well under limits
+IN_FILTER_CHUNK = 500
+
+# Trend-line solver: "numpy" (closed-form kernel) or "sklearn" (LinearRegression)
+FORECAST_ENGINE = os.environ.get("FORECAST_ENGINE", "numpy")
+
+# Forecasts are truncated and confidences rounded; a value this close to such an
+# edge can land either side of it depending on the solver's last-bit rounding
+ROUNDING_EDGE_TOLERANCE = 1e-9
+
+# Rows per multi-row si_enrolment_forecasts upsert request
+FORECAST_WRITE_CHUNK_SIZE = int(os.environ.get("FORECAST_WRITE_CHUNK_SIZE", "500"))
+
+# Unique key of si_enrolment_forecasts; re-runs overwrite instead of appending
+FORECAST_CONFLICT_KEY = ("school_id", "forecast_year", "grade", "model_used")
+
+GRADE_ORDER = ["PP3", "PP2", "PP1", "Class 1", "Class 2", "Class 3",
+               "Class 4", "Class 5", "Class 6", "Class 7", "Class 8",
+               "Class 9", "Class 10", "Class 11", "Class 12"]
+GRADE_INDEX = {g: k for k, g in enumerate(GRADE_ORDER)}
+
+# Used for grade transitions never observed at a school
+DEFAULT_PROGRESSION_RATE = 0.95
+
+# Enrolment history changes once per academic year; cache it per school
+ENROLMENT_CACHE_SIZE = int(os.environ.get("ENROLMENT_CACHE_SIZE", "10000"))
+ENROLMENT_CACHE_TTL = float(os.environ.get("ENROLMENT_CACHE_TTL", str(6 * 3600)))
+
+_enrolment_cache = TTLCache(ENROLMENT_CACHE_SIZE, ENROLMENT_CACHE_TTL)
+
+# Bump when forecast logic changes so stored fingerprints stop matching
+FORECAST_MODEL_VERSION = 1
+
+# Last saved forecast per school, served again while its fingerprint matches
+FORECAST_MEMO_SIZE = int(os.environ.get("FORECAST_MEMO_SIZE", "10000"))
+FORECAST_MEMO_TTL = float(os.environ.get("FORECAST_MEMO_TTL", str(24 * 3600)))
+
+_forecast_memo = TTLCache(FORECAST_MEMO_SIZE, FORECAST_MEMO_TTL)
 
 
 def get_enrolment_data(school_id: int) -> list[dict]:
-    """Fetch enrolment history for a school."""
+    """Fetch enrolment history for a school (served from cache when warm)."""
+    cached = _enrolment_cache.get(school_id)
+    if cached is not None:
+        return cached
     db = get_db()
     result = db.table("si_enrolment_history") \
         .select("*") \
         .eq("school_id", school_id) \
         .order("academic_year") \
         .execute()
+    _enrolment_cache.set(school_id, result.data)
     return result.data
 
 
-def forecast_school(school_id: int, years_ahead: int = 1) -> dict:
-    """Generate enrolment forecast for a school."""
-    records = get_enrolment_data(school_id)
-    if not records:
-        return {"school_id": school_id, "forecasts": [], "overall_trend": "STABLE", "growth_rate": 0.0}
+def warm_enrolment_cache(district_id: int) -> int:
+    """Load a whole district's enrolment history into the cache in one query.
 
-    # Group by year
-    by_year = {}
+    Returns the number of schools cached.
+    """
+    db = get_db()
+    records = fetch_all(lambda: db.table("si_enrolment_history")
+                        .select("*, si_schools!inner(district_id)")
+                        .eq("si_schools.district_id", district_id)
+                        .order("school_id")
+                        .order("academic_year")
+                        .order("id"))
+    by_school = {}
     for r in records:
-        yr = r["academic_year"]
-        by_year.setdefault(yr, {"boys": 0, "girls": 0, "total": 0})
-        by_year[yr]["boys"] += r.get("boys", 0)
-        by_year[yr]["girls"] += r.get("girls", 0)
-        by_year[yr]["total"] += r.get("total", 0)
-
-    years = sorted(by_year.keys())
-    if len(years) < 2:
-        return {
-            "school_id": school_id,
-            "forecasts": [],
-            "overall_trend": "STABLE",
-            "growth_rate": 0.0,
-        }
+        r.pop("si_schools", None)
+        by_school.setdefault(r["school_id"], []).append(r)
+    for school_id, school_records in by_school.items():
+        _enrolment_cache.set(school_id, school_records)
+    return len(by_school)
+
+
+def invalidate_enrolment_cache(school_ids: list[int] | None = None) -> int:
+    """Drop cached history after enrolment is seeded or upserted (all schools if None)."""
+    return _enrolment_cache.invalidate(school_ids)
+
+
+def enrolment_cache_stats() -> dict:
+    return _enrolment_cache.stats()
+
+
+def get_enrolment_history(school_ids: list[int] | None = None) -> list[dict]:
+    """Fetch enrolment history for many schools (all schools if None)."""
+    db = get_db()
+
+    def query(ids=None):
+        q = db.table("si_enrolment_history").select("*")
+        if ids is not None:
+            q = q.in_("school_id", ids)
+        return q.order("school_id").order("academic_year").order("id")
+
+    if school_ids is None:
+        return fetch_all(query)
+
+    records = []
+    for i in range(0, len(school_ids), IN_FILTER_CHUNK):
+        chunk = school_ids[i:i + IN_FILTER_CHUNK]
+        records.extend(fetch_all(lambda: query(chunk)))
+    return records
+
+
+def saved_forecast_schools(school_ids: list[int]) -> set[int]:
+    """Schools among `school_ids` that have a forecast in si_enrolment_forecasts."""
+    db = get_db()
+    found = set()
+    for i in range(0, len(school_ids), IN_FILTER_CHUNK):
+        chunk = school_ids[i:i + IN_FILTER_CHUNK]
+        rows = fetch_all(lambda: db.table("si_enrolment_forecasts")
+                         .select("school_id")
+                         .in_("school_id", chunk)
+                         .eq("grade", "ALL")
+                         .eq("model_used", "LinearRegression")
+                         .order("id"))
+        found.update(r["school_id"] for r in rows)
+    return found
+
+
+def history_fingerprint(records: list[dict], years_ahead: int, engine: str | None = None) -> str:
+    """Stable hash of a school's enrolment history and the forecast settings.
+
+    Only the modelled fields count (not ids or timestamps), in sorted order,
+    so an unchanged history always produces the same fingerprint.
+    """
+    rows = sorted(
+        (r["academic_year"], r.get("grade", ""), r.get("boys", 0), r.get("girls", 0), r.get("total", 0))
+        for r in records
+    )
+    key = (FORECAST_MODEL_VERSION, engine or FORECAST_ENGINE, years_ahead, rows)
+    return hashlib.sha1(repr(key).encode()).hexdigest()
 
-    # Linear regression on total enrolment
-    X = np.arange(len(years)).reshape(-1, 1)
-    y_total = np.array([by_year[yr]["total"] for yr in years])
-    y_boys = np.array([by_year[yr]["boys"] for yr in years])
-    y_girls = np.array([by_year[yr]["girls"] for yr in years])
 
-    model_total = LinearRegression().fit(X, y_total)
-    model_boys = LinearRegression().fit(X, y_boys)
-    model_girls = LinearRegression().fit(X, y_girls)
+def forecast_school(school_id: int, years_ahead: int = 1, engine: str | None = None) -> dict:
+    """Generate enrolment forecast for a school.
 
+    If the school's last saved forecast (see `remember_forecast`) has the same
+    history fingerprint, that result is returned with `cached` set, and
+    callers can skip saving it again.
+    """
+    records = get_enrolment_data(school_id)
+    fingerprint = history_fingerprint(records, years_ahead, engine)
+
+    memo = _forecast_memo.get(school_id)
+    if memo is not None and memo[0] == fingerprint:
+        return {**copy.deepcopy(memo[1]), "cached": True}
+
+    result = _forecast_batch({school_id: records}, years_ahead, engine)[0]
+    return {**result, "fingerprint": fingerprint, "cached": False}
+
+
+def remember_forecast(school_id: int, result: dict):
+    """Memoize a forecast once it has been saved."""
+    _forecast_memo.set(school_id, (result["fingerprint"], copy.deepcopy(result)))
+
+
+def forecast_schools(school_ids: list[int] | None = None, years_ahead: int = 1,
+                     engine: str | None = None, known_fingerprints: dict[int, str] | None = None) -> list[dict]:
+    """Batch engine: forecast many schools from a single history fetch.
+
+    Returns one result per school (same shape as `forecast_school`), each with
+    its history `fingerprint`. Schools in `school_ids` without any history get
+    an empty forecast list. Schools whose fingerprint equals the one in
+    `known_fingerprints` are not refit; they come back with `unchanged` set
+    and no forecasts.
+    """
+    records_by_school = {sid: [] for sid in school_ids or []}
+    for r in get_enrolment_history(school_ids):
+        records_by_school.setdefault(r["school_id"], []).append(r)
+
+    fingerprints = {
+        sid: history_fingerprint(records, years_ahead, engine)
+        for sid, records in records_by_school.items()
+    }
+    known_fingerprints = known_fingerprints or {}
+    unchanged = [sid for sid, fp in fingerprints.items() if known_fingerprints.get(sid) == fp]
+    for sid in unchanged:
+        del records_by_school[sid]
+
+    results = _forecast_batch(records_by_school, years_ahead, engine)
+    for r in results:
+        r["fingerprint"] = fingerprints[r["school_id"]]
+        r["unchanged"] = False
+    results.extend({
+        "school_id": sid,
+        "forecasts": [],
+        "overall_trend": "STABLE",
+        "growth_rate": 0.0,
+        "fingerprint": fingerprints[sid],
+        "unchanged": True,
+    } for sid in unchanged)
+    return results
+
+
+def _ols_fit(Y: np.ndarray, counts: np.ndarray | None = None):
+    """Closed-form least squares of each row of Y against x = 0, 1, ..., n-1.
+
+    Rows are left-aligned series, zero-padded past `counts[i]` points
+    (all T columns are used when counts is None). Sums run column by column
+    so padding never changes a row's result. Returns (slope, intercept, r2).
+    """
+    Y = np.asarray(Y, dtype=float)
+    k, T = Y.shape
+    n = np.full(k, T) if counts is None else np.asarray(counts)
+    valid = np.arange(T) < n[:, None]
+    x_mean = (n - 1) / 2.0
+
+    y_sum = np.zeros(k)
+    for t in range(T):
+        y_sum += np.where(valid[:, t], Y[:, t], 0.0)
+    y_mean = y_sum / n
+
+    sxy = np.zeros(k)
+    sxx = np.zeros(k)
+    for t in range(T):
+        dx = np.where(valid[:, t], t - x_mean, 0.0)
+        sxy += dx * np.where(valid[:, t], Y[:, t] - y_mean, 0.0)
+        sxx += dx * dx
+    slope = sxy / sxx
+    intercept = y_mean - slope * x_mean
+
+    ss_res = np.zeros(k)
+    ss_tot = np.zeros(k)
+    for t in range(T):
+        res = np.where(valid[:, t], Y[:, t] - (slope * t + intercept), 0.0)
+        dev = np.where(valid[:, t], Y[:, t] - y_mean, 0.0)
+        ss_res += res * res
+        ss_tot += dev * dev
+    # Same convention as sklearn's r2_score for constant targets
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r2 = np.where(ss_tot > 0, 1 - ss_res / ss_tot, np.where(ss_res > 0, 0.0, 1.0))
+    return slope, intercept, r2
+
+
+def _sklearn_fit(Y: np.ndarray, counts: np.ndarray | None = None):
+    """Fallback engine: sklearn LinearRegression, same contract as `_ols_fit`.
+
+    Rows with the same number of points (fewer than 8) are fit together as
+    one multi-output regression. That gives bit for bit the coefficients and
+    R² of fitting each row on its own, because numpy sums fewer than 8 values
+    in order either way. Longer rows are fit one at a time.
+    """
+    Y = np.asarray(Y, dtype=float)
+    k, T = Y.shape
+    n = np.full(k, T) if counts is None else np.asarray(counts)
+    slope, intercept, r2 = np.zeros(k), np.zeros(k), np.zeros(k)
+    for m in np.unique(n):
+        rows = np.flatnonzero(n == m)
+        X = np.arange(m).reshape(-1, 1)
+        if m < 8:
+            y = Y[rows, :m].T
+            model = LinearRegression().fit(X, y)
+            slope[rows] = model.coef_[:, 0]
+            intercept[rows] = model.intercept_
+            r2[rows] = _r2_columns(y, model.predict(X))
+            continue
+        for i in rows:
+            model = LinearRegression().fit(X, Y[i, :m])
+            slope[i] = model.coef_[0]
+            intercept[i] = model.intercept_
+            r2[i] = model.score(X, Y[i, :m])
+    return slope, intercept, r2
+
+
+def _r2_columns(y: np.ndarray, pred: np.ndarray) -> np.ndarray:
+    """sklearn's r2_score of each column (constant columns: 1.0 if fit exactly, else 0.0)."""
+    ss_res = ((y - pred) ** 2).sum(axis=0)
+    ss_tot = ((y - y.mean(axis=0)) ** 2).sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(ss_tot != 0, 1 - ss_res / ss_tot, np.where(ss_res == 0, 1.0, 0.0))
+
+
+def _on_rounding_edge(value: float) -> bool:
+    """Whether ``value`` is within floating-point error of an integer."""
+    return abs(value - round(value)) <= ROUNDING_EDGE_TOLERANCE * max(1.0, abs(value))
+
+
+ENGINES = {
+    "numpy": _ols_fit,
+    "sklearn": _sklearn_fit,
+}
+
+
+def _forecast_batch(records_by_school: dict[int, list[dict]], years_ahead: int,
+                    engine: str | None = None) -> list[dict]:
+    """Pivot history into (school × year) matrices and forecast every school."""
+    engine = engine or FORECAST_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown forecast engine: {engine}")
+    fit = ENGINES[engine]
+
+    school_ids = list(records_by_school)
+    if not school_ids:
+        return []
+
+    year_labels = sorted({r["academic_year"] for recs in records_by_school.values() for r in recs})
+    year_index = {yr: j for j, yr in enumerate(year_labels)}
+    S, Y = len(school_ids), len(year_labels)
+
+    # Pivot: sum grades into one (total, boys, girls) value per school-year,
+    # and keep grade-wise totals as a (school × year × grade) cohort tensor
+    rows, cols, grades, vals = [], [], [], []
+    for i, sid in enumerate(school_ids):
+        for r in records_by_school[sid]:
+            rows.append(i)
+            cols.append(year_index[r["academic_year"]])
+            grades.append(GRADE_INDEX.get(r.get("grade", ""), -1))
+            vals.append((r.get("total", 0), r.get("boys", 0), r.get("girls", 0)))
+    rows = np.array(rows, dtype=np.intp)
+    cols = np.array(cols, dtype=np.intp)
+    grades = np.array(grades, dtype=np.intp)
+    pivot = np.zeros((3, S, Y), dtype=np.int64)
+    cohort = np.zeros((S, Y, len(GRADE_ORDER)))
+    present = np.zeros((S, Y), dtype=bool)
+    if len(rows):
+        vals = np.array(vals, dtype=np.int64).T
+        np.add.at(pivot, (slice(None), rows, cols), vals)
+        present[rows, cols] = True
+        known = grades >= 0
+        cohort[rows[known], cols[known], grades[known]] = vals[0, known]
+
+    # Left-align each school's observed years so x = 0..n-1 as in a per-school fit
+    counts = present.sum(axis=1)
+    r_idx, c_idx = np.nonzero(present)
+    pos = (np.cumsum(present, axis=1) - 1)[r_idx, c_idx]
+    series = np.zeros_like(pivot)
+    series[:, r_idx, pos] = pivot[:, r_idx, c_idx]
+    cohort_series = np.zeros_like(cohort)
+    cohort_series[r_idx, pos] = cohort[r_idx, c_idx]
+
+    # Solve every (total, boys, girls) trend line in one pass
+    fit_rows = np.flatnonzero(counts >= 2)
+    slope = np.zeros((3, S))
+    intercept = np.zeros((3, S))
+    r2 = np.zeros(S)
+
+    def solve(rows: np.ndarray, solver):
+        T = int(counts[rows].max())
+        stacked = series[:, rows, :T].reshape(3 * len(rows), T)
+        s, b, r = solver(stacked, np.tile(counts[rows], 3))
+        slope[:, rows] = s.reshape(3, -1)
+        intercept[:, rows] = b.reshape(3, -1)
+        r2[rows] = r.reshape(3, -1)[0]
+
+    if len(fit_rows):
+        solve(fit_rows, fit)
+
+    # Grade-wise projections for every school in one pass
+    cohort_pred = np.zeros((S, years_ahead, len(GRADE_ORDER) - 1), dtype=np.int64)
+    has_rate = np.zeros((S, len(GRADE_ORDER) - 1), dtype=bool)
+    if len(fit_rows):
+        cohort_pred[fit_rows], has_rate[fit_rows] = _cohort_progression(
+            cohort_series[fit_rows], counts[fit_rows], years_ahead,
+        )
+
+    def assemble(i: int) -> dict:
+        n = int(counts[i])
+        years = [year_labels[j] for j in np.flatnonzero(present[i])]
+        return _assemble_forecast(
+            school_ids[i], years, series[0, i, :n], slope[:, i], intercept[:, i], r2[i], years_ahead,
+        )
+
+    results = {}
+    on_edge = []
+    for i, sid in enumerate(school_ids):
+        if counts[i] < 2:
+            results[i] = {
+                "school_id": sid,
+                "forecasts": [],
+                "overall_trend": "STABLE",
+                "growth_rate": 0.0,
+            }
+            continue
+        results[i] = assemble(i)
+        if results[i].pop("on_rounding_edge") and fit is _ols_fit:
+            on_edge.append(i)
+
+    # The closed form and sklearn's lstsq can differ in the last bit. Where a
+    # forecast or its confidence sits on a truncation / rounding edge, that
+    # would change the saved number, so those schools are refit with sklearn.
+    if on_edge:
+        solve(np.array(on_edge), _sklearn_fit)
+        for i in on_edge:
+            results[i] = assemble(i)
+            results[i].pop("on_rounding_edge")
+
+    for i, result in results.items():
+        if counts[i] >= 2:
+            years = [year_labels[j] for j in np.flatnonzero(present[i])]
+            result["forecasts"].extend(_cohort_records(years, cohort_pred[i], has_rate[i]))
+    return list(results.values())
+
+
+@lru_cache(maxsize=1024)
+def _forecast_year(last_year: str, ahead: int) -> str:
+    """Academic year label `ahead` years after e.g. "2024-25"."""
+    last_year_parts = last_year.split("-")
+    try:
+        start_yr = int(last_year_parts[0]) + ahead
+        end_yr = int("20" + last_year_parts[1]) + ahead if len(last_year_parts[1]) == 2 else int(last_year_parts[1]) + ahead
+        return f"{start_yr}-{str(end_yr)[-2:]}"
+    except (ValueError, IndexError):
+        return f"Year+{ahead}"
+
+
+def _assemble_forecast(school_id: int, years: list[str], y_total: np.ndarray,
+                       slope: np.ndarray, intercept: np.ndarray, r2: float, years_ahead: int) -> dict:
+    """Turn fitted (total, boys, girls) trend lines into a school's forecast.
+
+    ``on_rounding_edge`` in the result tells whether a forecast or confidence
+    was within floating-point error of its truncation / rounding edge.
+    """
     # Calculate growth rate
     if y_total[0] > 0:
         growth_rate = ((y_total[-1] - y_total[0]) / y_total[0]) * 100 / max(len(years) - 1, 1)
@@ -72,12 +454,10 @@ def forecast_school(school_id: int, years_ahead: int = 1) -> dict:
 
     # Generate forecasts
     forecasts = []
-    last_year_parts = years[-1].split("-")
 
     # Confidence = model_fit × data_quality × horizon_decay × volatility_factor
     # model_fit: R² score of linear regression (how well the line fits)
-    r2 = float(model_total.score(X, y_total))
-    model_fit = max(0.5, min(0.98, r2))
+    model_fit = max(0.5, min(0.98, float(r2)))
 
     # data_quality: more historical years = more reliable
     n_years = len(years)
@@ -109,27 +489,20 @@ def forecast_school(school_id: int, years_ahead: int = 1) -> dict:
     # horizon_decay: further predictions are less reliable
     horizon_decay = {1: 1.0, 2: 0.92, 3: 0.82}
 
+    on_edge = False
     for ahead in range(1, years_ahead + 1):
-        future_x = np.array([[len(years) - 1 + ahead]])
-        pred_total = max(0, int(model_total.predict(future_x)[0]))
-        pred_boys = max(0, int(model_boys.predict(future_x)[0]))
-        pred_girls = max(0, int(model_girls.predict(future_x)[0]))
-
-        # Compute forecast year string
-        try:
-            start_yr = int(last_year_parts[0]) + ahead
-            end_yr = int("20" + last_year_parts[1]) + ahead if len(last_year_parts[1]) == 2 else int(last_year_parts[1]) + ahead
-            forecast_year = f"{start_yr}-{str(end_yr)[-2:]}"
-        except (ValueError, IndexError):
-            forecast_year = f"Year+{ahead}"
+        future_x = len(years) - 1 + ahead
+        raw = [slope[k] * future_x + intercept[k] for k in range(3)]
+        pred_total, pred_boys, pred_girls = (max(0, int(v)) for v in raw)
 
         decay = horizon_decay.get(ahead, 0.60)
         conf = model_fit * data_quality * decay * volatility_factor
         conf = max(0.20, min(0.95, conf))
+        on_edge = on_edge or any(_on_rounding_edge(v) for v in raw) or _on_rounding_edge(conf * 100 - 0.5)
 
         forecasts.append({
             "school_id": school_id,
-            "forecast_year": forecast_year,
+            "forecast_year": _forecast_year(years[-1], ahead),
             "grade": "ALL",
             "predicted_total": pred_total,
             "predicted_boys": pred_boys,
@@ -138,107 +511,121 @@ def forecast_school(school_id: int, years_ahead: int = 1) -> dict:
             "model_used": "LinearRegression",
         })
 
-    # Grade-wise forecasts using cohort progression
-    grade_forecasts = _cohort_forecast(records, years, years_ahead)
-    forecasts.extend(grade_forecasts)
-
     return {
         "school_id": school_id,
         "forecasts": forecasts,
         "overall_trend": trend,
         "growth_rate": round(growth_rate, 2),
+        "on_rounding_edge": on_edge,
     }
 
 
-def _cohort_forecast(records: list[dict], years: list[str], years_ahead: int) -> list[dict]:
-    """Cohort progression model: track how students move between grades."""
-    # Group by year and grade
-    data = {}
-    for r in records:
-        yr = r["academic_year"]
-        grade = r.get("grade", "")
-        data.setdefault(yr, {})[grade] = r.get("total", 0)
-
-    grade_order = ["PP3", "PP2", "PP1", "Class 1", "Class 2", "Class 3",
-                   "Class 4", "Class 5", "Class 6", "Class 7", "Class 8",
-                   "Class 9", "Class 10", "Class 11", "Class 12"]
-
-    # Compute progression rates between consecutive years
-    progression_rates = {}
-    for i in range(len(years) - 1):
-        curr_year = data.get(years[i], {})
-        next_year = data.get(years[i + 1], {})
-        for j in range(len(grade_order) - 1):
-            g_from = grade_order[j]
-            g_to = grade_order[j + 1]
-            from_count = curr_year.get(g_from, 0)
-            to_count = next_year.get(g_to, 0)
-            if from_count > 0:
-                rate = to_count / from_count
-                progression_rates.setdefault((g_from, g_to), []).append(rate)
-
-    # Average progression rates
-    avg_rates = {}
-    for key, rates in progression_rates.items():
-        avg_rates[key] = np.mean(rates)
-
-    # Forecast using progression
-    forecasts = []
-    last_year = data.get(years[-1], {})
-    last_year_parts = years[-1].split("-")
-
-    # Cohort confidence: based on how many year-pairs we have for progression rates
-    n_year_pairs = len(years) - 1
+def _cohort_progression(cohort: np.ndarray, counts: np.ndarray, years_ahead: int):
+    """Cohort progression model over a (school × year × grade) tensor.
+
+    Rows are left-aligned like `series` in `_forecast_batch`. The transition
+    rate grade g → g+1 is the mean of next-year g+1 / this-year g over every
+    observed year pair with a non-zero source. Each horizon is projected from
+    the previous one (the entry grade carries forward), so year +2 promotes
+    the year +1 cohort rather than re-using the last observed year.
+
+    Returns predicted counts (school × horizon × target grade) and whether
+    each transition rate came from data rather than the default.
+    """
+    S, T, G = cohort.shape
+    rate_sum = np.zeros((S, G - 1))
+    rate_n = np.zeros((S, G - 1), dtype=np.int64)
+    for t in range(T - 1):
+        src = cohort[:, t, :-1]
+        dst = cohort[:, t + 1, 1:]
+        ok = (t + 1 < counts)[:, None] & (src > 0)
+        rate_sum += np.where(ok, dst / np.where(ok, src, 1.0), 0.0)
+        rate_n += ok
+    has_rate = rate_n > 0
+    rates = np.where(has_rate, rate_sum / np.maximum(rate_n, 1), DEFAULT_PROGRESSION_RATE)
+
+    predicted = np.zeros((S, years_ahead, G - 1), dtype=np.int64)
+    current = cohort[np.arange(S), counts - 1]
+    for h in range(years_ahead):
+        promoted = current.copy()
+        promoted[:, 1:] = np.maximum(0, np.trunc(current[:, :-1] * rates))
+        predicted[:, h] = promoted[:, 1:]
+        current = promoted
+    return predicted, has_rate
+
+
+@lru_cache(maxsize=None)
+def _cohort_confidence(n_year_pairs: int, ahead: int, has_actual_rate: bool) -> float:
+    """Cohort confidence from year-pair count, horizon and rate provenance."""
     cohort_data_quality = 0.75 if n_year_pairs <= 1 else (
         0.82 if n_year_pairs <= 2 else (0.88 if n_year_pairs <= 3 else 0.93)
     )
     cohort_horizon_decay = {1: 1.0, 2: 0.92, 3: 0.82}
+    decay = cohort_horizon_decay.get(ahead, 0.60)
+    # Per-grade confidence: if we have actual rate data, higher confidence
+    rate_quality = 0.85 if has_actual_rate else 0.50
+    return round(max(0.20, min(0.95, cohort_data_quality * decay * rate_quality)), 2)
 
-    for ahead in range(1, years_ahead + 1):
-        try:
-            start_yr = int(last_year_parts[0]) + ahead
-            end_yr = int("20" + last_year_parts[1]) + ahead if len(last_year_parts[1]) == 2 else int(last_year_parts[1]) + ahead
-            forecast_year = f"{start_yr}-{str(end_yr)[-2:]}"
-        except (ValueError, IndexError):
-            forecast_year = f"Year+{ahead}"
-
-        decay = cohort_horizon_decay.get(ahead, 0.60)
-
-        for j in range(1, len(grade_order)):
-            g_from = grade_order[j - 1]
-            g_to = grade_order[j]
-            rate = avg_rates.get((g_from, g_to), 0.95)  # Default 95% progression
-            from_count = last_year.get(g_from, 0)
-            predicted = max(0, int(from_count * rate))
-
-            # Per-grade confidence: if we have actual rate data, higher confidence
-            has_actual_rate = (g_from, g_to) in avg_rates
-            rate_quality = 0.85 if has_actual_rate else 0.50
-            conf = round(max(0.20, min(0.95, cohort_data_quality * decay * rate_quality)), 2)
-
-            if predicted > 0:
-                forecasts.append({
-                    "school_id": 0,  # Will be set by caller
-                    "forecast_year": forecast_year,
-                    "grade": g_to,
-                    "predicted_total": predicted,
-                    "confidence": conf,
-                    "model_used": "CohortProgression",
-                })
 
+def _cohort_records(years: list[str], predicted: np.ndarray, has_rate: np.ndarray) -> list[dict]:
+    """Forecast rows for one school's non-zero cohort projections."""
+    forecasts = []
+    for h, j in zip(*np.nonzero(predicted > 0)):
+        ahead = int(h) + 1
+        forecasts.append({
+            "school_id": 0,  # Will be set by caller
+            "forecast_year": _forecast_year(years[-1], ahead),
+            "grade": GRADE_ORDER[j + 1],
+            "predicted_total": int(predicted[h, j]),
+            "confidence": _cohort_confidence(len(years) - 1, ahead, bool(has_rate[j])),
+            "model_used": "CohortProgression",
+        })
     return forecasts
 
 
-def save_forecasts(school_id: int, forecasts: list[dict]):
-    """Save forecasts to Supabase."""
-    db = get_db()
+def save_forecasts(school_id: int, forecasts: list[dict], chunk_size: int | None = None):
+    """Save one school's forecasts to Supabase."""
     for f in forecasts:
         f["school_id"] = school_id
-        db.table("si_enrolment_forecasts").insert({
-            "school_id": school_id,
+    errors = save_forecasts_bulk(forecasts, chunk_size)
+    if errors:
+        raise RuntimeError(errors[0]["error"])
+
+
+def save_forecasts_bulk(forecasts: list[dict], chunk_size: int | None = None) -> list[dict]:
+    """Upsert forecast rows (any number of schools) in chunked multi-row requests.
+
+    Rows are keyed on (school_id, forecast_year, grade, model_used). Returns one
+    error entry per failed chunk, with the school ids that chunk covered.
+    """
+    chunk_size = chunk_size or FORECAST_WRITE_CHUNK_SIZE
+
+    # One row per key: Postgres rejects an upsert that hits the same row twice
+    rows = {}
+    for f in forecasts:
+        row = {
+            "school_id": f["school_id"],
             "forecast_year": f["forecast_year"],
             "grade": f["grade"],
             "predicted_total": f["predicted_total"],
             "confidence": f["confidence"],
             "model_used": f["model_used"],
-        }).execute()
+        }
+        rows[tuple(row[k] for k in FORECAST_CONFLICT_KEY)] = row
+    rows = list(rows.values())
+
+    db = get_db()
+    errors = []
+    for i in range(0, len(rows), chunk_size):
+        chunk = rows[i:i + chunk_size]
+        try:
+            db.table("si_enrolment_forecasts") \
+                .upsert(chunk, on_conflict=",".join(FORECAST_CONFLICT_KEY), returning=ReturnMethod.minimal) \
+                .execute()
+        except Exception as e:
+            errors.append({
+                "school_ids": sorted({r["school_id"] for r in chunk}),
+                "rows": len(chunk),
+                "error": str(e),
+            })
+    return errors
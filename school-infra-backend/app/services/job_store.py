@@ -0,0 +1,237 @@
+"""SQLite-backed store for background jobs, their shard plans and per-shard
+checkpoints, the history fingerprints of the last forecast saved for each school, and the
+watermarks of incremental passes (how far into the source tables they read)."""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+JOB_STORE_PATH = os.environ.get("JOB_STORE_PATH", os.path.join(BACKEND_DIR, "jobs.sqlite3"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id           TEXT PRIMARY KEY,
+    kind         TEXT NOT NULL,
+    status       TEXT NOT NULL DEFAULT 'PENDING',
+    params       TEXT NOT NULL DEFAULT '{}',
+    progress     TEXT NOT NULL DEFAULT '{}',
+    result       TEXT,
+    error        TEXT,
+    owner        TEXT,
+    created_at   REAL NOT NULL,
+    started_at   REAL,
+    finished_at  REAL,
+    updated_at   REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS job_shards (
+    job_id       TEXT NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    shard_key    TEXT NOT NULL,
+    position     INTEGER NOT NULL,
+    district_id  INTEGER,
+    school_ids   TEXT NOT NULL,
+    PRIMARY KEY (job_id, shard_key)
+);
+
+CREATE TABLE IF NOT EXISTS job_checkpoints (
+    job_id        TEXT NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    shard_key     TEXT NOT NULL,
+    result        TEXT NOT NULL,
+    completed_at  REAL NOT NULL,
+    PRIMARY KEY (job_id, shard_key)
+);
+
+CREATE TABLE IF NOT EXISTS forecast_fingerprints (
+    school_id    INTEGER PRIMARY KEY,
+    fingerprint  TEXT NOT NULL,
+    updated_at   REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS watermarks (
+    name        TEXT PRIMARY KEY,
+    value       TEXT NOT NULL,
+    updated_at  REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status);
+CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs(created_at);
+"""
+
+_JSON_FIELDS = ("params", "progress", "result")
+
+
+class JobStore:
+    """Jobs and checkpoints in one local SQLite file, safe to share across threads."""
+
+    def __init__(self, path: str = JOB_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        # Stores created before jobs were claimed by an owning process
+        columns = {r["name"] for r in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "owner" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+
+    def create(self, kind: str, params: dict) -> dict:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, params, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(params), now, now),
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _decode(row) if row else None
+
+    def recent(self, limit: int = 20, status: str | None = None) -> list[dict]:
+        query = "SELECT * FROM jobs"
+        args = []
+        if status:
+            query += " WHERE status = ?"
+            args.append(status)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        args.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, args).fetchall()
+        return [_decode(r) for r in rows]
+
+    def unfinished(self) -> list[dict]:
+        """Jobs that were queued or running when the process last stopped."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE status IN ('PENDING', 'RUNNING') ORDER BY created_at"
+            ).fetchall()
+        return [_decode(r) for r in rows]
+
+    def update(self, job_id: str, **fields):
+        """Set any of status, progress, result, error, started_at, finished_at."""
+        if not fields:
+            return
+        fields["updated_at"] = time.time()
+        values = [json.dumps(v) if k in _JSON_FIELDS else v for k, v in fields.items()]
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*values, job_id))
+
+    def claim(self, job_id: str, owner: str, expected_owner: str | None = None) -> bool:
+        """Mark a PENDING/RUNNING job RUNNING under ``owner`` if ``expected_owner``
+        still holds it (None: nobody). Atomic, so of several processes claiming
+        the same job exactly one gets True."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'RUNNING', owner = ?, started_at = COALESCE(started_at, ?), "
+                "updated_at = ? WHERE id = ? AND status IN ('PENDING', 'RUNNING') AND owner IS ?",
+                (owner, now, now, job_id, expected_owner),
+            )
+        return cursor.rowcount == 1
+
+    def requeue(self, job_id: str) -> bool:
+        """Set a FAILED job back to PENDING, unowned; False if it was not FAILED."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'PENDING', owner = NULL, error = NULL, finished_at = NULL, "
+                "updated_at = ? WHERE id = ? AND status = 'FAILED'",
+                (time.time(), job_id),
+            )
+        return cursor.rowcount == 1
+
+    def shards(self, job_id: str) -> list[tuple[str, int | None, list[int]]] | None:
+        """The job's stored shard plan as (shard_key, district_id, school_ids), or None."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT shard_key, district_id, school_ids FROM job_shards WHERE job_id = ? ORDER BY position",
+                (job_id,),
+            ).fetchall()
+        return [(r["shard_key"], r["district_id"], json.loads(r["school_ids"])) for r in rows] or None
+
+    def save_shards(self, job_id: str, shards: list[tuple[str, int | None, list[int]]]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO job_shards (job_id, shard_key, position, district_id, school_ids) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(job_id, key, i, district_id, json.dumps(ids)) for i, (key, district_id, ids) in enumerate(shards)],
+            )
+
+    def save_checkpoint(self, job_id: str, shard_key: str, result: dict):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO job_checkpoints (job_id, shard_key, result, completed_at) "
+                "VALUES (?, ?, ?, ?)",
+                (job_id, shard_key, json.dumps(result), time.time()),
+            )
+
+    def checkpoints(self, job_id: str) -> dict[str, dict]:
+        """Completed shards of a job, keyed by shard key."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT shard_key, result FROM job_checkpoints WHERE job_id = ? ORDER BY completed_at",
+                (job_id,),
+            ).fetchall()
+        return {r["shard_key"]: json.loads(r["result"]) for r in rows}
+
+    def fingerprints(self, school_ids: list[int]) -> dict[int, str]:
+        """Fingerprint of the last saved forecast for each of these schools."""
+        found = {}
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for i in range(0, len(school_ids), 900):
+                chunk = school_ids[i:i + 900]
+                rows = self._conn.execute(
+                    f"SELECT school_id, fingerprint FROM forecast_fingerprints "
+                    f"WHERE school_id IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                found.update((r["school_id"], r["fingerprint"]) for r in rows)
+        return found
+
+    def save_fingerprints(self, fingerprints: dict[int, str]):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO forecast_fingerprints (school_id, fingerprint, updated_at) "
+                "VALUES (?, ?, ?)",
+                [(sid, fp, now) for sid, fp in fingerprints.items()],
+            )
+
+    def watermark(self, name: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM watermarks WHERE name = ?", (name,)).fetchone()
+        return row["value"] if row else None
+
+    def save_watermark(self, name: str, value: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO watermarks (name, value, updated_at) VALUES (?, ?, ?)",
+                (name, value, time.time()),
+            )
+
+
+def _decode(row: sqlite3.Row) -> dict:
+    job = dict(row)
+    for field in _JSON_FIELDS:
+        if job[field] is not None:
+            job[field] = json.loads(job[field])
+    return job
+
+
+_store: JobStore | None = None
+
+
+def get_job_store() -> JobStore:
+    global _store
+    if _store is None:
+        _store = JobStore()
+    return _store
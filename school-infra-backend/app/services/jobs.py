@@ -0,0 +1,180 @@
+"""
+Background Job Runner
+
+Long-running batches are submitted as jobs: the caller gets a job id back
+immediately and the work runs on a small worker pool. Handlers split their
+work into shards (one per district) and checkpoint each finished shard, so a
+job interrupted by a restart or failure resumes where it stopped.
+
+Several server processes may share the job store (e.g. uvicorn / gunicorn
+workers). A process runs a job only after claiming it atomically in the
+store, and at startup it resumes only jobs whose owning process is gone, so
+each job runs in one process at a time.
+"""
+
+import os
+import socket
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from app.services.job_store import get_job_store
+
+# Jobs running at once; each job may fan out further (e.g. a process pool)
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+
+# Seconds without progress after which a job owned by a process on another
+# host is taken to be abandoned (same-host owners are checked by pid)
+JOB_LEASE_S = float(os.environ.get("JOB_LEASE_S", "900"))
+
+# This process, as recorded in the jobs it claims: host:pid:token
+_HOST = socket.gethostname()
+_OWNER = f"{_HOST}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+_handlers: dict[str, Callable] = {}
+_pool: ThreadPoolExecutor | None = None
+
+
+class JobContext:
+    """What a handler sees: its params, completed shards and progress reporting."""
+
+    def __init__(self, job: dict):
+        self.job_id = job["id"]
+        self.params = job["params"]
+        self._store = get_job_store()
+        self.completed = self._store.checkpoints(self.job_id)
+        self._progress = dict(job["progress"] or {})
+
+    def shards(self, build: Callable[[], list[tuple]]) -> list[tuple]:
+        """The job's shards: built and stored on its first run, the stored ones on a resume.
+
+        Keeping the first run's membership means a checkpointed shard key
+        always covers the same items, even if the data has changed since.
+        """
+        plan = self._store.shards(self.job_id)
+        if plan is None:
+            plan = build()
+            self._store.save_shards(self.job_id, plan)
+        return plan
+
+    def checkpoint(self, shard_key: str, result: dict):
+        """Record a finished shard; it is skipped if the job is resumed."""
+        self._store.save_checkpoint(self.job_id, shard_key, result)
+        self.completed[shard_key] = result
+
+    def progress(self, **fields):
+        """Merge counters into the job's progress. `total`/`done` drive the ETA."""
+        self._progress.update(fields)
+        self._store.update(self.job_id, progress=self._progress)
+
+
+def job_handler(kind: str):
+    """Register the function that runs jobs of this kind."""
+    def register(fn: Callable[[JobContext], dict]):
+        _handlers[kind] = fn
+        return fn
+    return register
+
+
+def submit_job(kind: str, params: dict) -> str:
+    """Queue a new job and return its id."""
+    if kind not in _handlers:
+        raise ValueError(f"Unknown job kind: {kind}")
+    job = get_job_store().create(kind, params)
+    _get_pool().submit(_run_job, job["id"])
+    return job["id"]
+
+
+def resume_job(job_id: str) -> bool:
+    """Re-queue a failed job; finished shards are skipped."""
+    if not get_job_store().requeue(job_id):
+        return False
+    _get_pool().submit(_run_job, job_id)
+    return True
+
+
+def resume_unfinished_jobs() -> int:
+    """Re-queue jobs left PENDING/RUNNING by a process that is gone. Call at startup."""
+    jobs = [
+        j for j in get_job_store().unfinished()
+        if j["kind"] in _handlers and not _owner_alive(j)
+    ]
+    for job in jobs:
+        _get_pool().submit(_run_job, job["id"], job["owner"])
+    return len(jobs)
+
+
+def get_job(job_id: str) -> dict | None:
+    """Job record with elapsed time and ETA derived from progress."""
+    job = get_job_store().get(job_id)
+    if job is None:
+        return None
+    return _with_timing(job)
+
+
+def list_jobs(limit: int = 20, status: str | None = None) -> list[dict]:
+    return [_with_timing(j) for j in get_job_store().recent(limit, status)]
+
+
+def shutdown(wait: bool = False):
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=wait, cancel_futures=True)
+        _pool = None
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+    return _pool
+
+
+def _owner_alive(job: dict) -> bool:
+    """Whether the process that claimed an unfinished job may still be running it."""
+    owner = job["owner"]
+    if owner is None:
+        return False
+    if owner == _OWNER:
+        return True
+    host, pid, _ = owner.rsplit(":", 2)
+    if host != _HOST:
+        return time.time() - job["updated_at"] < JOB_LEASE_S
+    if int(pid) == os.getpid():
+        return False  # an earlier process that had this pid
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _run_job(job_id: str, expected_owner: str | None = None):
+    store = get_job_store()
+    if not store.claim(job_id, _OWNER, expected_owner):
+        return  # another process got it first
+    job = store.get(job_id)
+    try:
+        result = _handlers[job["kind"]](JobContext(job))
+        store.update(job_id, status="COMPLETED", result=result, finished_at=time.time())
+    except Exception as e:
+        store.update(job_id, status="FAILED", error=str(e), finished_at=time.time())
+
+
+def _with_timing(job: dict) -> dict:
+    job = {"job_id": job.pop("id"), **job}
+    progress = job["progress"] or {}
+    started = job["started_at"]
+    job["elapsed_s"] = round((job["finished_at"] or time.time()) - started, 1) if started else None
+    job["eta_s"] = None
+    total, done = progress.get("total"), progress.get("done")
+    if job["status"] == "RUNNING" and started and total and done:
+        # Rate measured since this (re)start, over work done since then
+        done_now = done - progress.get("done_at_start", 0)
+        if done_now > 0:
+            rate = (time.time() - progress.get("resumed_at", started)) / done_now
+            job["eta_s"] = round(rate * (total - done), 1)
+    return job
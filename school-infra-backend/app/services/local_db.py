@@ -0,0 +1,688 @@
+"""
+Local Database — embedded SQLite stand-in for the Supabase PostgREST API.
+
+Selected with DB_BACKEND=sqlite. The database at LOCAL_DB_PATH is created
+from the same schema.sql that defines the Supabase project, so the forecast,
+validation and analytics pipelines run unchanged without network access
+(offline development, reproducible benchmarks and load tests).
+
+Only the part of the PostgREST client the services use is implemented:
+
+    db.table(name).select(...).eq/neq/gt/gte/lt/lte/in_/is_(...)
+        .order(...).range(...)/.limit(...).execute()
+    db.table(name).insert/upsert(rows, on_conflict=...).execute()
+    db.table(name).update(values)/.delete() + filters .execute()
+    db.rpc(name, params).execute()
+
+Embedded resources in select ("*, si_schools!inner(district_id)") follow the
+table's foreign key. Postgres-only parts of the schema are replaced:
+LATERAL views and the trigger-maintained analytics rollups become SQLite
+views (the rollups are therefore always current), the updated_at touch
+triggers become SQLite triggers, and the SQL functions called over RPC are
+implemented in Python below.
+
+Usage (from school-infra-backend/):
+    python -m app.services.local_db init
+    python -m app.services.local_db info
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+LOCAL_DB_PATH = os.environ.get("LOCAL_DB_PATH", os.path.join(BACKEND_DIR, "local.sqlite3"))
+LOCAL_DB_SCHEMA = os.environ.get(
+    "LOCAL_DB_SCHEMA",
+    os.path.join(os.path.dirname(BACKEND_DIR), "school_infra_app", "supabase", "schema.sql"),
+)
+
+# Postgres views / tables that SQLite cannot express as written in schema.sql
+_SQLITE_VIEWS = {
+    "si_schools_view": """
+        SELECT
+            s.id,
+            s.udise_code,
+            s.school_name,
+            s.school_management,
+            s.school_category,
+            s.latitude,
+            s.longitude,
+            d.id                    AS district_id,
+            d.district_name,
+            m.id                    AS mandal_id,
+            m.mandal_name,
+            (SELECT SUM(eh.total)
+               FROM si_enrolment_history eh
+              WHERE eh.school_id = s.id
+              GROUP BY eh.academic_year
+              ORDER BY eh.academic_year DESC
+              LIMIT 1)              AS total_enrolment,
+            p.composite_score       AS priority_score,
+            p.priority_level,
+            s.created_at,
+            s.updated_at,
+            p.score_year            AS priority_score_year
+        FROM si_schools s
+        LEFT JOIN si_districts d ON d.id = s.district_id
+        LEFT JOIN si_mandals   m ON m.id = s.mandal_id
+        LEFT JOIN si_school_priority_scores p ON p.id = (
+            SELECT ps.id
+              FROM si_school_priority_scores ps
+             WHERE ps.school_id = s.id
+             ORDER BY ps.score_year DESC
+             LIMIT 1)
+    """,
+    "si_district_rollup": """
+        WITH school_rows AS (
+            SELECT COALESCE(s.district_id, 0) AS district_id,
+                   COALESCE((SELECT SUM(eh.total)
+                               FROM si_enrolment_history eh
+                              WHERE eh.school_id = s.id
+                              GROUP BY eh.academic_year
+                              ORDER BY eh.academic_year DESC
+                              LIMIT 1), 0) AS total_enrolment,
+                   COALESCE(NULLIF((SELECT ps.priority_level
+                                      FROM si_school_priority_scores ps
+                                     WHERE ps.school_id = s.id
+                                     ORDER BY ps.score_year DESC
+                                     LIMIT 1), ''), 'UNKNOWN') AS level
+            FROM si_schools s
+        ),
+        levels AS (
+            SELECT district_id, json_group_object(level, n) AS priority_distribution
+            FROM (SELECT district_id, level, COUNT(*) AS n
+                    FROM school_rows
+                   GROUP BY district_id, level)
+            GROUP BY district_id
+        ),
+        totals AS (
+            SELECT district_id,
+                   COUNT(*)                        AS total_schools,
+                   SUM(total_enrolment)            AS total_enrolment,
+                   SUM(upper(level) = 'CRITICAL')  AS critical_schools,
+                   SUM(upper(level) = 'HIGH')      AS high_schools
+            FROM school_rows
+            GROUP BY district_id
+        ),
+        keys AS (
+            SELECT id AS district_id FROM si_districts
+            UNION
+            SELECT district_id FROM totals
+        )
+        SELECT k.district_id,
+               d.district_name,
+               (SELECT COUNT(*) FROM si_mandals m WHERE m.district_id = k.district_id) AS total_mandals,
+               COALESCE(t.total_schools, 0)             AS total_schools,
+               COALESCE(t.total_enrolment, 0)           AS total_enrolment,
+               COALESCE(t.critical_schools, 0)          AS critical_schools,
+               COALESCE(t.high_schools, 0)              AS high_schools,
+               COALESCE(l.priority_distribution, '{}')  AS priority_distribution,
+               CURRENT_TIMESTAMP                        AS refreshed_at
+        FROM keys k
+        LEFT JOIN si_districts d ON d.id = k.district_id
+        LEFT JOIN totals t ON t.district_id = k.district_id
+        LEFT JOIN levels l ON l.district_id = k.district_id
+    """,
+    "si_district_infra_rollup": """
+        SELECT COALESCE(s.district_id, 0)             AS district_id,
+               dp.infra_type,
+               COUNT(*)                               AS plan_count,
+               SUM(COALESCE(dp.physical_count, 0))    AS physical_count,
+               SUM(COALESCE(dp.financial_amount, 0))  AS financial_amount,
+               CURRENT_TIMESTAMP                      AS refreshed_at
+        FROM si_demand_plans dp
+        JOIN si_schools s ON s.id = dp.school_id
+        GROUP BY 1, 2
+    """,
+}
+
+# Postgres -> SQLite column type / default rewrites for CREATE TABLE
+_TYPE_REWRITES = [
+    (re.compile(r"\bSERIAL PRIMARY KEY\b", re.I), "INTEGER PRIMARY KEY"),
+    (re.compile(r"\bTIMESTAMP WITH TIME ZONE\b", re.I), "TIMESTAMP"),
+    (re.compile(r"\bDEFAULT now\(\)", re.I), "DEFAULT CURRENT_TIMESTAMP"),
+    (re.compile(r"::jsonb?\b", re.I), ""),
+    (re.compile(r"\bJSONB\b", re.I), "TEXT"),
+    (re.compile(r"\bUUID\b", re.I), "TEXT"),
+]
+
+_COLUMN_DEF = re.compile(r"^\s*(\w+)\s+(JSONB|BOOLEAN)\b", re.I | re.M)
+
+# CREATE TRIGGER ... BEFORE UPDATE ON table ... EXECUTE FUNCTION si_touch_updated_at(columns)
+_TOUCH_TRIGGER = re.compile(
+    r"CREATE TRIGGER (\w+) BEFORE UPDATE ON (\w+).*si_touch_updated_at\(([^)]*)\)", re.I | re.S
+)
+
+# Computed view columns that are JSON / boolean in Postgres
+_JSON_COLUMNS = {"priority_distribution", "infra_gaps"}
+_BOOL_COLUMNS = {"has_assessment"}
+
+_OPERATORS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+_EMBED = re.compile(r"^(\w+)(!inner)?\((.*)\)$")
+
+_rpcs = {}
+
+
+class LocalResponse:
+    """The .data / .count of a PostgREST APIResponse."""
+
+    def __init__(self, data, count: int | None = None):
+        self.data = data
+        self.count = count
+
+
+class LocalClient:
+    """SQLite database behind the PostgREST client interface used by the services."""
+
+    def __init__(self, path: str = LOCAL_DB_PATH, schema_path: str = LOCAL_DB_SCHEMA):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._conn.execute("PRAGMA busy_timeout = 30000")
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode = WAL")
+        self._json_columns = set(_JSON_COLUMNS)
+        self._bool_columns = set(_BOOL_COLUMNS)
+        self._foreign_keys = {}
+        self.load_schema(schema_path)
+
+    def load_schema(self, schema_path: str):
+        """Create the schema.sql tables, indexes and views (idempotent)."""
+        with open(schema_path, encoding="utf-8") as f:
+            statements = _split_statements(f.read())
+
+        with self.transaction() as conn:
+            for stmt in statements:
+                head = " ".join(stmt.split()[:6]).upper()
+                if head.startswith("CREATE TABLE"):
+                    name = re.search(r"CREATE TABLE (?:IF NOT EXISTS )?(\w+)", stmt, re.I).group(1)
+                    for column, kind in _COLUMN_DEF.findall(stmt):
+                        (self._json_columns if kind.upper() == "JSONB" else self._bool_columns).add(column)
+                    if name not in _SQLITE_VIEWS:
+                        for pattern, replacement in _TYPE_REWRITES:
+                            stmt = pattern.sub(replacement, stmt)
+                        conn.execute(stmt)
+                elif head.startswith("CREATE INDEX"):
+                    conn.execute(stmt)
+                elif head.startswith("CREATE TRIGGER") and (touch := _TOUCH_TRIGGER.match(stmt)):
+                    _create_touch_trigger(conn, *touch.groups())
+                elif re.match(r"CREATE (OR REPLACE )?VIEW", head):
+                    name, body = re.match(r"CREATE (?:OR REPLACE )?VIEW (\w+) AS\s(.*)", stmt, re.I | re.S).groups()
+                    if name not in _SQLITE_VIEWS:
+                        conn.execute(f"DROP VIEW IF EXISTS {name}")
+                        conn.execute(f"CREATE VIEW {name} AS {body}")
+
+            for name, body in _SQLITE_VIEWS.items():
+                if _object_type(conn, name) == "table":
+                    conn.execute(f"DROP TABLE {name}")
+                conn.execute(f"DROP VIEW IF EXISTS {name}")
+                conn.execute(f"CREATE VIEW {name} AS {body}")
+
+    def table(self, name: str) -> "LocalQuery":
+        return LocalQuery(self, name)
+
+    from_ = table
+
+    def rpc(self, name: str, params: dict | None = None) -> "LocalRpc":
+        return LocalRpc(self, name, params or {})
+
+    def transaction(self):
+        return _Transaction(self)
+
+    def run(self, sql: str, params=()) -> list[sqlite3.Row]:
+        """Rows of one statement on the shared connection."""
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def decode(self, rows) -> list[dict]:
+        """sqlite3 rows as PostgREST JSON (parsed JSON columns, real booleans)."""
+        out = []
+        for row in rows:
+            record = {}
+            for key in row.keys():
+                value = row[key]
+                if value is not None:
+                    if key in self._json_columns and isinstance(value, str):
+                        value = json.loads(value)
+                    elif key in self._bool_columns:
+                        value = bool(value)
+                record[key] = value
+            out.append(record)
+        return out
+
+    def foreign_key(self, table: str, target: str) -> tuple[str, str]:
+        """(column of table, column of target) of the foreign key table -> target."""
+        key = (table, target)
+        if key not in self._foreign_keys:
+            fks = [(fk["from"], fk["to"] or "id")
+                   for fk in self.run(f"PRAGMA foreign_key_list({_quote(table)})")
+                   if fk["table"] == target]
+            if len(fks) != 1:
+                raise ValueError(f"Could not find a relationship between '{table}' and '{target}'")
+            self._foreign_keys[key] = fks[0]
+        return self._foreign_keys[key]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    aclose = close
+
+
+class AsyncLocalClient:
+    """LocalClient for code written against the async client (``await ....execute()``)."""
+
+    def __init__(self, client: LocalClient):
+        self._client = client
+
+    def table(self, name: str) -> "AsyncLocalQuery":
+        return AsyncLocalQuery(self._client, name)
+
+    from_ = table
+
+    def rpc(self, name: str, params: dict | None = None) -> "AsyncLocalRpc":
+        return AsyncLocalRpc(self._client, name, params or {})
+
+    async def aclose(self):
+        # The connection belongs to the sync client it wraps
+        pass
+
+
+class _Transaction:
+    def __init__(self, client: LocalClient):
+        self._client = client
+
+    def __enter__(self) -> sqlite3.Connection:
+        self._client._lock.acquire()
+        self._client._conn.execute("BEGIN")
+        return self._client._conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self._client._conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self._client._lock.release()
+
+
+class LocalQuery:
+    """Query builder mirroring postgrest's request builders."""
+
+    def __init__(self, client: LocalClient, table: str):
+        self._client = client
+        self._table = table
+        self._method = "select"
+        self._columns = "*"
+        self._payload = None
+        self._on_conflict = None
+        self._ignore_duplicates = False
+        self._returning = "representation"
+        self._filters = []
+        self._order = []
+        self._limit = None
+        self._offset = None
+
+    # -- statements ------------------------------------------------------
+
+    def select(self, *columns: str, count=None, head=None):
+        self._method, self._columns = "select", ",".join(columns) or "*"
+        return self
+
+    def insert(self, json, *, count=None, returning="representation", upsert=False, default_to_null=True):
+        rows = json if isinstance(json, list) else [json]
+        self._method, self._payload, self._returning = ("upsert" if upsert else "insert"), rows, returning
+        return self
+
+    def upsert(self, json, *, count=None, returning="representation", ignore_duplicates=False,
+               on_conflict="", default_to_null=True):
+        self.insert(json, returning=returning, upsert=True)
+        self._on_conflict, self._ignore_duplicates = on_conflict or None, ignore_duplicates
+        return self
+
+    def update(self, json, *, count=None, returning="representation"):
+        self._method, self._payload, self._returning = "update", json, returning
+        return self
+
+    def delete(self, *, count=None, returning="representation"):
+        self._method, self._returning = "delete", returning
+        return self
+
+    # -- filters and modifiers -------------------------------------------
+
+    def filter(self, column: str, operator: str, value):
+        self._filters.append((column, operator, value))
+        return self
+
+    def eq(self, column: str, value):
+        return self.filter(column, "eq", value)
+
+    def neq(self, column: str, value):
+        return self.filter(column, "neq", value)
+
+    def gt(self, column: str, value):
+        return self.filter(column, "gt", value)
+
+    def gte(self, column: str, value):
+        return self.filter(column, "gte", value)
+
+    def lt(self, column: str, value):
+        return self.filter(column, "lt", value)
+
+    def lte(self, column: str, value):
+        return self.filter(column, "lte", value)
+
+    def in_(self, column: str, values):
+        return self.filter(column, "in", list(values))
+
+    def is_(self, column: str, value):
+        return self.filter(column, "is", value)
+
+    def order(self, column: str, *, desc: bool = False, nullsfirst: bool | None = None, foreign_table=None):
+        self._order.append((column, desc, nullsfirst))
+        return self
+
+    def limit(self, size: int, *, foreign_table=None):
+        self._limit = size
+        return self
+
+    def range(self, start: int, end: int, foreign_table=None):
+        self._offset, self._limit = start, end - start + 1
+        return self
+
+    # -- execution -------------------------------------------------------
+
+    def execute(self) -> LocalResponse:
+        if self._method == "select":
+            return LocalResponse(self._select())
+        with self._client.transaction() as conn:
+            if self._method in ("insert", "upsert"):
+                rows = self._insert(conn)
+            elif self._method == "update":
+                rows = self._update(conn)
+            else:
+                rows = self._delete(conn)
+        if getattr(self._returning, "value", self._returning) == "minimal":
+            return LocalResponse([])
+        return LocalResponse(self._client.decode(rows))
+
+    def _select(self) -> list[dict]:
+        base = _quote(self._table)
+        columns, joins, embeds = [], [], []
+        for item in _split_top_level(self._columns):
+            embed = _EMBED.match(item)
+            if embed is None:
+                columns.append(f"{base}.*" if item == "*" else f"{base}.{_quote(item)}")
+                continue
+            target, inner, fields = embed.groups()
+            local, remote = self._client.foreign_key(self._table, target)
+            join = "JOIN" if inner else "LEFT JOIN"
+            joins.append(f"{join} {_quote(target)} ON {_quote(target)}.{_quote(remote)} = {base}.{_quote(local)}")
+            names = [f.strip() for f in fields.split(",") if f.strip()]
+            embeds.append((target, names))
+            columns.extend(f'{_quote(target)}.{_quote(n)} AS "{target}.{n}"' for n in names)
+
+        where, params = self._where()
+        sql = f"SELECT {', '.join(columns)} FROM {base} {' '.join(joins)}{where}"
+        if self._order:
+            sql += " ORDER BY " + ", ".join(
+                f"{_qualified(self._table, column)} {'DESC' if desc else 'ASC'}"
+                f" NULLS {'FIRST' if (desc if nullsfirst is None else nullsfirst) else 'LAST'}"
+                for column, desc, nullsfirst in self._order
+            )
+        if self._limit is not None:
+            sql += f" LIMIT {int(self._limit)} OFFSET {int(self._offset or 0)}"
+
+        rows = self._client.decode(self._client.run(sql, params))
+        for row in rows:
+            for target, names in embeds:
+                nested = {n: row.pop(f"{target}.{n}") for n in names}
+                row[target] = nested if any(v is not None for v in nested.values()) else None
+        return rows
+
+    def _insert(self, conn: sqlite3.Connection) -> list:
+        if not self._payload:
+            return []
+        columns = list(dict.fromkeys(key for row in self._payload for key in row))
+        sql = (f"INSERT INTO {_quote(self._table)} ({', '.join(map(_quote, columns))}) "
+               f"VALUES ({', '.join('?' * len(columns))})")
+        if self._method == "upsert":
+            conflict = [c.strip() for c in (self._on_conflict or "id").split(",")]
+            updates = [c for c in columns if c not in conflict]
+            sql += f" ON CONFLICT ({', '.join(map(_quote, conflict))}) DO "
+            if self._ignore_duplicates or not updates:
+                sql += "NOTHING"
+            else:
+                sql += "UPDATE SET " + ", ".join(f"{_quote(c)} = excluded.{_quote(c)}" for c in updates)
+        values = [[_encode(row.get(c)) for c in columns] for row in self._payload]
+        if getattr(self._returning, "value", self._returning) == "minimal":
+            conn.executemany(sql, values)
+            return []
+        return [r for v in values for r in conn.execute(sql + " RETURNING *", v).fetchall()]
+
+    def _update(self, conn: sqlite3.Connection) -> list:
+        assignments = ", ".join(f"{_quote(c)} = ?" for c in self._payload)
+        where, params = self._where()
+        sql = f"UPDATE {_quote(self._table)} SET {assignments}{where} RETURNING *"
+        return conn.execute(sql, [_encode(v) for v in self._payload.values()] + params).fetchall()
+
+    def _delete(self, conn: sqlite3.Connection) -> list:
+        where, params = self._where()
+        return conn.execute(f"DELETE FROM {_quote(self._table)}{where} RETURNING *", params).fetchall()
+
+    def _where(self) -> tuple[str, list]:
+        clauses, params = [], []
+        for column, operator, value in self._filters:
+            target = _qualified(self._table, column)
+            if operator == "in":
+                clauses.append(f"{target} IN ({', '.join('?' * len(value))})" if value else "0")
+                params.extend(_encode(v) for v in value)
+            elif operator == "is":
+                keyword = {"null": "NULL", "true": "1", "false": "0"}[str(value).lower()]
+                clauses.append(f"{target} IS {keyword}")
+            else:
+                clauses.append(f"{target} {_OPERATORS[operator]} ?")
+                params.append(_encode(value))
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+class AsyncLocalQuery(LocalQuery):
+    async def execute(self) -> LocalResponse:
+        return LocalQuery.execute(self)
+
+
+class LocalRpc:
+    def __init__(self, client: LocalClient, name: str, params: dict):
+        self._client = client
+        self._name = name
+        self._params = params
+
+    def execute(self) -> LocalResponse:
+        if self._name not in _rpcs:
+            raise ValueError(f"Function {self._name} is not available in the local database")
+        return LocalResponse(_rpcs[self._name](self._client, **self._params))
+
+
+class AsyncLocalRpc(LocalRpc):
+    async def execute(self) -> LocalResponse:
+        return LocalRpc.execute(self)
+
+
+# ---------------------------------------------------------------------------
+# Database functions (schema.sql FUNCTIONS), called through rpc()
+# ---------------------------------------------------------------------------
+
+def local_rpc(name: str):
+    """Register the Python implementation of a database function."""
+    def register(fn):
+        _rpcs[name] = fn
+        return fn
+    return register
+
+
+@local_rpc("si_district_analytics")
+def _district_analytics(client: LocalClient, p_district_id: int) -> dict | None:
+    district = client.run("SELECT id, district_name FROM si_districts WHERE id = ?", (p_district_id,))
+    if not district:
+        return None
+    district = district[0]
+    schools = client.run(
+        "SELECT priority_level, total_enrolment FROM si_schools_view WHERE district_id = ?", (p_district_id,)
+    )
+    demand = client.run(
+        """
+        SELECT dp.infra_type,
+               SUM(COALESCE(dp.physical_count, 0))   AS physical,
+               SUM(COALESCE(dp.financial_amount, 0)) AS financial
+        FROM si_demand_plans dp
+        JOIN si_schools s ON s.id = dp.school_id
+        WHERE s.district_id = ?
+        GROUP BY dp.infra_type
+        """,
+        (p_district_id,),
+    )
+
+    levels = {}
+    for s in schools:
+        level = s["priority_level"] or "UNKNOWN"
+        levels[level] = levels.get(level, 0) + 1
+    return {
+        "district_id": district["id"],
+        "district_name": district["district_name"],
+        "total_schools": len(schools),
+        "total_enrolment": sum(s["total_enrolment"] or 0 for s in schools),
+        "total_demand_physical": sum(d["physical"] for d in demand),
+        "total_demand_financial": sum(d["financial"] for d in demand),
+        "priority_distribution": levels,
+        "infra_gaps": {d["infra_type"]: d["physical"] for d in demand},
+    }
+
+
+@local_rpc("si_apply_validation_results")
+def _apply_validation_results(client: LocalClient, p_results: list[dict]) -> int:
+    verdict = "validation_status = ?, validation_score = ?, validation_flags = ?"
+    updated = 0
+    with client.transaction() as conn:
+        for r in p_results:
+            values = [r.get("validation_status"), r.get("validation_score"),
+                      json.dumps(r.get("validation_flags") or [])]
+            if r.get("id") is not None:
+                cursor = conn.execute(f"UPDATE si_demand_plans SET {verdict} WHERE id = ?", values + [r["id"]])
+            else:
+                cursor = conn.execute(f"UPDATE si_demand_plans SET {verdict} WHERE school_id = ? AND infra_type = ?",
+                                      values + [r.get("school_id"), r.get("infra_type")])
+            updated += cursor.rowcount
+    return updated
+
+
+@local_rpc("si_refresh_district_rollup")
+def _refresh_district_rollup(client: LocalClient, p_district_ids: list[int]) -> None:
+    # The local rollups are views, current on every read
+    return None
+
+
+@local_rpc("si_refresh_state_rollup")
+def _refresh_state_rollup(client: LocalClient) -> int:
+    return client.run("SELECT COUNT(*) FROM si_district_rollup")[0][0]
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def _split_statements(sql: str) -> list[str]:
+    """Top-level statements of a SQL script (comments and $$ bodies handled)."""
+    statements, current, i = [], [], 0
+    while i < len(sql):
+        if sql.startswith("--", i):
+            i = sql.find("\n", i) if "\n" in sql[i:] else len(sql)
+        elif sql.startswith("$$", i):
+            end = sql.index("$$", i + 2) + 2
+            current.append(sql[i:end])
+            i = end
+        elif sql[i] == "'":
+            end = sql.index("'", i + 1) + 1
+            current.append(sql[i:end])
+            i = end
+        elif sql[i] == ";":
+            statements.append("".join(current).strip())
+            current, i = [], i + 1
+        else:
+            current.append(sql[i])
+            i += 1
+    statements.append("".join(current).strip())
+    return [s for s in statements if s]
+
+
+def _split_top_level(columns: str) -> list[str]:
+    """Split a select list on commas outside parentheses."""
+    items, depth, current = [], 0, ""
+    for ch in columns:
+        if ch == "," and depth == 0:
+            items.append(current.strip())
+            current = ""
+            continue
+        depth += (ch == "(") - (ch == ")")
+        current += ch
+    items.append(current.strip())
+    return [item for item in items if item]
+
+
+def _create_touch_trigger(conn: sqlite3.Connection, name: str, table: str, arguments: str):
+    """si_touch_updated_at() as an AFTER UPDATE trigger: stamp updated_at when
+    one of the argument columns (default: any other column) changes. Stamps
+    carry milliseconds, so two updates in one second still differ."""
+    columns = re.findall(r"'(\w+)'", arguments) or [
+        c["name"] for c in conn.execute(f"PRAGMA table_info({_quote(table)})") if c["name"] != "updated_at"
+    ]
+    changed = " OR ".join(f"OLD.{_quote(c)} IS NOT NEW.{_quote(c)}" for c in columns)
+    conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    conn.execute(
+        f"CREATE TRIGGER {name} AFTER UPDATE ON {_quote(table)} FOR EACH ROW WHEN {changed} "
+        f"BEGIN UPDATE {_quote(table)} SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE id = NEW.id; END"
+    )
+
+
+def _object_type(conn: sqlite3.Connection, name: str) -> str | None:
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _qualified(table: str, column: str) -> str:
+    """Column reference; "other_table.column" addresses an embedded resource."""
+    if "." in column:
+        target, name = column.split(".", 1)
+        return f"{_quote(target)}.{_quote(name)}"
+    return f"{_quote(table)}.{_quote(column)}"
+
+
+def _encode(value):
+    return json.dumps(value) if isinstance(value, (dict, list)) else value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create or inspect the local SQLite database")
+    parser.add_argument("command", choices=["init", "info"])
+    args = parser.parse_args()
+
+    client = LocalClient()
+    print(f"{client.path} (schema: {LOCAL_DB_SCHEMA})")
+    if args.command == "info":
+        names = client.run("SELECT name, type FROM sqlite_master WHERE type IN ('table', 'view') "
+                           "AND name LIKE 'si\\_%' ESCAPE '\\' ORDER BY type, name")
+        for row in names:
+            count = client.run(f"SELECT COUNT(*) FROM {_quote(row['name'])}")[0][0]
+            print(f"{row['type']:<5} {row['name']}: {count} rows")
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
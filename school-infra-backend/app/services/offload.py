@@ -0,0 +1,151 @@
+"""
+Offload — blocking service calls run on a bounded thread pool.
+
+Forecasting, validation (rules + Isolation Forest scoring) and the sync
+database client block the thread they run on. Endpoints hand such calls to
+run_blocking(), which runs them on a shared, sized thread pool so the event
+loop keeps serving /health, analytics and job polling meanwhile. NumPy,
+scikit-learn and socket I/O release the GIL, so threads give real overlap
+without pickling inputs for a process pool.
+
+Each kind of work runs in a lane with its own concurrency limit: a burst of
+validations cannot take every pool thread from forecasts. Callers beyond a
+lane's limit wait in its queue; past OFFLOAD_MAX_QUEUE waiting callers the
+lane rejects new work with LaneFull (HTTP 503) instead of queueing without
+bound. offload_stats() reports running / waiting counts and timings per lane.
+"""
+
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Threads shared by every lane
+OFFLOAD_WORKERS = int(os.environ.get("OFFLOAD_WORKERS", "16"))
+
+# Callers a lane lets wait for a slot before rejecting more
+OFFLOAD_MAX_QUEUE = int(os.environ.get("OFFLOAD_MAX_QUEUE", "64"))
+
+# Calls of each lane running at once
+LANE_LIMITS = {
+    "forecast": int(os.environ.get("OFFLOAD_FORECAST_LIMIT", "8")),
+    "validate": int(os.environ.get("OFFLOAD_VALIDATE_LIMIT", "2")),
+    "io": int(os.environ.get("OFFLOAD_IO_LIMIT", "8")),
+}
+
+_executor: ThreadPoolExecutor | None = None
+_lanes: dict[str, "Lane"] = {}
+
+
+class LaneFull(RuntimeError):
+    """A lane's queue is full; the caller should retry later."""
+
+    def __init__(self, lane: str):
+        super().__init__(f"Too many '{lane}' requests queued; retry shortly")
+        self.lane = lane
+
+
+class Lane:
+    """Concurrency limit and queue-depth counters of one kind of blocking work.
+
+    Counters are only touched on the event loop, so they need no lock.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int = OFFLOAD_MAX_QUEUE):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self._slots = asyncio.Semaphore(limit)
+        self.running = 0
+        self.waiting = 0
+        self.peak_waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.wait_s = 0.0
+        self.run_s = 0.0
+
+    async def run(self, executor: ThreadPoolExecutor, fn, *args, **kwargs):
+        if self._slots.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise LaneFull(self.name)
+
+        queued = time.perf_counter()
+        self.waiting += 1
+        self.peak_waiting = max(self.peak_waiting, self.waiting)
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        started = time.perf_counter()
+        self.wait_s += started - queued
+        self.running += 1
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(executor, functools.partial(fn, *args, **kwargs))
+        # The slot is freed when the thread finishes, even if the request is
+        # cancelled first (a thread cannot be interrupted)
+        future.add_done_callback(lambda f: self._finish(f, started))
+        return await asyncio.shield(future)
+
+    def _finish(self, future: asyncio.Future, started: float):
+        self.running -= 1
+        self.run_s += time.perf_counter() - started
+        if future.cancelled() or future.exception() is not None:
+            self.failed += 1
+        else:
+            self.completed += 1
+        self._slots.release()
+
+    def stats(self) -> dict:
+        finished = self.completed + self.failed
+        started = finished + self.running
+        return {
+            "limit": self.limit,
+            "running": self.running,
+            "waiting": self.waiting,
+            "peak_waiting": self.peak_waiting,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.wait_s / started * 1000, 1) if started else None,
+            "avg_run_ms": round(self.run_s / finished * 1000, 1) if finished else None,
+        }
+
+
+def start():
+    """Create the pool and lanes (called at app startup, on the serving event loop)."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=OFFLOAD_WORKERS, thread_name_prefix="offload")
+    _lanes.clear()
+    _lanes.update({name: Lane(name, limit) for name, limit in LANE_LIMITS.items()})
+
+
+def shutdown(wait: bool = False):
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=wait, cancel_futures=True)
+        _executor = None
+    _lanes.clear()
+
+
+async def run_blocking(lane: str, fn, *args, **kwargs):
+    """Run fn(*args, **kwargs) on the offload pool within a lane's concurrency limit.
+
+    Raises LaneFull if the lane's queue is full.
+    """
+    if _executor is None:
+        start()
+    if lane not in _lanes:
+        _lanes[lane] = Lane(lane, LANE_LIMITS.get(lane, OFFLOAD_WORKERS))
+    return await _lanes[lane].run(_executor, fn, *args, **kwargs)
+
+
+def offload_stats() -> dict:
+    return {
+        "workers": OFFLOAD_WORKERS,
+        "lanes": {name: lane.stats() for name, lane in _lanes.items()},
+    }
@@ -0,0 +1,520 @@
+"""
+Priority Scoring Service — 4-factor composite priority of every school.
+
+Same formulas as the app's PriorityScoringService, computed for all schools
+in one vectorized pass instead of school by school on a phone:
+- Enrolment Pressure (30%): growth rate, student-classroom ratio
+- Infrastructure Gap (30%): demand plan items, missing facilities
+- CWSN Needs (20%): CWSN-specific demands and gaps
+- Accessibility (20%): drinking water, electrification, ramps
+
+Inputs are each school's enrolment, demand plans and latest infrastructure
+assessment; scores are bulk-upserted into si_school_priority_scores.
+
+Passes are incremental: only schools with an input row written (updated_at)
+since the last pass's watermark, the newest updated_at it read, are re-scored, and the statement-level
+rollup triggers patch just their districts. A full pass is the repair path,
+e.g. after input rows were deleted, which leaves no updated_at to find.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from postgrest import ReturnMethod
+
+from app.services.db import get_db, fetch_all
+from app.services.job_store import get_job_store
+from app.services.ranking_service import get_priority_index
+from app.services.response_cache import invalidate_responses
+
+logger = logging.getLogger(__name__)
+
+# Rows per bulk si_school_priority_scores upsert
+PRIORITY_WRITE_CHUNK_SIZE = int(os.environ.get("PRIORITY_WRITE_CHUNK_SIZE", "500"))
+
+# Seconds below the watermark an incremental pass re-reads, for rows committed
+# after a pass read but stamped (at their transaction's start) before the
+# newest row it saw. Rows already seen there are not re-scored.
+PRIORITY_WATERMARK_OVERLAP = float(os.environ.get("PRIORITY_WATERMARK_OVERLAP", "30"))
+
+# Overlap-window rows per table the watermark remembers by id (the newest);
+# the rest of the window is kept only as a digest
+PRIORITY_WATERMARK_SEEN_LIMIT = int(os.environ.get("PRIORITY_WATERMARK_SEEN_LIMIT", "1000"))
+
+# Seconds between the background watcher's incremental passes (0 = no watcher)
+PRIORITY_POLL_INTERVAL = float(os.environ.get("PRIORITY_POLL_INTERVAL", "0"))
+
+# School ids per `in.(...)` filter (keeps request URLs short)
+IN_FILTER_CHUNK = 500
+
+DEFAULT_SCORE_YEAR = 2025
+PRIORITY_CONFLICT_KEY = ("school_id", "score_year")
+
+# Factor weights (sum to 1.0)
+WEIGHTS = {
+    "enrolment": 0.30,
+    "infra_gap": 0.30,
+    "cwsn": 0.20,
+    "accessibility": 0.20,
+}
+
+INFRA_TYPES = ["CWSN_RESOURCE_ROOM", "CWSN_TOILET", "DRINKING_WATER", "ELECTRIFICATION", "RAMPS"]
+
+# Student-classroom ratio norms: primary schools ("PS") vs the rest
+NORM_RATIO_PRIMARY = 30.0
+NORM_RATIO_SECONDARY = 35.0
+
+# Composite score thresholds, highest first; below the last is LOW
+PRIORITY_LEVELS = [(80, "CRITICAL"), (60, "HIGH"), (40, "MEDIUM")]
+
+# Tables a score is computed from, and the column naming each row's school
+SCORE_INPUT_TABLES = {
+    "si_schools": "id",
+    "si_enrolment_history": "school_id",
+    "si_demand_plans": "school_id",
+    "si_infra_assessments": "school_id",
+}
+
+ASSESSMENT_COLUMNS = (
+    "id,school_id,assessment_date,existing_classrooms,cwsn_toilet_available,"
+    "cwsn_resource_room_available,drinking_water_available,electrification_status,"
+    "ramp_available,condition_rating"
+)
+
+
+_rescore_lock = threading.Lock()
+_watcher: threading.Thread | None = None
+_watcher_stop = threading.Event()
+
+
+def rescore_priority_scores(score_year: int = DEFAULT_SCORE_YEAR, incremental: bool = True,
+                            chunk_size: int | None = None, progress=None) -> dict:
+    """Re-score the schools whose inputs changed since the last pass, or every school.
+
+    The watermark is the newest input updated_at the last successful pass
+    read, a database timestamp, so the backend's clock plays no part. With
+    it are kept a digest and the newest rows of the overlap window below it,
+    bounded in size; the next pass re-reads that window but only re-scores
+    rows that are new or changed.
+    An incremental pass with no watermark yet (first run for this score
+    year) scores every school. The watermark only advances when every score
+    saved, so schools that failed are picked up again by the next pass.
+    ``progress`` receives job progress fields. Returns mode, watermark,
+    scores and errors.
+    """
+    store = get_job_store()
+    key = f"priority:{score_year}"
+    with _rescore_lock:
+        saved = store.watermark(key) if incremental else None
+        previous = _decode_watermark(saved) if saved else None
+        if previous is None:
+            mode = "full"
+            if progress:
+                progress(stage="scoring", mode=mode)
+            # Read before the inputs, so rows written during the pass are re-read next time
+            watermark = _scan_inputs(None)[1]
+            scores = compute_priority_scores(score_year)
+        else:
+            mode = "incremental"
+            if progress:
+                progress(stage="finding changes", mode=mode, since=previous["at"])
+            school_ids, watermark = _scan_inputs(previous)
+            if progress:
+                progress(stage="scoring", changed_schools=len(school_ids))
+            scores = compute_priority_scores(score_year, sorted(school_ids)) if school_ids else []
+
+        if progress:
+            progress(stage="saving", unit="schools", total=len(scores), done=0)
+        errors = save_priority_scores(scores, chunk_size)
+        failed = {school_id for err in errors for school_id in err["school_ids"]}
+        get_priority_index().update([row for row in scores if row["school_id"] not in failed])
+        if not errors and watermark["at"] is not None:
+            store.save_watermark(key, json.dumps(watermark))
+    current = watermark if not errors else previous
+    return {
+        "mode": mode,
+        "watermark": current["at"] if current else None,
+        "scores": scores,
+        "errors": errors,
+    }
+
+
+def changed_schools(since: str) -> set[int]:
+    """Schools with a score input written (updated_at) at or after ``since``, less the overlap window."""
+    return _scan_inputs({"at": since, "tables": {}})[0]
+
+
+def _scan_inputs(previous: dict | None) -> tuple[set[int], dict]:
+    """Read score-input rows at or above the previous watermark less the overlap.
+
+    ``previous`` is {"at": updated_at, "tables": {table: {"digest", "seen"}}},
+    describing each table's overlap window as the previous pass read it;
+    None (a full pass) starts from the newest updated_at in the tables.
+    Rows above the previous watermark are always new. Rows at or below it
+    are only looked at when their window's digest changed (a late commit,
+    or a delete); then those not in ``seen`` (the newest ids of the window,
+    with their updated_at) are treated as new. Returns the schools of the
+    new rows, and the next watermark: the newest updated_at read, with a
+    digest and the newest PRIORITY_WATERMARK_SEEN_LIMIT rows of each
+    table's window below it. Its size does not grow with the tables.
+    """
+    db = get_db()
+    if previous is None:
+        newest = [
+            rows[0]["updated_at"]
+            for rows in (
+                db.table(table).select("updated_at").order("updated_at", desc=True).limit(1).execute().data
+                for table in SCORE_INPUT_TABLES
+            )
+            if rows and rows[0]["updated_at"]
+        ]
+        if not newest:
+            return set(), {"at": None, "tables": {}}
+        previous = {"at": max(newest, key=_timestamp), "tables": {}}
+
+    # Whole seconds, space-separated: compares correctly as text against the
+    # local database's CURRENT_TIMESTAMP values too
+    bound = _timestamp(previous["at"]) - timedelta(seconds=PRIORITY_WATERMARK_OVERLAP)
+    bound = bound.strftime("%Y-%m-%d %H:%M:%S+00:00")
+    previous_at = _timestamp(previous["at"])
+    school_ids = set()
+    read = {}
+    for table, school_column in SCORE_INPUT_TABLES.items():
+        columns = ",".join(dict.fromkeys(("id", school_column, "updated_at")))
+        rows = fetch_all(lambda: db.table(table).select(columns).gte("updated_at", bound).order("id"))
+        old = [row for row in rows if _timestamp(row["updated_at"]) <= previous_at]
+        school_ids.update(row[school_column] for row in rows if _timestamp(row["updated_at"]) > previous_at)
+        window = previous["tables"].get(table)
+        if window is None or window["digest"] != _window_digest(old):
+            seen = window["seen"] if window else {}
+            school_ids.update(row[school_column] for row in old if seen.get(str(row["id"])) != row["updated_at"])
+        read[table] = rows
+
+    at = max([previous["at"], *(row["updated_at"] for rows in read.values() for row in rows)], key=_timestamp)
+    floor = _timestamp(at) - timedelta(seconds=PRIORITY_WATERMARK_OVERLAP)
+    tables = {}
+    for table, rows in read.items():
+        in_window = [row for row in rows if _timestamp(row["updated_at"]) >= floor]
+        newest = sorted(in_window, key=lambda row: (_timestamp(row["updated_at"]), row["id"]))
+        newest = newest[-PRIORITY_WATERMARK_SEEN_LIMIT:] if PRIORITY_WATERMARK_SEEN_LIMIT > 0 else []
+        tables[table] = {
+            "digest": _window_digest(in_window),
+            "seen": {str(row["id"]): row["updated_at"] for row in newest},
+        }
+    return school_ids, {"at": at, "tables": tables}
+
+
+def _window_digest(rows: list[dict]) -> str:
+    """Hash of the (id, updated_at) pairs of an overlap window, in id order."""
+    digest = hashlib.sha1()
+    for row in sorted(rows, key=lambda row: row["id"]):
+        digest.update(f"{row['id']}|{row['updated_at']}\n".encode())
+    return digest.hexdigest()
+
+
+def _timestamp(value: str) -> datetime:
+    """A database timestamp (PostgREST ISO or SQLite "YYYY-MM-DD HH:MM:SS", UTC) as an aware datetime."""
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _decode_watermark(value: str) -> dict:
+    """Stored watermark; earlier versions stored only the timestamp, or every window row."""
+    if not value.startswith("{"):
+        return {"at": value, "tables": {}}
+    watermark = json.loads(value)
+    if "seen" in watermark:
+        watermark = {
+            "at": watermark["at"],
+            "tables": {table: {"digest": None, "seen": seen} for table, seen in watermark["seen"].items()},
+        }
+    return watermark
+
+
+def compute_priority_scores(score_year: int = DEFAULT_SCORE_YEAR,
+                            school_ids: list[int] | None = None) -> list[dict]:
+    """Score every school, or only ``school_ids``; returns si_school_priority_scores rows."""
+    db = get_db()
+
+    def load(table: str, columns: str, school_column: str) -> list[dict]:
+        if school_ids is None:
+            return fetch_all(lambda: db.table(table).select(columns).order("id"))
+        rows = []
+        for i in range(0, len(school_ids), IN_FILTER_CHUNK):
+            chunk = school_ids[i:i + IN_FILTER_CHUNK]
+            rows.extend(fetch_all(lambda: db.table(table).select(columns).in_(school_column, chunk).order("id")))
+        return rows
+
+    schools = load("si_schools", "id,school_category", "id")
+    enrolment = load("si_enrolment_history", "school_id,academic_year,total", "school_id")
+    demands = load("si_demand_plans", "school_id,infra_type,physical_count", "school_id")
+    assessments = load("si_infra_assessments", ASSESSMENT_COLUMNS, "school_id")
+    return score_schools(schools, enrolment, demands, assessments, score_year)
+
+
+def score_schools(schools: list[dict], enrolment: list[dict], demands: list[dict],
+                  assessments: list[dict], score_year: int = DEFAULT_SCORE_YEAR) -> list[dict]:
+    """Pivot the input rows into per-school columns and score them."""
+    school_ids = [s["id"] for s in schools]
+    if not school_ids:
+        return []
+    index = {school_id: i for i, school_id in enumerate(school_ids)}
+    n = len(school_ids)
+
+    growth_rate, latest_total = _enrolment_columns(enrolment, index, n)
+    has_type, distinct_types, total_physical, demand_count = _demand_columns(demands, index, n)
+    latest = _latest_assessments(assessments, index)
+
+    def assessment_column(key, default, dtype):
+        return np.array([default if a is None or a.get(key) is None else a[key] for a in latest], dtype=dtype)
+
+    electrification = [
+        "None" if a is None or a.get("electrification_status") is None else a["electrification_status"]
+        for a in latest
+    ]
+    condition = ["Good" if a is None or a.get("condition_rating") is None else a["condition_rating"] for a in latest]
+
+    scores = evaluate_priority(
+        primary=np.array([s.get("school_category") == "PS" for s in schools]),
+        growth_rate=growth_rate,
+        latest_total=latest_total,
+        has_type=has_type,
+        distinct_types=distinct_types,
+        total_physical=total_physical,
+        has_assessment=np.array([a is not None for a in latest]),
+        classrooms=assessment_column("existing_classrooms", 0, np.float64),
+        cwsn_toilet=assessment_column("cwsn_toilet_available", False, bool),
+        cwsn_room=assessment_column("cwsn_resource_room_available", False, bool),
+        drinking_water=assessment_column("drinking_water_available", False, bool),
+        ramp=assessment_column("ramp_available", False, bool),
+        electrification=np.array(electrification, dtype=object),
+        condition=np.array(condition, dtype=object),
+    )
+
+    computed_at = datetime.now(timezone.utc).isoformat()
+    composite, level = scores["composite"].tolist(), scores["level"].tolist()
+    factors = [scores[k].tolist() for k in ("enrolment", "infra_gap", "cwsn", "accessibility")]
+    growth, totals, counts = growth_rate.tolist(), latest_total.tolist(), demand_count.tolist()
+    return [
+        {
+            "school_id": school_id,
+            "score_year": score_year,
+            "composite_score": composite[i],
+            "priority_level": level[i],
+            "enrolment_pressure_score": factors[0][i],
+            "infra_gap_score": factors[1][i],
+            "cwsn_need_score": factors[2][i],
+            "accessibility_score": factors[3][i],
+            "score_breakdown": {
+                "enrolment_weight": WEIGHTS["enrolment"],
+                "infra_gap_weight": WEIGHTS["infra_gap"],
+                "cwsn_weight": WEIGHTS["cwsn"],
+                "accessibility_weight": WEIGHTS["accessibility"],
+                "enrolment_details": {"growth_rate": growth[i], "total_students": int(totals[i])},
+                "demand_count": int(counts[i]),
+            },
+            "computed_at": computed_at,
+        }
+        for i, school_id in enumerate(school_ids)
+    ]
+
+
+def evaluate_priority(*, primary, growth_rate, latest_total, has_type, distinct_types, total_physical,
+                      has_assessment, classrooms, cwsn_toilet, cwsn_room, drinking_water, ramp,
+                      electrification, condition) -> dict:
+    """Factor scores, composite and level of whole columns (one entry per school).
+
+    ``has_type`` is a (schools × INFRA_TYPES) mask of demanded infra types.
+    Assessment columns hold the app's defaults where ``has_assessment`` is
+    False. Returns arrays keyed enrolment, infra_gap, cwsn, accessibility
+    (rounded to one decimal), composite and level.
+    """
+    demands = {t: has_type[:, k] for k, t in enumerate(INFRA_TYPES)}
+    electrification_upper = np.array([str(e).upper() for e in electrification], dtype=object)
+
+    # Enrolment pressure: growth (0-50) + crowding (0-50); enrolment size stands
+    # in for crowding when there is no assessment with classroom counts
+    growth_points = np.select(
+        [growth_rate > 20, growth_rate > 10, growth_rate > 5, growth_rate > 0], [50, 35, 20, 10], 0,
+    )
+    norm = np.where(primary, NORM_RATIO_PRIMARY, NORM_RATIO_SECONDARY)
+    has_ratio = has_assessment & (classrooms > 0)
+    ratio = np.divide(latest_total, classrooms, out=np.zeros(len(classrooms)), where=has_ratio)
+    ratio_points = np.select([ratio > norm * 1.5, ratio > norm * 1.2, ratio > norm], [50, 35, 20], 5)
+    size_points = np.select([latest_total > 300, latest_total > 150, latest_total > 50], [40, 25, 15], 5)
+    enrolment = growth_points + np.where(has_ratio, ratio_points, size_points)
+
+    # Infrastructure gap: demand breadth (0-60) + volume (0-40), boosted by
+    # missing facilities and the building's condition
+    missing = (~cwsn_toilet).astype(int) + ~cwsn_room + ~drinking_water + (electrification == "None") + ~ramp
+    infra_gap = (
+        distinct_types / len(INFRA_TYPES) * 60
+        + np.select([total_physical >= 5, total_physical >= 3, total_physical >= 1], [40, 25, 15], 0)
+        + has_assessment * (missing * 5 + (condition == "Critical") * 15 + (condition == "Needs Repair") * 8)
+    )
+
+    # CWSN need: CWSN demands, more where the assessment confirms the gap
+    cwsn = (
+        demands["CWSN_RESOURCE_ROOM"] * 35 + demands["CWSN_TOILET"] * 35 + demands["RAMPS"] * 30
+        + has_assessment * (
+            (demands["CWSN_RESOURCE_ROOM"] & ~cwsn_room) * 10
+            + (demands["CWSN_TOILET"] & ~cwsn_toilet) * 10
+            + (demands["RAMPS"] & ~ramp) * 10
+        )
+    )
+
+    # Accessibility: water / power / ramp demands plus assessed gaps
+    accessibility = (
+        demands["DRINKING_WATER"] * 35 + demands["ELECTRIFICATION"] * 35 + demands["RAMPS"] * 30
+        + has_assessment * (
+            ~drinking_water * 10
+            + (electrification_upper == "NONE") * 10
+            + (electrification_upper == "PARTIAL") * 5
+            + ~ramp * 10
+        )
+    )
+
+    factors = {
+        "enrolment": np.clip(enrolment, 0, 100).astype(np.float64),
+        "infra_gap": np.clip(infra_gap, 0, 100).astype(np.float64),
+        "cwsn": np.clip(cwsn, 0, 100).astype(np.float64),
+        "accessibility": np.clip(accessibility, 0, 100).astype(np.float64),
+    }
+    composite = np.clip(sum(factors[k] * w for k, w in WEIGHTS.items()), 0, 100)
+    level = np.select([composite > t for t, _ in PRIORITY_LEVELS], [name for _, name in PRIORITY_LEVELS], "LOW")
+
+    return {
+        **{k: _round1(v) for k, v in factors.items()},
+        "composite": _round1(composite),
+        "level": level,
+    }
+
+
+def save_priority_scores(rows: list[dict], chunk_size: int | None = None) -> list[dict]:
+    """Upsert score rows keyed on (school_id, score_year) in chunked multi-row requests.
+
+    Returns one error entry per failed chunk, with the school ids that chunk covered.
+    """
+    chunk_size = chunk_size or PRIORITY_WRITE_CHUNK_SIZE
+    db = get_db()
+    errors = []
+    for i in range(0, len(rows), chunk_size):
+        chunk = rows[i:i + chunk_size]
+        try:
+            db.table("si_school_priority_scores") \
+                .upsert(chunk, on_conflict=",".join(PRIORITY_CONFLICT_KEY), returning=ReturnMethod.minimal) \
+                .execute()
+        except Exception as e:
+            errors.append({
+                "school_ids": sorted({r["school_id"] for r in chunk}),
+                "rows": len(chunk),
+                "error": str(e),
+            })
+    if rows:
+        invalidate_responses()
+    return errors
+
+
+def start_watcher(score_year: int = DEFAULT_SCORE_YEAR, interval: float | None = None) -> bool:
+    """Run an incremental pass every ``interval`` seconds (PRIORITY_POLL_INTERVAL)
+    on a daemon thread until stop_watcher(). Returns False when polling is off."""
+    global _watcher
+    interval = PRIORITY_POLL_INTERVAL if interval is None else interval
+    if interval <= 0 or (_watcher is not None and _watcher.is_alive()):
+        return False
+    _watcher_stop.clear()
+    _watcher = threading.Thread(
+        target=_watch, args=(score_year, interval), name="priority-watcher", daemon=True
+    )
+    _watcher.start()
+    return True
+
+
+def stop_watcher():
+    global _watcher
+    _watcher_stop.set()
+    if _watcher is not None:
+        _watcher.join(timeout=5)
+        _watcher = None
+
+
+def _watch(score_year: int, interval: float):
+    while not _watcher_stop.wait(interval):
+        try:
+            result = rescore_priority_scores(score_year)
+            if result["errors"]:
+                logger.warning("Priority pass failed to save %d chunk(s): %s",
+                               len(result["errors"]), result["errors"][0]["error"])
+        except Exception:
+            # Transient database errors: the watermark did not move, so the next pass retries
+            logger.exception("Incremental priority pass failed")
+
+
+def _enrolment_columns(enrolment: list[dict], index: dict, n: int):
+    """Growth rate (%) from first to last year, and latest-year total, per school."""
+    rows = [r for r in enrolment if r["school_id"] in index]
+    if not rows:
+        return np.zeros(n), np.zeros(n)
+    years, year_idx = np.unique([r["academic_year"] for r in rows], return_inverse=True)
+    school_idx = np.array([index[r["school_id"]] for r in rows], dtype=np.intp)
+
+    totals = np.zeros((n, len(years)))
+    present = np.zeros((n, len(years)), dtype=bool)
+    np.add.at(totals, (school_idx, year_idx), [r["total"] or 0 for r in rows])
+    present[school_idx, year_idx] = True
+
+    has_any = present.any(axis=1)
+    first = present.argmax(axis=1)
+    last = len(years) - 1 - present[:, ::-1].argmax(axis=1)
+    rows_n = np.arange(n)
+    first_total, last_total = totals[rows_n, first], totals[rows_n, last]
+
+    growing = (present.sum(axis=1) >= 2) & (first_total > 0)
+    growth_rate = np.divide(last_total - first_total, first_total, out=np.zeros(n), where=growing) * 100
+    return growth_rate, np.where(has_any, last_total, 0)
+
+
+def _demand_columns(demands: list[dict], index: dict, n: int):
+    """Demanded-type mask, distinct demanded types, physical total and plan count per school."""
+    has_type = np.zeros((n, len(INFRA_TYPES)), dtype=bool)
+    distinct_types = np.zeros(n)
+    total_physical = np.zeros(n)
+    demand_count = np.zeros(n, dtype=np.int64)
+    rows = [d for d in demands if d["school_id"] in index]
+    if not rows:
+        return has_type, distinct_types, total_physical, demand_count
+
+    school_idx = np.array([index[d["school_id"]] for d in rows], dtype=np.intp)
+    types, type_idx = np.unique([d["infra_type"] or "" for d in rows], return_inverse=True)
+    seen = np.zeros((n, len(types)), dtype=bool)
+    seen[school_idx, type_idx] = True
+    for k, t in enumerate(INFRA_TYPES):
+        if t in types:
+            has_type[:, k] = seen[:, np.searchsorted(types, t)]
+
+    np.add.at(total_physical, school_idx, [d["physical_count"] or 0 for d in rows])
+    np.add.at(demand_count, school_idx, 1)
+    return has_type, seen.sum(axis=1), total_physical, demand_count
+
+
+def _latest_assessments(assessments: list[dict], index: dict) -> list[dict | None]:
+    """Each school's most recent assessment (by date, then id), or None."""
+    latest = [None] * len(index)
+    for a in assessments:
+        i = index.get(a["school_id"])
+        if i is None:
+            continue
+        current = latest[i]
+        if current is None or (str(a["assessment_date"]), a["id"]) > (str(current["assessment_date"]), current["id"]):
+            latest[i] = a
+    return latest
+
+
+def _round1(values):
+    """Round to one decimal, halves up (as the app's toStringAsFixed(1))."""
+    return np.floor(np.asarray(values, dtype=np.float64) * 10 + 0.5) / 10
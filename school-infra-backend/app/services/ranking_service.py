@@ -0,0 +1,264 @@
+"""
+Priority Ranking Index — in-memory top-K and rank-of-school over composite scores.
+
+Every scored school is kept in one sorted array per partition (the whole
+state, each district, each mandal), ordered by composite score, highest
+first, and again in one per partition and priority level. A top-K list is a
+slice of its partition and a school's rank a binary search, so neither
+re-scans si_schools_view:
+
+    top-K:          O(log n + K)
+    rank of school: O(log n) per partition
+    score update:   O(log n) search + one array insert per partition
+
+The index is built from si_schools_view (each school's latest score year) on
+first use and rebuilt after PRIORITY_INDEX_TTL seconds, which picks up scores
+written elsewhere (e.g. the app's on-device fallback). The backend's own
+priority passes patch it in place as they save.
+"""
+
+import bisect
+import os
+import threading
+import time
+
+from app.services.db import fetch_all_async, get_async_db
+
+# Seconds before the index is rebuilt from the database
+PRIORITY_INDEX_TTL = float(os.environ.get("PRIORITY_INDEX_TTL", "600"))
+
+INDEX_COLUMNS = (
+    "id,udise_code,school_name,district_id,district_name,mandal_id,mandal_name,"
+    "priority_score,priority_level,priority_score_year"
+)
+
+STATE = ("state", None)
+
+
+class PriorityIndex:
+    """Scored schools ranked by composite score, partitioned by state / district / mandal."""
+
+    def __init__(self, ttl: float = PRIORITY_INDEX_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._schools: dict[int, dict] = {}      # school id -> entry
+        self._partitions: dict[tuple, list] = {}  # partition -> sorted [(-score, school id)]
+        self._mandal_districts: dict[int, int] = {}  # mandal id -> district id
+        self._loaded_at: float | None = None
+        self._stale = True
+        self.updates = 0  # score updates applied; load() compares it across the fetch
+
+    @property
+    def stale(self) -> bool:
+        """Never built, invalidated, or older than the TTL."""
+        return self._stale or self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl
+
+    def load(self, rows: list[dict], updates_before: int | None = None):
+        """Rebuild from si_schools_view rows; unscored schools are kept but not ranked.
+
+        ``updates_before`` is ``updates`` read before the rows were fetched: if
+        scores were applied meanwhile, the rows may predate them, so the index
+        stays stale and is rebuilt again on the next query.
+        """
+        schools = {row["id"]: _entry(row) for row in rows}
+        partitions = {}
+        for entry in schools.values():
+            if entry["composite_score"] is not None:
+                key = _key(entry)
+                for partition in _partitions_of(entry):
+                    partitions.setdefault(partition, []).append(key)
+        for keys in partitions.values():
+            keys.sort()
+        mandal_districts = {
+            entry["mandal_id"]: entry["district_id"] for entry in schools.values() if entry["mandal_id"] is not None
+        }
+        with self._lock:
+            self._schools, self._partitions = schools, partitions
+            self._mandal_districts = mandal_districts
+            self._loaded_at = time.monotonic()
+            self._stale = updates_before is not None and updates_before != self.updates
+
+    def update(self, scores: list[dict]):
+        """Apply saved si_school_priority_scores rows.
+
+        Rows for a score year older than the school's ranked one are ignored
+        (the view ranks each school's latest year). A school the index has
+        never seen, or a scored school whose year is unknown, marks it stale,
+        to be rebuilt on the next query, rather than risk a downgrade.
+        """
+        with self._lock:
+            self.updates += 1
+            for row in scores:
+                entry = self._schools.get(row["school_id"])
+                if entry is None:
+                    self._stale = True
+                    continue
+                if entry["score_year"] is None and entry["composite_score"] is not None:
+                    self._stale = True
+                    continue
+                if entry["score_year"] is not None and row["score_year"] < entry["score_year"]:
+                    continue
+                if entry["composite_score"] is not None:
+                    self._remove(entry)
+                entry.update(
+                    composite_score=row["composite_score"],
+                    priority_level=row["priority_level"],
+                    score_year=row["score_year"],
+                )
+                self._insert(entry)
+
+    def invalidate(self):
+        with self._lock:
+            self._stale = True
+
+    def top(self, k: int, district_id: int | None = None, mandal_id: int | None = None,
+            level: str | None = None) -> tuple[int, list[dict]]:
+        """The ``k`` highest-scored schools of a mandal, a district or the state.
+
+        ``level`` keeps only schools of that priority level, sliced from the
+        partition's own array for that level. A mandal outside the given
+        district has no schools. Returns the number of ranked schools in the
+        partition and the entries, each with its 1-based ``rank`` in the
+        partition.
+        """
+        partition = _partition(district_id, mandal_id)
+        with self._lock:
+            if (
+                district_id is not None and mandal_id is not None
+                and self._mandal_districts.get(mandal_id) != district_id
+            ):
+                return 0, []
+            keys = self._partitions.get(partition, [])
+            if level is None:
+                picked = keys[:k]
+            else:
+                picked = self._partitions.get(_level_partition(partition, level), [])[:k]
+            return len(keys), [
+                {**self._schools[key[1]], "rank": self._rank(keys, key)} for key in picked
+            ]
+
+    def rank(self, school_id: int) -> dict | None:
+        """A school's entry with its rank in the state, its district and its mandal.
+
+        None for an unknown school; ranks are None while it has no score.
+        """
+        with self._lock:
+            entry = self._schools.get(school_id)
+            if entry is None:
+                return None
+            ranks = {}
+            for scope, partition in zip(("state", "district", "mandal"), _scopes_of(entry)):
+                keys = self._partitions.get(partition, []) if partition else []
+                ranked = entry["composite_score"] is not None and partition is not None
+                ranks[scope] = {
+                    "rank": self._rank(keys, _key(entry)) if ranked else None,
+                    "of": len(keys),
+                }
+            return {**entry, "ranks": ranks}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "schools": len(self._schools),
+                "ranked": len(self._partitions.get(STATE, [])),
+                "districts": sum(1 for p in self._partitions if p[0] == "district"),
+                "mandals": sum(1 for p in self._partitions if p[0] == "mandal"),
+                "age_s": round(time.monotonic() - self._loaded_at, 1) if self._loaded_at else None,
+                "stale": self.stale,
+            }
+
+    def _insert(self, entry: dict):
+        key = _key(entry)
+        for partition in _partitions_of(entry):
+            bisect.insort(self._partitions.setdefault(partition, []), key)
+
+    def _remove(self, entry: dict):
+        key = _key(entry)
+        for partition in _partitions_of(entry):
+            keys = self._partitions.get(partition, [])
+            i = bisect.bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                del keys[i]
+
+    @staticmethod
+    def _rank(keys: list, key: tuple) -> int:
+        """1-based competition rank: schools tied on score share the better rank."""
+        return bisect.bisect_left(keys, (key[0], -1)) + 1
+
+
+def _entry(row: dict) -> dict:
+    return {
+        "school_id": row["id"],
+        "udise_code": row.get("udise_code"),
+        "school_name": row.get("school_name"),
+        "district_id": row.get("district_id"),
+        "district_name": row.get("district_name"),
+        "mandal_id": row.get("mandal_id"),
+        "mandal_name": row.get("mandal_name"),
+        "composite_score": row.get("priority_score"),
+        "priority_level": row.get("priority_level"),
+        "score_year": row.get("priority_score_year"),
+    }
+
+
+def _key(entry: dict) -> tuple:
+    # Highest score first; ties broken by school id
+    return (-entry["composite_score"], entry["school_id"])
+
+
+def _partition(district_id: int | None, mandal_id: int | None) -> tuple:
+    if mandal_id is not None:
+        return ("mandal", mandal_id)
+    if district_id is not None:
+        return ("district", district_id)
+    return STATE
+
+
+def _scopes_of(entry: dict) -> tuple:
+    """(state, district, mandal) partitions of a school; None where it has no district / mandal."""
+    return (
+        STATE,
+        ("district", entry["district_id"]) if entry["district_id"] is not None else None,
+        ("mandal", entry["mandal_id"]) if entry["mandal_id"] is not None else None,
+    )
+
+
+def _level_partition(partition: tuple, level: str) -> tuple:
+    """The partition of one priority level's schools within ``partition``."""
+    return ("level", level.upper(), partition)
+
+
+def _partitions_of(entry: dict) -> list[tuple]:
+    """Every partition a scored school is ranked in: its scopes, and each one's level partition."""
+    scopes = [p for p in _scopes_of(entry) if p is not None]
+    if not entry["priority_level"]:
+        return scopes
+    return scopes + [_level_partition(p, entry["priority_level"]) for p in scopes]
+
+
+_index: PriorityIndex | None = None
+
+
+def get_priority_index() -> PriorityIndex:
+    global _index
+    if _index is None:
+        _index = PriorityIndex()
+    return _index
+
+
+async def ensure_priority_index() -> PriorityIndex:
+    """The shared index, rebuilt from si_schools_view first if it is stale."""
+    index = get_priority_index()
+    if index.stale:
+        await refresh_priority_index()
+    return index
+
+
+async def refresh_priority_index() -> int:
+    """Rebuild the index from si_schools_view; returns the number of schools loaded."""
+    index = get_priority_index()
+    updates_before = index.updates
+    db = get_async_db()
+    rows = await fetch_all_async(lambda: db.table("si_schools_view").select(INDEX_COLUMNS).order("id"))
+    index.load(rows, updates_before)
+    return len(rows)
@@ -0,0 +1,140 @@
+"""
+Response Cache — cached GET responses with strong ETags.
+
+ResponseCacheMiddleware serves repeated GETs of the cached routes (the
+analytics endpoints) from memory, keyed by path and query string, for
+RESPONSE_CACHE_TTL seconds. Every cached response carries a strong ETag of
+its body; a request whose If-None-Match matches gets 304 with an empty body,
+so a polling dashboard re-downloads nothing until the numbers change.
+
+Write paths that change what these routes report (validation and priority
+saves, the rollup refresh) call invalidate_responses(). Writes the
+backend does not see (e.g. the app writing to Supabase directly) show up
+once the TTL expires.
+"""
+
+import hashlib
+import os
+import threading
+from urllib.parse import parse_qsl, urlencode
+
+from app.services.cache import TTLCache
+
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", "60"))
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "256"))
+
+# Path prefixes whose GET responses are cached, and paths under them that are not
+CACHED_PREFIXES = ("/api/analytics/",)
+UNCACHED_PATHS = ("/api/analytics/cache",)
+
+# Clients may keep a copy but must revalidate it (If-None-Match) before use
+CACHE_CONTROL = b"no-cache"
+
+_responses = TTLCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL)  # (path, query) -> (etag, headers, body)
+
+# Bumped by every invalidation; a response computed across one is not cached.
+# Write paths invalidate from worker threads, so bumps and the check-then-store
+# of a fresh response happen under _generation_lock.
+_generation = 0
+_generation_lock = threading.Lock()
+
+
+def invalidate_responses(prefix: str = "/api/analytics/") -> int:
+    """Drop cached responses under a path prefix; returns how many were cached."""
+    global _generation
+    with _generation_lock:
+        _generation += 1
+        return _responses.invalidate_matching(lambda key: key[0].startswith(prefix))
+
+
+def _store(key, value, generation: int):
+    """Cache a response unless an invalidation happened since it was computed."""
+    with _generation_lock:
+        if generation == _generation:
+            _responses.set(key, value)
+
+
+def response_cache_stats() -> dict:
+    return _responses.stats()
+
+
+class ResponseCacheMiddleware:
+    """ASGI middleware caching 200 GET responses of CACHED_PREFIXES with ETags."""
+
+    def __init__(self, app, prefixes: tuple[str, ...] = CACHED_PREFIXES):
+        self.app = app
+        self.prefixes = prefixes
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "GET"
+            or not scope["path"].startswith(self.prefixes)
+            or scope["path"] in UNCACHED_PATHS
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        key = (scope["path"], _canonical_query(scope["query_string"]))
+        if_none_match = _header(scope, b"if-none-match")
+        cached = _responses.get(key)
+        if cached is not None:
+            await _replay(send, *cached, if_none_match, b"HIT")
+            return
+
+        generation = _generation
+        start = None
+        body = []
+
+        async def capture(message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                start = message
+                if start["status"] != 200:
+                    await send(message)
+                return
+            if start["status"] != 200:
+                await send(message)
+                return
+            body.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                content = b"".join(body)
+                etag = b'"' + hashlib.sha256(content).hexdigest()[:32].encode() + b'"'
+                headers = [(k, v) for k, v in start["headers"] if k.lower() not in (b"content-length", b"etag")]
+                _store(key, (etag, headers, content), generation)
+                await _replay(send, etag, headers, content, if_none_match, b"MISS")
+
+        await self.app(scope, receive, capture)
+
+
+async def _replay(send, etag: bytes, headers: list, body: bytes, if_none_match: bytes | None, cache_status: bytes):
+    """Send a cached response, or 304 if the client already holds this ETag."""
+    cache_headers = [(b"etag", etag), (b"cache-control", CACHE_CONTROL), (b"x-cache", cache_status)]
+    if if_none_match is not None and _etag_matches(if_none_match, etag):
+        await send({"type": "http.response.start", "status": 304, "headers": cache_headers})
+        await send({"type": "http.response.body", "body": b""})
+        return
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": headers + cache_headers + [(b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def _etag_matches(if_none_match: bytes, etag: bytes) -> bool:
+    """If-None-Match is "*" or a comma-separated list of (possibly weak) ETags."""
+    tags = [t.strip() for t in if_none_match.split(b",")]
+    return b"*" in tags or any(t.removeprefix(b"W/") == etag for t in tags)
+
+
+def _canonical_query(query_string: bytes) -> str:
+    """Query string with parameters sorted, so ?a=1&b=2 and ?b=2&a=1 share an entry."""
+    return urlencode(sorted(parse_qsl(query_string.decode("latin-1"), keep_blank_values=True)))
+
+
+def _header(scope, name: bytes) -> bytes | None:
+    for key, value in scope["headers"]:
+        if key == name:
+            return value
+    return None
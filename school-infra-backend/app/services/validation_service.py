@@ -2,14 +2,23 @@
 Demand Plan Validation Service — ML-based anomaly detection.
 
 Uses:
-1. Isolation Forest for anomaly detection
+1. Isolation Forest for anomaly detection (pre-trained per infra type, see anomaly_model.py)
 2. Rule-based validation against Samagra Shiksha norms
 3. Statistical outlier detection
 """
 
+import os
+import time
+
 import numpy as np
-from sklearn.ensemble import IsolationForest
+from app.services.anomaly_model import (
+    attach_enrolment, build_features, decision_scores, get_model, new_forest, recorded_enrolment,
+)
 from app.services.db import get_db
+from app.services.response_cache import invalidate_responses
+
+# Verdicts per si_apply_validation_results RPC call
+VALIDATION_WRITE_CHUNK_SIZE = int(os.environ.get("VALIDATION_WRITE_CHUNK_SIZE", "1000"))
 
 # Samagra Shiksha standard unit costs (in Lakhs)
 UNIT_COSTS = {
@@ -30,129 +39,177 @@ NORMS = {
 }
 
 
+# Rule lookup tables, aligned by infra-type index (unknown types map to the last row)
+_RULE_TYPES = list(UNIT_COSTS)
+_TYPE_INDEX = {t: i for i, t in enumerate(_RULE_TYPES)}
+_EXPECTED_COST = np.array([UNIT_COSTS[t] for t in _RULE_TYPES] + [0.0])
+_PER_STUDENTS = np.array([NORMS[t].get("per_students", 0) for t in _RULE_TYPES] + [0])
+_MIN_ENROLMENT = np.array([NORMS[t].get("min_enrolment", 0) for t in _RULE_TYPES] + [0])
+_PER_SCHOOL = np.array([NORMS[t].get("per_school", 0) for t in _RULE_TYPES] + [0])
+
+
 def validate_demand_plans(demands: list[dict]) -> list[dict]:
-    """Validate a batch of demand plans using ML + rules."""
+    """Validate a batch of demand plans using ML + rules.
+
+    Demands without a total_enrolment get their school's from si_schools_view.
+    """
     if not demands:
         return []
-
-    results = []
+    attach_enrolment(demands)
 
     # Rule-based validation
-    for demand in demands:
-        result = _rule_based_validation(demand)
-        results.append(result)
+    results = _rule_based_validation(demands)
 
-    # ML anomaly detection (if enough data)
-    if len(demands) >= 5:
+    # ML anomaly detection: the pre-trained model scores any batch size; without
+    # one, a forest is fitted on the batch itself (if enough data)
+    if get_model() is not None or len(demands) >= 5:
         _ml_anomaly_detection(demands, results)
 
     return results
 
 
-def _rule_based_validation(demand: dict) -> dict:
-    """Apply Samagra Shiksha norm-based rules."""
-    reasons = []
-    score = 100.0
-    infra_type = demand.get("infra_type", "")
-    physical_count = demand.get("physical_count", 0)
-    financial_amount = demand.get("financial_amount", 0.0)
-    total_enrolment = demand.get("total_enrolment", 0)
+def _rule_based_validation(demands: list[dict]) -> list[dict]:
+    """Apply Samagra Shiksha norm-based rules to a batch of demand dicts."""
+    infra_types = [d.get("infra_type", "") for d in demands]
+    score, status, reasons = evaluate_rules(
+        infra_types,
+        [d.get("physical_count", 0) or 0 for d in demands],
+        [d.get("financial_amount", 0.0) or 0.0 for d in demands],
+        recorded_enrolment(demands),
+    )
+
+    # Scores only take a handful of values; round each once
+    anomaly_for = {s: round(1 - s / 100, 3) for s in np.unique(score).tolist()}
+    confidence_for = {s: round(s / 100, 3) for s in anomaly_for}
+
+    return [
+        {
+            "school_id": d.get("school_id", 0),
+            "infra_type": t,
+            "is_anomaly": s < 50,
+            "anomaly_score": anomaly_for[s],
+            "validation_status": st,
+            "reasons": r if r else ["Passed all validation checks"],
+            "confidence": confidence_for[s],
+        }
+        for d, t, s, st, r in zip(demands, infra_types, score.tolist(), status.tolist(), reasons)
+    ]
+
+
+def evaluate_rules(infra_type, physical_count, financial_amount, total_enrolment):
+    """Evaluate the Samagra Shiksha rules over whole columns.
+
+    Takes equal-length sequences (lists or NumPy arrays) and returns
+    ``(score, status, reasons)``: score and status arrays, plus a list holding
+    each row's reason strings, or None for rows that passed every rule.
+    Every rule is a mask over the batch; reason strings are formatted only
+    for the rows that trip one, from the caller's own values so ints and
+    floats print exactly as they were given.
+    """
+    infra_type = list(infra_type)
+    n = len(infra_type)
+    # Python values for the reason strings, float columns for the masks
+    physical_values = _as_values(physical_count)
+    financial_values = _as_values(financial_amount)
+    enrolment_values = _as_values(total_enrolment)
+    physical = np.asarray(physical_values, dtype=np.float64)
+    financial = np.asarray(financial_values, dtype=np.float64)
+    enrolment = np.asarray(enrolment_values, dtype=np.float64)
+
+    unknown = len(_RULE_TYPES)
+    type_idx = np.array([_TYPE_INDEX.get(t, unknown) for t in infra_type], dtype=np.intp)
+    expected_cost = _EXPECTED_COST[type_idx]
+    per_students = _PER_STUDENTS[type_idx]
+    min_enrolment = _MIN_ENROLMENT[type_idx]
+    per_school = _PER_SCHOOL[type_idx]
 
     # Rule 1: Unit cost validation
-    expected_cost = UNIT_COSTS.get(infra_type, 0)
-    if expected_cost > 0 and physical_count > 0:
-        actual_unit_cost = financial_amount / physical_count
-        deviation = abs(actual_unit_cost - expected_cost) / expected_cost
-        if deviation > 0.3:
-            reasons.append(f"Unit cost deviation: {deviation*100:.0f}% from standard ₹{expected_cost}L")
-            score -= 25
-        elif deviation > 0.15:
-            reasons.append(f"Moderate cost deviation: {deviation*100:.0f}%")
-            score -= 10
+    costed = (expected_cost > 0) & (physical > 0)
+    unit_cost = np.divide(financial, physical, out=np.zeros(n), where=costed)
+    deviation = np.divide(np.abs(unit_cost - expected_cost), expected_cost, out=np.zeros(n), where=costed)
+    high_deviation = costed & (deviation > 0.3)
+    moderate_deviation = costed & ~high_deviation & (deviation > 0.15)
 
     # Rule 2: Zero value checks
-    if physical_count <= 0:
-        reasons.append("Physical count is zero or negative")
-        score -= 30
-    if financial_amount <= 0:
-        reasons.append("Financial amount is zero or negative")
-        score -= 30
+    zero_physical = physical <= 0
+    zero_financial = financial <= 0
 
     # Rule 3: Enrolment-demand correlation
-    norms = NORMS.get(infra_type, {})
-    if total_enrolment and total_enrolment > 0:
-        per_students = norms.get("per_students")
-        if per_students:
-            expected_units = max(1, total_enrolment // per_students)
-            if physical_count > expected_units * 3:
-                reasons.append(f"Demand ({physical_count}) exceeds 3x expected ({expected_units}) for enrolment {total_enrolment}")
-                score -= 20
-
-        min_enrolment = norms.get("min_enrolment", 0)
-        if total_enrolment < min_enrolment:
-            reasons.append(f"School enrolment ({total_enrolment}) below minimum ({min_enrolment}) for {infra_type}")
-            score -= 15
+    has_enrolment = enrolment > 0
+    has_norm = has_enrolment & (per_students > 0)
+    expected_units = np.maximum(1, np.floor_divide(enrolment, np.where(has_norm, per_students, 1)))
+    over_norm = has_norm & (physical > expected_units * 3)
+    under_enrolled = has_enrolment & (enrolment < min_enrolment)
 
     # Rule 4: Per-school limit
-    per_school = norms.get("per_school")
-    if per_school and physical_count > per_school * 2:
-        reasons.append(f"Demand ({physical_count}) exceeds 2x per-school limit ({per_school})")
-        score -= 15
+    over_limit = (per_school > 0) & (physical > per_school * 2)
 
     # Rule 5: Excessive financial amount
-    if financial_amount > 50:  # > 50 Lakhs for a single item
-        reasons.append(f"Very high financial amount: ₹{financial_amount}L")
-        score -= 10
+    high_financial = financial > 50  # > 50 Lakhs for a single item
 
-    score = max(0, min(100, score))
+    score = np.full(n, 100.0)
+    for penalty, mask in (
+        (25, high_deviation), (10, moderate_deviation), (30, zero_physical), (30, zero_financial),
+        (20, over_norm), (15, under_enrolled), (15, over_limit), (10, high_financial),
+    ):
+        score -= penalty * mask
+    score = np.clip(score, 0, 100)
+    status = np.where(score >= 80, "APPROVED", np.where(score >= 50, "FLAGGED", "REJECTED"))
 
-    if score >= 80:
-        status = "APPROVED"
-    elif score >= 50:
-        status = "FLAGGED"
-    else:
-        status = "REJECTED"
+    # Reasons, appended rule by rule so each row keeps the rule order
+    reasons = [None] * n
+    # .0f formatting rounds half-to-even on the binary value, as np.rint does
+    percent = np.rint(deviation * 100).astype(np.int64).tolist()
 
-    return {
-        "school_id": demand.get("school_id", 0),
-        "infra_type": infra_type,
-        "is_anomaly": score < 50,
-        "anomaly_score": round(1 - score / 100, 3),
-        "validation_status": status,
-        "reasons": reasons if reasons else ["Passed all validation checks"],
-        "confidence": round(score / 100, 3),
-    }
+    def add(mask, message):
+        """Append ``message`` (a string, or a callable of the row index) to tripped rows."""
+        for i in np.flatnonzero(mask).tolist():
+            text = message(i) if callable(message) else message
+            row = reasons[i]
+            if row is None:
+                reasons[i] = [text]
+            else:
+                row.append(text)
+
+    add(high_deviation, lambda i: (
+        f"Unit cost deviation: {percent[i]}% from standard ₹{UNIT_COSTS[infra_type[i]]}L"
+    ))
+    add(moderate_deviation, lambda i: f"Moderate cost deviation: {percent[i]}%")
+    add(zero_physical, "Physical count is zero or negative")
+    add(zero_financial, "Financial amount is zero or negative")
+    add(over_norm, lambda i: (
+        f"Demand ({physical_values[i]}) exceeds 3x expected "
+        f"({max(1, enrolment_values[i] // NORMS[infra_type[i]]['per_students'])}) "
+        f"for enrolment {enrolment_values[i]}"
+    ))
+    add(under_enrolled, lambda i: (
+        f"School enrolment ({enrolment_values[i]}) below minimum "
+        f"({NORMS[infra_type[i]].get('min_enrolment', 0)}) for {infra_type[i]}"
+    ))
+    add(over_limit, lambda i: (
+        f"Demand ({physical_values[i]}) exceeds 2x per-school limit ({NORMS[infra_type[i]]['per_school']})"
+    ))
+    add(high_financial, lambda i: f"Very high financial amount: ₹{financial_values[i]}L")
+
+    return score, status, reasons
+
+
+def _as_values(column) -> list:
+    """Column as a list of Python scalars; lists are kept as given (mixed int/float)."""
+    return column if isinstance(column, list) else np.asarray(column).tolist()
 
 
 def _ml_anomaly_detection(demands: list[dict], results: list[dict]):
     """Apply Isolation Forest anomaly detection to demand features."""
-    # Build feature matrix
-    features = []
-    for d in demands:
-        physical = d.get("physical_count", 0)
-        financial = d.get("financial_amount", 0.0)
-        enrolment = d.get("total_enrolment", 0) or 100  # default
-        unit_cost = financial / max(physical, 1)
-        cost_per_student = financial / max(enrolment, 1)
-
-        features.append([
-            physical,
-            financial,
-            unit_cost,
-            cost_per_student,
-            enrolment,
-        ])
-
-    X = np.array(features)
-
-    # Fit Isolation Forest
-    iso_forest = IsolationForest(
-        contamination=0.15,
-        random_state=42,
-        n_estimators=100,
-    )
-    predictions = iso_forest.fit_predict(X)
-    anomaly_scores = iso_forest.decision_function(X)
+    bundle = get_model()
+    if bundle is not None:
+        # Each demand against its own infra type's forest
+        anomaly_scores = decision_scores(demands, bundle)
+    else:
+        # No model trained yet (python -m app.services.anomaly_model train)
+        X = build_features(demands)
+        anomaly_scores = new_forest().fit(X).decision_function(X)
+    predictions = np.where(anomaly_scores < 0, -1, 1)
 
     # Update results with ML scores
     for i, (pred, a_score) in enumerate(zip(predictions, anomaly_scores)):
@@ -170,6 +227,98 @@ def _ml_anomaly_detection(demands: list[dict], results: list[dict]):
                     results[i]["confidence"] = max(0.4, results[i]["confidence"] - 0.2)
 
 
+def validate_pending_plans(plans: list[dict], chunk_size: int | None = None) -> dict:
+    """Validate rows of si_demand_plans_view and write the verdicts back by id.
+
+    The view carries no enrolment; validate_demand_plans() looks it up in
+    si_schools_view, as training does.
+    """
+    demands = [{
+        "school_id": d["school_id"],
+        "infra_type": d["infra_type"],
+        "physical_count": d["physical_count"],
+        "financial_amount": d["financial_amount"],
+        "school_category": d.get("school_category"),
+        "total_enrolment": None,
+    } for d in plans]
+
+    results = validate_demand_plans(demands)
+
+    # Update DB
+    write_back = save_validation_results(
+        [{"id": orig["id"], **verdict_fields(r)} for r, orig in zip(results, plans)],
+        chunk_size,
+    )
+
+    # Count only verdicts that reached the database; the rest stay PENDING
+    failed_ids = {plan_id for e in write_back["errors"] for plan_id in e["keys"]}
+    written = [r for r, orig in zip(results, plans) if orig["id"] not in failed_ids]
+    return {
+        "total_processed": len(written),
+        "approved": sum(1 for r in written if r["validation_status"] == "APPROVED"),
+        "flagged": sum(1 for r in written if r["validation_status"] == "FLAGGED"),
+        "rejected": sum(1 for r in written if r["validation_status"] == "REJECTED"),
+        "write_back": write_back,
+    }
+
+
+def verdict_fields(result: dict) -> dict:
+    """The si_demand_plans columns a validation result writes."""
+    return {
+        "validation_status": result["validation_status"],
+        "validation_score": result["confidence"],
+        "validation_flags": result["reasons"],
+    }
+
+
+def save_validation_results(updates: list[dict], chunk_size: int | None = None) -> dict:
+    """Write verdicts back in chunks through the si_apply_validation_results RPC.
+
+    Each update holds the verdict_fields() plus either the plan ``id`` or a
+    ``school_id`` + ``infra_type`` pair, which updates every plan of that
+    school and type. A failed chunk does not stop the others; the summary
+    reports throughput, and each failed chunk with the ids (or
+    [school_id, infra_type] pairs) it covered.
+    """
+    chunk_size = chunk_size or VALIDATION_WRITE_CHUNK_SIZE
+
+    # One update per target, last one wins (as with one UPDATE per result)
+    by_target = {}
+    for u in updates:
+        key = ("id", u["id"]) if u.get("id") is not None else ("plan", u["school_id"], u["infra_type"])
+        by_target[key] = u
+    rows = list(by_target.values())
+
+    db = get_db()
+    start = time.perf_counter()
+    updated, errors = 0, []
+    for n, i in enumerate(range(0, len(rows), chunk_size)):
+        chunk = rows[i:i + chunk_size]
+        try:
+            updated += db.rpc("si_apply_validation_results", {"p_results": chunk}).execute().data or 0
+        except Exception as e:
+            errors.append({
+                "chunk": n,
+                "rows": len(chunk),
+                "keys": [u["id"] if u.get("id") is not None else [u["school_id"], u["infra_type"]] for u in chunk],
+                "error": str(e),
+            })
+    elapsed = time.perf_counter() - start
+    if updated:
+        invalidate_responses()
+
+    return {
+        "rows_sent": len(rows),
+        "rows_updated": updated,
+        "chunks": -(-len(rows) // chunk_size),
+        "failed_chunks": len(errors),
+        "failed_rows": sum(e["rows"] for e in errors),
+        "elapsed_s": round(elapsed, 3),
+        "rows_per_sec": round(len(rows) / elapsed, 1) if elapsed > 0 else None,
+        "errors": errors,
+    }
+
+
 def get_all_demand_plans() -> list[dict]:
     """Fetch all demand plans from DB for batch validation."""
     db = get_db()
@@ -0,0 +1,123 @@
+"""
+Forecast engine benchmark — per-school latency, sklearn vs closed-form NumPy.
+
+Runs the forecast pipeline on synthetic enrolment history (no database), so
+numbers reflect model cost only. ``--cache`` instead reads real enrolment from
+the seeder's Arrow cache of the enrolment workbook (needs pyarrow).
+
+Usage (from school-infra-backend/):
+    python -m benchmarks.forecast_benchmark --schools 500 --years-ahead 3
+    python -m benchmarks.forecast_benchmark --cache ../school_infra_app/supabase/.seed_cache/School_Enrolment_*.arrow
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from app.services.forecast_service import ENGINES, GRADE_ORDER, _forecast_batch
+
+YEARS = ["2019-20", "2020-21", "2021-22", "2022-23", "2023-24", "2024-25"]
+GRADES = ["PP3", "PP2", "PP1", "Class 1", "Class 2", "Class 3", "Class 4", "Class 5",
+          "Class 6", "Class 7", "Class 8", "Class 9", "Class 10"]
+
+
+def synthetic_history(n_schools: int, seed: int = 42) -> dict[int, list[dict]]:
+    """2–5 years of grade-wise enrolment per school."""
+    rng = random.Random(seed)
+    by_school = {}
+    for school_id in range(1, n_schools + 1):
+        n_years = rng.randint(2, 5)
+        records = []
+        for year in YEARS[-n_years:]:
+            for grade in GRADES:
+                boys, girls = rng.randint(5, 40), rng.randint(5, 40)
+                records.append({
+                    "school_id": school_id,
+                    "academic_year": year,
+                    "grade": grade,
+                    "boys": boys,
+                    "girls": girls,
+                    "total": boys + girls,
+                })
+        by_school[school_id] = records
+    return by_school
+
+
+def cached_history(path: str) -> dict[int, list[dict]]:
+    """Grade-wise enrolment per UDISE code from a cached enrolment sheet."""
+    import pyarrow as pa
+    import pyarrow.ipc
+
+    # Workbook (boys, girls, total) columns of each forecast grade
+    grade_columns = {
+        grade: (f"{grade}_B", f"{grade}_G", f"{grade}_T") for grade in GRADE_ORDER[:3]
+    } | {
+        grade: (f"C{n}B", f"C{n}G", f"C{n}T") for n, grade in enumerate(GRADE_ORDER[3:], start=1)
+    }
+    with pa.memory_map(path) as source:
+        table = pa.ipc.open_file(source).read_all()
+        udise = table.column("UDISE_Code").to_pylist()
+        years = table.column("Academic_Year").to_pylist()
+        counts = {
+            grade: [[v or 0 for v in table.column(c).to_pylist()] for c in cols]
+            for grade, cols in grade_columns.items() if all(c in table.column_names for c in cols)
+        }
+
+    by_school = {}
+    for i, (school_id, year) in enumerate(zip(udise, years)):
+        if not school_id or not year:
+            continue
+        for grade, (boys, girls, totals) in counts.items():
+            total = int(totals[i] or boys[i] + girls[i])
+            if total:
+                by_school.setdefault(int(school_id), []).append({
+                    "school_id": int(school_id),
+                    "academic_year": str(year),
+                    "grade": grade,
+                    "boys": int(boys[i]),
+                    "girls": int(girls[i]),
+                    "total": total,
+                })
+    return by_school
+
+
+def bench_per_school(by_school: dict, years_ahead: int, engine: str) -> list[float]:
+    """Latency (ms) of one single-school forecast call per school."""
+    timings = []
+    for school_id, records in by_school.items():
+        start = time.perf_counter()
+        _forecast_batch({school_id: records}, years_ahead, engine)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--schools", type=int, default=500)
+    parser.add_argument("--years-ahead", type=int, default=3)
+    parser.add_argument("--cache", help="seeder's Arrow cache of the enrolment workbook")
+    args = parser.parse_args()
+
+    by_school = cached_history(args.cache) if args.cache else synthetic_history(args.schools)
+    args.schools = len(by_school)
+    print(f"Schools: {args.schools}, years ahead: {args.years_ahead}\n")
+    print(f"{'engine':<10}{'median ms':>12}{'p95 ms':>12}{'total s':>12}")
+
+    medians = {}
+    for engine in ENGINES:
+        timings = sorted(bench_per_school(by_school, args.years_ahead, engine))
+        medians[engine] = statistics.median(timings)
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        print(f"{engine:<10}{medians[engine]:>12.3f}{p95:>12.3f}{sum(timings) / 1000:>12.2f}")
+
+    print(f"\nPer-school speedup (sklearn -> numpy): {medians['sklearn'] / medians['numpy']:.1f}x")
+
+    for engine in ENGINES:
+        start = time.perf_counter()
+        _forecast_batch(by_school, args.years_ahead, engine)
+        print(f"Batch engine ({engine}): {time.perf_counter() - start:.2f}s for {args.schools} schools")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Validation rule engine benchmark — CPU time of the columnar Samagra Shiksha rules.
+
+Runs on synthetic demand lines (no database, no Isolation Forest), so numbers
+reflect rule evaluation only. ``--cache`` instead reads the demand lines from
+the seeder's Arrow cache of the demand plan workbook (needs pyarrow); their
+enrolment is synthetic.
+
+Usage (from school-infra-backend/):
+    python -m benchmarks.validation_benchmark --lines 300000 --flagged 0.1
+    python -m benchmarks.validation_benchmark --cache ../school_infra_app/supabase/.seed_cache/Sample_Demand_Plan_*.arrow
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from app.services.validation_service import UNIT_COSTS, _rule_based_validation, evaluate_rules
+
+
+def synthetic_demands(n_lines: int, flagged: float, seed: int = 42) -> list[dict]:
+    """Demand lines near standard unit cost; ``flagged`` share gets a 2x cost overrun."""
+    rng = random.Random(seed)
+    infra_types = list(UNIT_COSTS)
+    demands = []
+    for i in range(n_lines):
+        infra_type = rng.choice(infra_types)
+        physical = rng.randint(1, 2)
+        overrun = 2.0 if rng.random() < flagged else rng.uniform(0.9, 1.1)
+        demands.append({
+            "school_id": i + 1,
+            "infra_type": infra_type,
+            "physical_count": physical,
+            "financial_amount": round(UNIT_COSTS[infra_type] * physical * overrun, 2),
+            "total_enrolment": rng.randint(60, 900),
+        })
+    return demands
+
+
+# Workbook column positions of each infra type: (physical, financial)
+DEMAND_COLUMNS = {
+    "CWSN_RESOURCE_ROOM": (9, 10),
+    "CWSN_TOILET": (11, 12),
+    "DRINKING_WATER": (13, 14),
+    "ELECTRIFICATION": (15, 16),
+    "RAMPS": (17, 18),
+}
+
+
+def cached_demands(path: str, seed: int = 42) -> list[dict]:
+    """Demand lines of a cached demand plan sheet, with synthetic enrolment."""
+    import pyarrow as pa
+    import pyarrow.ipc
+
+    rng = random.Random(seed)
+    with pa.memory_map(path) as source:
+        table = pa.ipc.open_file(source).read_all()
+        udise = table.column("School Code").to_pylist()
+        columns = {
+            infra_type: (table.column(p).to_pylist(), table.column(f).to_pylist())
+            for infra_type, (p, f) in DEMAND_COLUMNS.items()
+        }
+
+    demands = []
+    for i, school_id in enumerate(udise):
+        if not school_id:
+            continue
+        enrolment = rng.randint(60, 900)
+        for infra_type, (physical, financial) in columns.items():
+            count, amount = _number(physical[i]), _number(financial[i])
+            if count > 0 or amount > 0:
+                demands.append({
+                    "school_id": int(school_id),
+                    "infra_type": infra_type,
+                    "physical_count": int(count),
+                    "financial_amount": amount,
+                    "total_enrolment": enrolment,
+                })
+    return demands
+
+
+def _number(value) -> float:
+    try:
+        return float(value or 0)
+    except ValueError:
+        return 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, default=300_000)
+    parser.add_argument("--flagged", type=float, default=0.1)
+    parser.add_argument("--cache", help="seeder's Arrow cache of the demand plan workbook")
+    args = parser.parse_args()
+
+    demands = cached_demands(args.cache) if args.cache else synthetic_demands(args.lines, args.flagged)
+    args.lines = len(demands)
+    columns = (
+        [d["infra_type"] for d in demands],
+        np.array([d["physical_count"] for d in demands]),
+        np.array([d["financial_amount"] for d in demands]),
+        np.array([d["total_enrolment"] for d in demands]),
+    )
+    source = args.cache or f"synthetic, flagged share: {args.flagged:.0%}"
+    print(f"Demand lines: {args.lines} ({source})\n")
+
+    start = time.process_time()
+    _, status, _ = evaluate_rules(*columns)
+    elapsed = time.process_time() - start
+    print(f"Columnar rules:   {elapsed:.3f}s CPU ({args.lines / elapsed:,.0f} lines/s)")
+
+    start = time.process_time()
+    _rule_based_validation(demands)
+    elapsed = time.process_time() - start
+    print(f"Rules over dicts: {elapsed:.3f}s CPU ({args.lines / elapsed:,.0f} lines/s)")
+
+    counts = dict(zip(*np.unique(status, return_counts=True)))
+    print(f"\nStatuses: {', '.join(f'{k}={v}' for k, v in counts.items())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Shared fixtures. Tests run against the embedded SQLite backend only: the
+environment below is set before any app module reads it, so no test can
+reach Supabase or write the developer's local.sqlite3 / jobs.sqlite3.
+"""
+
+import os
+import tempfile
+
+_TMP = tempfile.mkdtemp(prefix="school-infra-tests-")
+os.environ["DB_BACKEND"] = "sqlite"
+os.environ["LOCAL_DB_PATH"] = os.path.join(_TMP, "local.sqlite3")
+os.environ["JOB_STORE_PATH"] = os.path.join(_TMP, "jobs.sqlite3")
+os.environ["ANOMALY_MODEL_DIR"] = os.path.join(_TMP, "model_registry")
+os.environ["PRIORITY_POLL_INTERVAL"] = "0"
+
+import pytest  # noqa: E402
+
+from app.services import db, job_store  # noqa: E402
+from app.services.local_db import LocalClient  # noqa: E402
+
+
+@pytest.fixture
+def local_db(tmp_path, monkeypatch):
+    """A fresh, empty SQLite database behind get_db() / get_async_db()."""
+    client = LocalClient(str(tmp_path / "local.sqlite3"))
+    monkeypatch.setattr(db, "_client", client)
+    monkeypatch.setattr(db, "_async_client", None)
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """A fresh job store behind get_job_store()."""
+    fresh = job_store.JobStore(str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(job_store, "_store", fresh)
+    return fresh
+
+
+def seed_schools(client: LocalClient, per_mandal: int = 3, mandals: int = 2) -> list[dict]:
+    """One district of ``mandals`` mandals with ``per_mandal`` schools each; returns the schools."""
+    state = client.table("si_states").insert({"state_name": "Test State"}).execute().data[0]
+    district = client.table("si_districts").insert(
+        {"state_id": state["id"], "district_name": "Test District"}
+    ).execute().data[0]
+    schools = []
+    for m in range(mandals):
+        mandal = client.table("si_mandals").insert(
+            {"district_id": district["id"], "mandal_name": f"Mandal {m}"}
+        ).execute().data[0]
+        schools += client.table("si_schools").insert([
+            {
+                "udise_code": 1000 + len(schools) + i,
+                "school_name": f"School {m}-{i}",
+                "district_id": district["id"],
+                "mandal_id": mandal["id"],
+            }
+            for i in range(per_mandal)
+        ]).execute().data
+    return schools
@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+from app.services import anomaly_model
+from app.services.anomaly_model import ANOMALY_CONTAMINATION, train_model
+from app.services.validation_service import (
+    UNIT_COSTS, get_all_demand_plans, validate_demand_plans, validate_pending_plans,
+)
+from tests.conftest import seed_schools
+
+INFRA_TYPES = ["CWSN_TOILET", "DRINKING_WATER", "RAMPS"]
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    """An empty model registry, with no model active."""
+    monkeypatch.setattr(anomaly_model, "ANOMALY_MODEL_DIR", str(tmp_path / "model_registry"))
+    monkeypatch.setattr(anomaly_model, "_active", None)
+    monkeypatch.setattr(anomaly_model, "_loaded", False)
+
+
+def _seed_plans(client, plans_per_school: int = 20) -> list[dict]:
+    """Schools with enrolment far from the 100-student default, each with rule-clean plans."""
+    rng = np.random.default_rng(5)
+    schools = seed_schools(client, per_mandal=10, mandals=2)
+    client.table("si_enrolment_history").insert([
+        {"school_id": s["id"], "academic_year": "2023-24", "grade": "Class 1",
+         "boys": 0, "girls": 0, "total": int(rng.integers(300, 1500))}
+        for s in schools
+    ]).execute()
+    plans = []
+    for s in schools:
+        for _ in range(plans_per_school):
+            infra_type = INFRA_TYPES[int(rng.integers(len(INFRA_TYPES)))]
+            count = int(rng.integers(1, 3))
+            plans.append({
+                "school_id": s["id"],
+                "plan_year": 2025,
+                "infra_type": infra_type,
+                "physical_count": count,
+                "financial_amount": round(count * UNIT_COSTS[infra_type] * rng.uniform(0.92, 1.08), 2),
+            })
+    client.table("si_demand_plans").insert(plans).execute()
+    return plans
+
+
+def test_batch_validation_scores_plans_with_their_training_enrolment(local_db, registry):
+    plans = _seed_plans(local_db)
+    train_model()
+
+    summary = validate_pending_plans(get_all_demand_plans())
+    assert summary["total_processed"] == len(plans)
+    flag_rate = (summary["flagged"] + summary["rejected"]) / len(plans)
+    assert flag_rate <= ANOMALY_CONTAMINATION + 0.05
+
+
+def test_pending_plans_take_enrolment_from_si_schools_view(local_db, registry):
+    _seed_plans(local_db, plans_per_school=1)
+    enrolment = {
+        s["id"]: s["total_enrolment"]
+        for s in local_db.table("si_schools_view").select("id,total_enrolment").execute().data
+    }
+    demands = anomaly_model.attach_enrolment(
+        [{"school_id": p["school_id"], "total_enrolment": None} for p in get_all_demand_plans()]
+    )
+    assert all(d["total_enrolment"] == enrolment[d["school_id"]] for d in demands)
+
+
+def test_scoring_builds_the_same_features_as_the_training_cache(local_db, registry):
+    _seed_plans(local_db, plans_per_school=3)
+    train_model()
+    cached = anomaly_model.load_feature_cache()
+
+    plans = sorted(get_all_demand_plans(), key=lambda p: p["id"])
+    demands = anomaly_model.attach_enrolment([
+        {k: p[k] for k in ("school_id", "infra_type", "physical_count", "financial_amount")}
+        for p in plans
+    ])
+    scored = anomaly_model.build_feature_matrices(demands)
+    assert scored.keys() == cached.keys()
+    for infra_type, X in scored.items():
+        np.testing.assert_array_equal(X, cached[infra_type])
+
+
+def test_missing_enrolment_reads_the_same_everywhere():
+    demands = [{"physical_count": 1, "financial_amount": 3.4, "total_enrolment": e} for e in (None, 0, -3)]
+    assert anomaly_model.recorded_enrolment(demands) == [0, 0, 0]
+    X = anomaly_model.build_features(demands)
+    assert (X == X[0]).all()
+    assert X[0, -1] == anomaly_model.DEFAULT_ENROLMENT
+
+
+def test_requests_without_enrolment_are_scored_like_requests_with_it(local_db, registry):
+    _seed_plans(local_db)
+    train_model()
+    enrolment = {
+        s["id"]: s["total_enrolment"]
+        for s in local_db.table("si_schools_view").select("id,total_enrolment").execute().data
+    }
+    plans = get_all_demand_plans()[:50]
+    fields = ("school_id", "infra_type", "physical_count", "financial_amount")
+    without = validate_demand_plans([{k: p[k] for k in fields} for p in plans])
+    given = validate_demand_plans([
+        {**{k: p[k] for k in fields}, "total_enrolment": enrolment[p["school_id"]]} for p in plans
+    ])
+    assert without == given
@@ -0,0 +1,39 @@
+from app.services.batch_service import forecast_shard
+from tests.conftest import seed_schools
+
+
+def _seed_history(client, schools):
+    client.table("si_enrolment_history").insert([
+        {"school_id": s["id"], "academic_year": year, "grade": "Class 1",
+         "boys": 10 + k + n, "girls": 12 + k, "total": 22 + 2 * k + n}
+        for n, s in enumerate(schools)
+        for k, year in enumerate(["2021-22", "2022-23", "2023-24"])
+    ]).execute()
+
+
+def test_incremental_skips_unchanged_schools_with_saved_forecasts(local_db, store):
+    schools = seed_schools(local_db, per_mandal=3, mandals=1)
+    _seed_history(local_db, schools)
+    ids = [s["id"] for s in schools]
+
+    first = forecast_shard(1, ids, years_ahead=1, incremental=True)
+    assert first["total_processed"] == 3 and first["unchanged"] == 0
+
+    again = forecast_shard(1, ids, years_ahead=1, incremental=True)
+    assert again["total_processed"] == 0 and again["unchanged"] == 3
+
+
+def test_incremental_reforecasts_schools_whose_forecasts_were_deleted(local_db, store):
+    schools = seed_schools(local_db, per_mandal=3, mandals=1)
+    _seed_history(local_db, schools)
+    ids = [s["id"] for s in schools]
+    forecast_shard(1, ids, years_ahead=1, incremental=True)
+
+    # Forecasts removed in the database; the job store still has their fingerprints
+    local_db.table("si_enrolment_forecasts").delete().eq("school_id", ids[0]).execute()
+
+    result = forecast_shard(1, ids, years_ahead=1, incremental=True)
+    assert result["unchanged"] == 2
+    assert [r["school_id"] for r in result["results"]] == [ids[0]]
+    saved = local_db.table("si_enrolment_forecasts").select("school_id").eq("school_id", ids[0]).execute().data
+    assert saved
@@ -0,0 +1,114 @@
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from app.services import jobs
+from app.services.jobs import JobContext, job_handler
+
+_runs = []
+_runs_lock = threading.Lock()
+
+
+@job_handler("test_shards")
+def _run_test_shards(ctx: JobContext) -> dict:
+    with _runs_lock:
+        _runs.append(ctx.job_id)
+    shards = ctx.shards(lambda: [("district:1:0", 1, [1, 2]), ("district:2:0", 2, [3])])
+    for key, _, ids in shards:
+        if key not in ctx.completed:
+            ctx.checkpoint(key, {"schools": len(ids)})
+    return {"shards": len(shards)}
+
+
+@pytest.fixture(autouse=True)
+def _fresh_runs():
+    _runs.clear()
+    yield
+    jobs.shutdown(wait=True)
+
+
+def _dead_pid() -> int:
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+def test_claim_is_atomic(store):
+    job = store.create("test_shards", {})
+    assert store.claim(job["id"], "host:1:a")
+    assert not store.claim(job["id"], "host:2:b")
+    # Taking over from an owner only works for the owner recorded now
+    assert not store.claim(job["id"], "host:2:b", expected_owner="host:9:z")
+    assert store.claim(job["id"], "host:2:b", expected_owner="host:1:a")
+    assert store.get(job["id"])["owner"] == "host:2:b"
+
+
+def test_resume_skips_jobs_of_live_owners_and_runs_orphans_once(store):
+    live = store.create("test_shards", {})
+    orphan = store.create("test_shards", {})
+    store.claim(live["id"], f"{jobs._HOST}:{jobs.os.getppid()}:other")
+    store.claim(orphan["id"], f"{jobs._HOST}:{_dead_pid()}:gone")
+
+    # Two workers starting at once both see the orphan; only one claim wins
+    assert jobs.resume_unfinished_jobs() == 1
+    jobs.resume_unfinished_jobs()
+    jobs.shutdown(wait=True)
+
+    assert _runs == [orphan["id"]]
+    assert store.get(orphan["id"])["status"] == "COMPLETED"
+    assert store.get(live["id"])["status"] == "RUNNING"
+
+
+def test_job_owned_on_another_host_is_resumed_after_lease(store, monkeypatch):
+    job = store.create("test_shards", {})
+    store.claim(job["id"], "elsewhere:1:x")
+    assert jobs._owner_alive(store.get(job["id"]))
+    monkeypatch.setattr(jobs, "JOB_LEASE_S", 0)
+    assert not jobs._owner_alive(store.get(job["id"]))
+
+
+def test_resume_job_requeues_failed_job_once(store):
+    job = store.create("test_shards", {})
+    store.update(job["id"], status="FAILED", error="boom")
+    assert jobs.resume_job(job["id"])
+    assert not jobs.resume_job(job["id"])
+    jobs.shutdown(wait=True)
+    assert _runs == [job["id"]]
+    assert store.get(job["id"])["status"] == "COMPLETED"
+
+
+def test_resumed_job_keeps_its_first_shard_plan(store):
+    job = store.create("test_shards", {})
+    store.save_shards(job["id"], [("district:1:0", 1, [1, 2, 3, 4]), ("district:1:1", 1, [5])])
+    store.save_checkpoint(job["id"], "district:1:0", {"schools": 4})
+
+    ctx = JobContext(store.get(job["id"]))
+    shards = ctx.shards(lambda: [("district:1:0", 1, [1, 2]), ("district:1:1", 1, [3, 4, 5, 6])])
+
+    assert shards == [("district:1:0", 1, [1, 2, 3, 4]), ("district:1:1", 1, [5])]
+    assert [k for k, _, _ in shards if k not in ctx.completed] == ["district:1:1"]
+
+
+def test_eta_uses_rate_since_resume(monkeypatch):
+    now = 1_000.0
+    monkeypatch.setattr(jobs.time, "time", lambda: now)
+    job = {
+        "id": "j", "status": "RUNNING", "started_at": now - 500, "finished_at": None,
+        # Resumed 100s ago at 40/100 done; 20 more done since
+        "progress": {"total": 100, "done": 60, "done_at_start": 40, "resumed_at": now - 100},
+    }
+    timed = jobs._with_timing(job)
+    assert timed["job_id"] == "j"
+    assert timed["elapsed_s"] == 500
+    assert timed["eta_s"] == 200  # 5s per item, 40 left
+
+
+def test_eta_unknown_until_progress_since_resume(monkeypatch):
+    monkeypatch.setattr(jobs.time, "time", lambda: 1_000.0)
+    job = {
+        "id": "j", "status": "RUNNING", "started_at": 900.0, "finished_at": None,
+        "progress": {"total": 100, "done": 40, "done_at_start": 40, "resumed_at": 990.0},
+    }
+    assert jobs._with_timing(job)["eta_s"] is None
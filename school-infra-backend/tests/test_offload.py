@@ -0,0 +1,93 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.services import offload
+from app.services.offload import Lane, LaneFull
+
+
+@pytest.fixture
+def executor():
+    pool = ThreadPoolExecutor(max_workers=4)
+    yield pool
+    pool.shutdown(wait=True)
+
+
+async def _until(condition, timeout: float = 5.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline, "condition not reached"
+        await asyncio.sleep(0.01)
+
+
+def test_lane_rejects_callers_past_its_queue_limit(executor):
+    async def scenario():
+        lane = Lane("test", limit=1, max_queue=1)
+        release = threading.Event()
+        holder = asyncio.create_task(lane.run(executor, release.wait))
+        await _until(lambda: lane.running == 1)
+        waiter = asyncio.create_task(lane.run(executor, lambda: "queued"))
+        await _until(lambda: lane.waiting == 1)
+
+        with pytest.raises(LaneFull):
+            await lane.run(executor, lambda: "rejected")
+        assert lane.rejected == 1
+
+        release.set()
+        assert await holder is True and await waiter == "queued"
+        assert lane.stats()["completed"] == 2 and lane.running == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_call_keeps_its_slot_until_the_thread_finishes(executor):
+    async def scenario():
+        lane = Lane("test", limit=1)
+        release = threading.Event()
+        call = asyncio.create_task(lane.run(executor, release.wait))
+        await _until(lambda: lane.running == 1)
+
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        # The thread is still running, so the slot stays taken
+        assert lane.running == 1 and lane._slots.locked()
+
+        release.set()
+        await _until(lambda: lane.running == 0)
+        assert not lane._slots.locked() and lane.completed == 1
+        assert await lane.run(executor, lambda: "next") == "next"
+
+    asyncio.run(scenario())
+
+
+def test_full_io_lane_answers_503_with_retry_after(store, monkeypatch):
+    from app.main import app
+
+    offload.start()
+    monkeypatch.setitem(offload._lanes, "io", Lane("io", limit=0, max_queue=0))
+    try:
+        response = TestClient(app).get("/api/jobs")
+    finally:
+        offload.shutdown()
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert "retry" in response.json()["detail"]
+
+
+def test_job_routes_answer_through_the_io_lane(store):
+    from app.main import app
+
+    offload.start()
+    try:
+        client = TestClient(app)
+        assert client.get("/api/jobs").json() == []
+        assert client.get("/api/jobs/missing").status_code == 404
+        assert client.post("/api/jobs/missing/resume").status_code == 404
+        assert offload.offload_stats()["lanes"]["io"]["completed"] == 3
+    finally:
+        offload.shutdown()
@@ -0,0 +1,86 @@
+import json
+
+from app.services import priority_service
+from app.services.priority_service import rescore_priority_scores
+from tests.conftest import seed_schools
+
+
+def _scored(result):
+    return sorted(row["school_id"] for row in result["scores"])
+
+
+def test_incremental_pass_right_after_full_pass_scores_nothing(local_db, store):
+    seed_schools(local_db, per_mandal=3, mandals=2)
+
+    first = rescore_priority_scores(2025)
+    assert first["mode"] == "full" and len(first["scores"]) == 6
+
+    # Inputs were written moments ago, well inside the overlap window
+    again = rescore_priority_scores(2025)
+    assert again["mode"] == "incremental" and again["scores"] == []
+
+
+def test_incremental_pass_scores_only_changed_schools(local_db, store):
+    schools = seed_schools(local_db, per_mandal=3, mandals=2)
+    rescore_priority_scores(2025)
+
+    local_db.table("si_schools").update({"school_category": "PS"}).eq("id", schools[4]["id"]).execute()
+    local_db.table("si_enrolment_history").insert(
+        {"school_id": schools[1]["id"], "academic_year": "2024-25", "grade": "Class 1", "total": 40}
+    ).execute()
+
+    changed = rescore_priority_scores(2025)
+    assert _scored(changed) == sorted([schools[1]["id"], schools[4]["id"]])
+    assert rescore_priority_scores(2025)["scores"] == []
+
+
+def test_watermark_is_newest_database_timestamp_read(local_db, store):
+    seed_schools(local_db, per_mandal=2, mandals=1)
+    result = rescore_priority_scores(2025)
+
+    newest = max(
+        row["updated_at"]
+        for table in priority_service.SCORE_INPUT_TABLES
+        for row in local_db.table(table).select("updated_at").execute().data
+    )
+    assert result["watermark"] == newest
+    saved = json.loads(store.watermark("priority:2025"))
+    assert saved["at"] == newest
+    assert len(saved["tables"]["si_schools"]["seen"]) == 2
+
+
+def test_watermark_of_earlier_versions_is_still_read(local_db, store):
+    schools = seed_schools(local_db, per_mandal=2, mandals=1)
+    store.save_watermark("priority:2025", "2000-01-01T00:00:00+00:00")
+    result = rescore_priority_scores(2025)
+    assert result["mode"] == "incremental"
+    assert _scored(result) == sorted(s["id"] for s in schools)
+
+
+def test_watermark_remembers_a_bounded_window(local_db, store, monkeypatch):
+    monkeypatch.setattr(priority_service, "PRIORITY_WATERMARK_SEEN_LIMIT", 3)
+    schools = seed_schools(local_db, per_mandal=5, mandals=2)
+    rescore_priority_scores(2025)
+
+    saved = json.loads(store.watermark("priority:2025"))
+    assert all(len(t["seen"]) <= 3 for t in saved["tables"].values())
+    # The whole window is covered by its digest, so nothing is re-scored
+    assert rescore_priority_scores(2025)["scores"] == []
+
+    # A late commit: a row stamped inside the window, below the watermark
+    late = {"school_id": schools[0]["id"], "academic_year": "2024-25", "grade": "Class 1",
+            "total": 40, "updated_at": saved["at"]}
+    local_db.table("si_enrolment_history").insert(late).execute()
+    assert schools[0]["id"] in _scored(rescore_priority_scores(2025))
+
+
+def test_watermark_of_the_previous_json_format_is_still_read(local_db, store):
+    schools = seed_schools(local_db, per_mandal=2, mandals=1)
+    rescore_priority_scores(2025)
+    saved = json.loads(store.watermark("priority:2025"))
+    legacy = {"at": saved["at"], "seen": {t: w["seen"] for t, w in saved["tables"].items()}}
+    store.save_watermark("priority:2025", json.dumps(legacy))
+    assert rescore_priority_scores(2025)["scores"] == []
+    del legacy["seen"]["si_schools"][str(schools[0]["id"])]
+    store.save_watermark("priority:2025", json.dumps(legacy))
+    assert _scored(rescore_priority_scores(2025)) == [schools[0]["id"]]
@@ -0,0 +1,108 @@
+import asyncio
+
+from app.services import ranking_service
+from app.services.ranking_service import PriorityIndex
+from tests.conftest import seed_schools
+
+
+def _row(school_id, score, year=2025, district=1, mandal=10, level="HIGH"):
+    return {
+        "id": school_id,
+        "district_id": district,
+        "mandal_id": mandal,
+        "priority_score": score,
+        "priority_level": level,
+        "priority_score_year": year if score is not None else None,
+    }
+
+
+def _score(school_id, score, year=2025, level="HIGH"):
+    return {"school_id": school_id, "composite_score": score, "priority_level": level, "score_year": year}
+
+
+def _top_ids(index, k=10, **scope):
+    return [e["school_id"] for e in index.top(k, **scope)[1]]
+
+
+def test_top_orders_by_score_then_id_per_partition():
+    index = PriorityIndex()
+    index.load([
+        _row(1, 50.0), _row(2, 80.0), _row(3, 80.0, mandal=11), _row(4, 20.0, district=2, mandal=20), _row(5, None),
+    ])
+    assert _top_ids(index) == [2, 3, 1, 4]
+    assert _top_ids(index, district_id=1) == [2, 3, 1]
+    assert _top_ids(index, mandal_id=10) == [2, 1]
+    assert index.top(10)[0] == 4  # the unscored school is not ranked
+
+
+def test_update_reorders_and_ties_share_rank():
+    index = PriorityIndex()
+    index.load([_row(1, 50.0), _row(2, 80.0), _row(3, 30.0)])
+    index.update([_score(3, 90.0), _score(1, 80.0)])
+    assert _top_ids(index) == [3, 1, 2]
+    assert index.rank(1)["ranks"]["state"]["rank"] == 2
+    assert index.rank(2)["ranks"]["state"]["rank"] == 2
+
+
+def test_older_score_year_after_load_does_not_downgrade():
+    index = PriorityIndex()
+    index.load([_row(1, 50.0, year=2025), _row(2, 80.0, year=2025)])
+    before = index.rank(1)
+
+    index.update([_score(1, 99.0, year=2024)])
+
+    assert index.rank(1) == before
+    assert _top_ids(index) == [2, 1]
+    assert not index.stale
+
+
+def test_scored_school_of_unknown_year_marks_index_stale():
+    index = PriorityIndex()
+    index.load([{**_row(1, 50.0), "priority_score_year": None}])
+    index.update([_score(1, 10.0, year=2020)])
+    assert index.rank(1)["composite_score"] == 50.0
+    assert index.stale
+
+
+def test_refresh_reads_latest_score_year_from_view(local_db, monkeypatch):
+    monkeypatch.setattr(ranking_service, "_index", None)
+    schools = seed_schools(local_db, per_mandal=2, mandals=1)
+    local_db.table("si_school_priority_scores").insert([
+        {"school_id": schools[0]["id"], "score_year": 2024, "composite_score": 10.0, "priority_level": "LOW"},
+        {"school_id": schools[0]["id"], "score_year": 2025, "composite_score": 70.0, "priority_level": "HIGH"},
+        {"school_id": schools[1]["id"], "score_year": 2025, "composite_score": 40.0, "priority_level": "MEDIUM"},
+    ]).execute()
+
+    asyncio.run(ranking_service.refresh_priority_index())
+    index = ranking_service.get_priority_index()
+    assert index.rank(schools[0]["id"])["score_year"] == 2025
+
+    # A late re-score of 2024 must not replace the 2025 score
+    index.update([_score(schools[0]["id"], 5.0, year=2024, level="LOW")])
+    assert _top_ids(index) == [schools[0]["id"], schools[1]["id"]]
+    assert index.rank(schools[0]["id"])["composite_score"] == 70.0
+
+
+def test_level_filter_slices_the_level_partition_with_partition_ranks():
+    index = PriorityIndex()
+    index.load([
+        _row(1, 85.0, level="CRITICAL"), _row(2, 70.0), _row(3, 65.0, mandal=11),
+        _row(4, 45.0, level="MEDIUM"), _row(5, 62.0, district=2, mandal=20),
+    ])
+    assert _top_ids(index, level="high") == [2, 3, 5]
+    assert _top_ids(index, k=2, level="HIGH", district_id=1) == [2, 3]
+    assert [e["rank"] for e in index.top(10, level="HIGH")[1]] == [2, 3, 4]
+    assert index.top(10, level="LOW") == (5, [])
+
+    # A re-score moves the school between level partitions
+    index.update([_score(2, 30.0, level="LOW")])
+    assert _top_ids(index, level="HIGH") == [3, 5]
+    assert _top_ids(index, level="LOW") == [2]
+
+
+def test_mandal_outside_the_requested_district_has_no_schools():
+    index = PriorityIndex()
+    index.load([_row(1, 50.0, district=1, mandal=10), _row(2, 60.0, district=2, mandal=20)])
+    assert _top_ids(index, district_id=1, mandal_id=10) == [1]
+    assert index.top(10, district_id=1, mandal_id=20) == (0, [])
+    assert index.top(10, district_id=1, mandal_id=99) == (0, [])
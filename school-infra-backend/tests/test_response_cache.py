@@ -0,0 +1,92 @@
+import threading
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.services import response_cache
+from app.services.cache import TTLCache
+from app.services.response_cache import ResponseCacheMiddleware, invalidate_responses
+
+
+@pytest.fixture
+def cached_app(monkeypatch):
+    """A small app behind the middleware; ``calls`` counts handler runs per path."""
+    monkeypatch.setattr(response_cache, "_responses", TTLCache(16, 60))
+    app = FastAPI()
+    app.add_middleware(ResponseCacheMiddleware)
+    calls = {"summary": 0}
+    state = {"total": 10, "during_request": None}
+
+    @app.get("/api/analytics/summary")
+    def summary():
+        calls["summary"] += 1
+        if state["during_request"]:
+            state["during_request"]()
+        return {"total": state["total"]}
+
+    @app.get("/api/analytics/missing")
+    def missing():
+        raise HTTPException(status_code=404, detail="nope")
+
+    return TestClient(app), calls, state
+
+
+def test_repeat_get_is_a_hit_with_the_same_etag(cached_app):
+    client, calls, _ = cached_app
+    first = client.get("/api/analytics/summary")
+    second = client.get("/api/analytics/summary")
+    assert first.headers["x-cache"] == "MISS" and second.headers["x-cache"] == "HIT"
+    assert first.headers["etag"] == second.headers["etag"]
+    assert second.json() == {"total": 10}
+    assert calls["summary"] == 1
+
+
+def test_matching_if_none_match_gets_304_with_empty_body(cached_app):
+    client, _, _ = cached_app
+    etag = client.get("/api/analytics/summary").headers["etag"]
+    for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        response = client.get("/api/analytics/summary", headers={"If-None-Match": header})
+        assert response.status_code == 304 and response.content == b""
+    stale = client.get("/api/analytics/summary", headers={"If-None-Match": '"other"'})
+    assert stale.status_code == 200 and stale.json() == {"total": 10}
+
+
+def test_non_200_responses_are_not_cached(cached_app):
+    client, _, _ = cached_app
+    assert client.get("/api/analytics/missing").status_code == 404
+    assert "x-cache" not in client.get("/api/analytics/missing").headers
+
+
+def test_invalidation_serves_the_new_numbers_with_a_new_etag(cached_app):
+    client, calls, state = cached_app
+    old = client.get("/api/analytics/summary").headers["etag"]
+    state["total"] = 11
+    assert invalidate_responses() == 1
+
+    response = client.get("/api/analytics/summary", headers={"If-None-Match": old})
+    assert response.status_code == 200 and response.json() == {"total": 11}
+    assert response.headers["x-cache"] == "MISS" and response.headers["etag"] != old
+    assert calls["summary"] == 2
+
+
+def test_response_computed_across_an_invalidation_is_not_cached(cached_app):
+    client, calls, state = cached_app
+    state["during_request"] = invalidate_responses
+    client.get("/api/analytics/summary")
+    state["during_request"] = None
+    assert client.get("/api/analytics/summary").headers["x-cache"] == "MISS"
+    assert calls["summary"] == 2
+
+
+def test_concurrent_invalidations_each_bump_the_generation():
+    before = response_cache._generation
+    threads = [
+        threading.Thread(target=lambda: [invalidate_responses() for _ in range(500)])
+        for _ in range(8)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert response_cache._generation == before + 8 * 500
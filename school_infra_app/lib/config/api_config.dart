@@ -22,6 +22,12 @@ class ApiConfig {
   static const String validateDemandPlan = '/validate/demand-plan';
   static const String validateBatch = '/validate/batch';
 
+  // Priority scoring endpoints
+  static const String priorityBatch = '/priority/batch';
+
+  // Background jobs
+  static const String jobs = '/jobs';
+
   // Analytics endpoints
   static const String analyticsDistrict = '/analytics/district';
   static const String analyticsState = '/analytics/state';
@@ -179,9 +179,25 @@ class ComputePriorityScoresNotifier extends Notifier<AsyncValue<String?>> {
   @override
   AsyncValue<String?> build() => const AsyncValue.data(null);
 
-  Future<void> computeAll() async {
+  /// Re-score schools; [full] re-scores every school instead of only the
+  /// ones changed since the backend's last pass
+  Future<void> computeAll({bool full = false}) async {
     state = const AsyncValue.loading();
     try {
+      // Score on the backend first
+      try {
+        final result =
+            await ApiService.batchPriorityScores(incremental: !full);
+        ref.invalidate(priorityScoresProvider);
+        ref.invalidate(dashboardStatsProvider);
+        state = AsyncValue.data(
+            'Computed scores for ${result['scores_saved'] ?? 0} schools');
+        return;
+      } catch (_) {
+        debugPrint('Backend priority scoring unavailable, using client-side');
+      }
+
+      // Fallback: client-side scoring
       // Fetch all schools
       final schools = await SupabaseService.getSchools(limit: 1000);
       // Fetch all enrolment
@@ -59,7 +59,9 @@ class _DashboardScreenState extends ConsumerState<DashboardScreen> {
     try {
       final scores = await ref.read(priorityScoresProvider.future);
       if (scores.isEmpty) {
-        ref.read(computePriorityScoresProvider.notifier).computeAll();
+        ref
+            .read(computePriorityScoresProvider.notifier)
+            .computeAll(full: true);
       }
     } catch (_) {
       // Silently skip if network is unavailable
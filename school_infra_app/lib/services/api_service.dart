@@ -70,6 +70,40 @@ class ApiService {
     }
   }
 
+  /// Re-score school priorities on the backend (only schools changed since
+  /// the last pass unless [incremental] is false); waits for the job and
+  /// returns its result
+  static Future<Map<String, dynamic>> batchPriorityScores(
+      {int scoreYear = 2025, bool incremental = true}) async {
+    try {
+      final response = await _dio.post(
+        ApiConfig.priorityBatch,
+        data: {'score_year': scoreYear, 'incremental': incremental},
+      );
+      return await _waitForJob(response.data['job_id'] as String);
+    } on DioException catch (e) {
+      throw Exception('Batch priority scoring failed: ${e.message}');
+    }
+  }
+
+  /// Poll a background job until it finishes; returns its result
+  static Future<Map<String, dynamic>> _waitForJob(String jobId,
+      {Duration timeout = const Duration(minutes: 2)}) async {
+    final deadline = DateTime.now().add(timeout);
+    while (DateTime.now().isBefore(deadline)) {
+      final response = await _dio.get('${ApiConfig.jobs}/$jobId');
+      final job = response.data as Map<String, dynamic>;
+      if (job['status'] == 'COMPLETED') {
+        return (job['result'] as Map<String, dynamic>?) ?? {};
+      }
+      if (job['status'] == 'FAILED') {
+        throw Exception('Job $jobId failed: ${job['error']}');
+      }
+      await Future.delayed(const Duration(seconds: 1));
+    }
+    throw Exception('Job $jobId still running after ${timeout.inSeconds}s');
+  }
+
   /// Get district analytics
   static Future<Map<String, dynamic>> getDistrictAnalytics(
       int districtId) async {
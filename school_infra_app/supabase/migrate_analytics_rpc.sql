@@ -0,0 +1,58 @@
+-- =============================================================================
+-- Migration: SQL-side District Analytics
+-- Run this against the Supabase SQL editor. The backend's
+-- GET /api/analytics/district/{id} calls si_district_analytics() over RPC, so
+-- only the aggregates cross the wire instead of every school and demand row.
+-- =============================================================================
+
+CREATE OR REPLACE FUNCTION si_district_analytics(p_district_id INT)
+RETURNS JSON
+LANGUAGE sql
+STABLE
+AS $$
+    WITH district_schools AS (
+        -- Latest priority level per school, as in si_schools_view
+        SELECT s.id,
+               (SELECT ps.priority_level
+                  FROM si_school_priority_scores ps
+                 WHERE ps.school_id = s.id
+                 ORDER BY ps.score_year DESC
+                 LIMIT 1) AS priority_level
+        FROM si_schools s
+        WHERE s.district_id = p_district_id
+    ),
+    school_enrolment AS (
+        -- Enrolment of each school's latest academic year, as in si_schools_view
+        SELECT DISTINCT ON (eh.school_id) eh.school_id, SUM(eh.total) AS total_enrolment
+        FROM si_enrolment_history eh
+        JOIN district_schools ds ON ds.id = eh.school_id
+        GROUP BY eh.school_id, eh.academic_year
+        ORDER BY eh.school_id, eh.academic_year DESC
+    ),
+    demand AS (
+        SELECT dp.infra_type,
+               SUM(COALESCE(dp.physical_count, 0))     AS physical,
+               SUM(COALESCE(dp.financial_amount, 0))   AS financial
+        FROM si_demand_plans dp
+        JOIN si_schools s ON s.id = dp.school_id
+        WHERE s.district_id = p_district_id
+        GROUP BY dp.infra_type
+    )
+    SELECT json_build_object(
+        'district_id',            d.id,
+        'district_name',          d.district_name,
+        'total_schools',          (SELECT COUNT(*) FROM district_schools),
+        'total_enrolment',        (SELECT COALESCE(SUM(total_enrolment), 0) FROM school_enrolment),
+        'total_demand_physical',  (SELECT COALESCE(SUM(physical), 0) FROM demand),
+        'total_demand_financial', (SELECT COALESCE(SUM(financial), 0) FROM demand),
+        'priority_distribution',  (SELECT COALESCE(json_object_agg(level, n), '{}'::json)
+                                     FROM (SELECT COALESCE(NULLIF(priority_level, ''), 'UNKNOWN') AS level,
+                                                  COUNT(*) AS n
+                                             FROM district_schools
+                                            GROUP BY 1) p),
+        'infra_gaps',             (SELECT COALESCE(json_object_agg(infra_type, physical), '{}'::json)
+                                     FROM demand)
+    )
+    FROM si_districts d
+    WHERE d.id = p_district_id;
+$$;
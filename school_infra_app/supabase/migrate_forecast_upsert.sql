@@ -0,0 +1,28 @@
+-- =============================================================================
+-- Migration: Upsert Key for Enrolment Forecasts
+-- Run this against the Supabase SQL editor so the backend's bulk writer can
+-- upsert si_enrolment_forecasts on (school_id, forecast_year, grade, model_used)
+-- instead of appending a fresh copy of every forecast on each re-run.
+-- =============================================================================
+
+-- 1. Backfill model_used so it can take part in the unique key
+UPDATE si_enrolment_forecasts
+SET model_used = 'LinearRegression'
+WHERE model_used IS NULL;
+
+ALTER TABLE si_enrolment_forecasts
+  ALTER COLUMN model_used SET DEFAULT 'LinearRegression',
+  ALTER COLUMN model_used SET NOT NULL;
+
+-- 2. Drop duplicates piled up by earlier re-runs (keep the newest row per key)
+DELETE FROM si_enrolment_forecasts f
+USING si_enrolment_forecasts newer
+WHERE f.school_id     = newer.school_id
+  AND f.forecast_year = newer.forecast_year
+  AND f.grade         = newer.grade
+  AND f.model_used    = newer.model_used
+  AND f.id < newer.id;
+
+-- 3. Unique key used as the upsert conflict target
+CREATE UNIQUE INDEX IF NOT EXISTS idx_si_enrolment_forecasts_key
+  ON si_enrolment_forecasts(school_id, forecast_year, grade, model_used);
@@ -0,0 +1,44 @@
+-- =============================================================================
+-- Migration: Priority Score Year in si_schools_view
+-- Run this against the Supabase SQL editor. The backend's priority ranking
+-- index reads each school's latest score year from the view, so a late write
+-- of an older score year cannot replace the latest score in the index.
+-- =============================================================================
+
+CREATE OR REPLACE VIEW si_schools_view AS
+SELECT
+    s.id,
+    s.udise_code,
+    s.school_name,
+    s.school_management,
+    s.school_category,
+    s.latitude,
+    s.longitude,
+    d.id                    AS district_id,
+    d.district_name,
+    m.id                    AS mandal_id,
+    m.mandal_name,
+    e.total_enrolment       AS total_enrolment,
+    p.composite_score       AS priority_score,
+    p.priority_level,
+    s.created_at,
+    s.updated_at,
+    p.score_year            AS priority_score_year
+FROM si_schools s
+LEFT JOIN si_districts d ON d.id = s.district_id
+LEFT JOIN si_mandals   m ON m.id = s.mandal_id
+LEFT JOIN LATERAL (
+    SELECT SUM(eh.total) AS total_enrolment
+    FROM si_enrolment_history eh
+    WHERE eh.school_id = s.id
+    GROUP BY eh.academic_year
+    ORDER BY eh.academic_year DESC
+    LIMIT 1
+) e ON true
+LEFT JOIN LATERAL (
+    SELECT ps.composite_score, ps.priority_level, ps.score_year
+    FROM si_school_priority_scores ps
+    WHERE ps.school_id = s.id
+    ORDER BY ps.score_year DESC
+    LIMIT 1
+) p ON true;
@@ -0,0 +1,49 @@
+-- =============================================================================
+-- Migration: Incremental Priority Scoring
+-- Run this against the Supabase SQL editor. The backend's priority job re-scores
+-- only the schools whose schools / enrolment / demand plan / assessment rows
+-- were written since its last pass, found by updated_at. Triggers keep
+-- updated_at current on UPDATE (inserts already take the column default).
+-- =============================================================================
+
+-- 1. Watermark indexes
+CREATE INDEX IF NOT EXISTS idx_si_schools_updated           ON si_schools(updated_at);
+CREATE INDEX IF NOT EXISTS idx_si_enrolment_history_updated ON si_enrolment_history(updated_at);
+CREATE INDEX IF NOT EXISTS idx_si_demand_plans_updated      ON si_demand_plans(updated_at);
+CREATE INDEX IF NOT EXISTS idx_si_infra_assessments_updated ON si_infra_assessments(updated_at);
+
+-- 2. Touch function
+CREATE OR REPLACE FUNCTION si_touch_updated_at()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_NARGS = 0 OR EXISTS (SELECT 1 FROM unnest(TG_ARGV) AS c(col)
+                                WHERE to_jsonb(NEW) -> c.col IS DISTINCT FROM to_jsonb(OLD) -> c.col) THEN
+        NEW.updated_at := now();
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+-- 3. Touch triggers (demand plans only on the plan's own columns, so validation
+-- and officer review write-backs do not dirty every school)
+DROP TRIGGER IF EXISTS si_touch_schools ON si_schools;
+CREATE TRIGGER si_touch_schools BEFORE UPDATE ON si_schools
+    FOR EACH ROW WHEN (OLD.* IS DISTINCT FROM NEW.*)
+    EXECUTE FUNCTION si_touch_updated_at();
+
+DROP TRIGGER IF EXISTS si_touch_enrolment ON si_enrolment_history;
+CREATE TRIGGER si_touch_enrolment BEFORE UPDATE ON si_enrolment_history
+    FOR EACH ROW WHEN (OLD.* IS DISTINCT FROM NEW.*)
+    EXECUTE FUNCTION si_touch_updated_at();
+
+DROP TRIGGER IF EXISTS si_touch_demand ON si_demand_plans;
+CREATE TRIGGER si_touch_demand BEFORE UPDATE ON si_demand_plans
+    FOR EACH ROW
+    EXECUTE FUNCTION si_touch_updated_at('school_id', 'plan_year', 'infra_type', 'physical_count', 'financial_amount');
+
+DROP TRIGGER IF EXISTS si_touch_assessments ON si_infra_assessments;
+CREATE TRIGGER si_touch_assessments BEFORE UPDATE ON si_infra_assessments
+    FOR EACH ROW WHEN (OLD.* IS DISTINCT FROM NEW.*)
+    EXECUTE FUNCTION si_touch_updated_at();
@@ -0,0 +1,334 @@
+-- =============================================================================
+-- Migration: Materialized State Analytics Rollup
+-- Run this against the Supabase SQL editor. GET /api/analytics/state reads
+-- si_district_rollup and si_district_infra_rollup instead of every school and
+-- demand plan. Statement-level triggers recompute only the districts touched
+-- by a write to demand plans, enrolment, priority scores, schools, districts
+-- or mandals, so the rollup stays current without a scheduled refresh.
+-- =============================================================================
+
+-- 1. Rollup tables (district_id 0 holds schools without a district)
+CREATE TABLE IF NOT EXISTS si_district_rollup (
+    district_id            INT PRIMARY KEY,
+    district_name          TEXT,
+    total_mandals          INT NOT NULL DEFAULT 0,
+    total_schools          INT NOT NULL DEFAULT 0,
+    total_enrolment        BIGINT NOT NULL DEFAULT 0,
+    critical_schools       INT NOT NULL DEFAULT 0,
+    high_schools           INT NOT NULL DEFAULT 0,
+    priority_distribution  JSONB NOT NULL DEFAULT '{}'::jsonb,
+    refreshed_at           TIMESTAMP WITH TIME ZONE DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS si_district_infra_rollup (
+    district_id       INT NOT NULL,
+    infra_type        TEXT NOT NULL,
+    plan_count        INT NOT NULL DEFAULT 0,
+    physical_count    BIGINT NOT NULL DEFAULT 0,
+    financial_amount  DOUBLE PRECISION NOT NULL DEFAULT 0,
+    refreshed_at      TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    PRIMARY KEY (district_id, infra_type)
+);
+
+-- 2. Refresh functions
+-- Recompute the rollup rows of the given districts (0 = no district).
+-- Runs as the owner, so writes from any role can refresh the RLS-protected
+-- rollup. Concurrent refreshes of a district are serialized by a transaction
+-- advisory lock per district, taken in id order so two refreshes cannot
+-- deadlock; the second one then rebuilds from the first one's committed rows.
+CREATE OR REPLACE FUNCTION si_refresh_district_rollup(p_district_ids INT[])
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_district INT;
+BEGIN
+    FOR v_district IN SELECT DISTINCT d FROM unnest(p_district_ids) AS d ORDER BY d LOOP
+        PERFORM pg_advisory_xact_lock(hashtext('si_district_rollup'), v_district);
+    END LOOP;
+
+    DELETE FROM si_district_rollup       WHERE district_id = ANY(p_district_ids);
+    DELETE FROM si_district_infra_rollup WHERE district_id = ANY(p_district_ids);
+
+    WITH schools AS (
+        SELECT s.id, COALESCE(s.district_id, 0) AS district_id
+        FROM si_schools s
+        WHERE s.district_id = ANY(p_district_ids)
+           OR (s.district_id IS NULL AND 0 = ANY(p_district_ids))
+    ),
+    latest_priority AS (
+        -- Latest priority level per school, as in si_schools_view
+        SELECT DISTINCT ON (ps.school_id) ps.school_id, ps.priority_level
+        FROM si_school_priority_scores ps
+        JOIN schools sc ON sc.id = ps.school_id
+        ORDER BY ps.school_id, ps.score_year DESC
+    ),
+    latest_enrolment AS (
+        -- Enrolment of each school's latest academic year, as in si_schools_view
+        SELECT DISTINCT ON (eh.school_id) eh.school_id, SUM(eh.total) AS total_enrolment
+        FROM si_enrolment_history eh
+        JOIN schools sc ON sc.id = eh.school_id
+        GROUP BY eh.school_id, eh.academic_year
+        ORDER BY eh.school_id, eh.academic_year DESC
+    ),
+    school_rows AS (
+        SELECT sc.district_id,
+               COALESCE(le.total_enrolment, 0)                   AS total_enrolment,
+               COALESCE(NULLIF(lp.priority_level, ''), 'UNKNOWN') AS level
+        FROM schools sc
+        LEFT JOIN latest_priority  lp ON lp.school_id = sc.id
+        LEFT JOIN latest_enrolment le ON le.school_id = sc.id
+    ),
+    levels AS (
+        SELECT district_id, jsonb_object_agg(level, n) AS priority_distribution
+        FROM (SELECT district_id, level, COUNT(*) AS n
+                FROM school_rows
+               GROUP BY district_id, level) l
+        GROUP BY district_id
+    ),
+    totals AS (
+        SELECT district_id,
+               COUNT(*)                                         AS total_schools,
+               SUM(total_enrolment)                             AS total_enrolment,
+               COUNT(*) FILTER (WHERE upper(level) = 'CRITICAL') AS critical_schools,
+               COUNT(*) FILTER (WHERE upper(level) = 'HIGH')     AS high_schools
+        FROM school_rows
+        GROUP BY district_id
+    )
+    INSERT INTO si_district_rollup (
+        district_id, district_name, total_mandals, total_schools, total_enrolment,
+        critical_schools, high_schools, priority_distribution
+    )
+    SELECT k.district_id,
+           d.district_name,
+           (SELECT COUNT(*) FROM si_mandals m WHERE m.district_id = k.district_id),
+           COALESCE(t.total_schools, 0),
+           COALESCE(t.total_enrolment, 0),
+           COALESCE(t.critical_schools, 0),
+           COALESCE(t.high_schools, 0),
+           COALESCE(l.priority_distribution, '{}'::jsonb)
+    FROM (SELECT DISTINCT unnest(p_district_ids) AS district_id) k
+    LEFT JOIN si_districts d ON d.id = k.district_id
+    LEFT JOIN totals t ON t.district_id = k.district_id
+    LEFT JOIN levels l ON l.district_id = k.district_id
+    WHERE d.id IS NOT NULL OR t.total_schools > 0;
+
+    INSERT INTO si_district_infra_rollup (
+        district_id, infra_type, plan_count, physical_count, financial_amount
+    )
+    SELECT COALESCE(s.district_id, 0),
+           dp.infra_type,
+           COUNT(*),
+           SUM(COALESCE(dp.physical_count, 0)),
+           SUM(COALESCE(dp.financial_amount, 0))
+    FROM si_demand_plans dp
+    JOIN si_schools s ON s.id = dp.school_id
+    WHERE s.district_id = ANY(p_district_ids)
+       OR (s.district_id IS NULL AND 0 = ANY(p_district_ids))
+    GROUP BY 1, 2;
+END;
+$$;
+
+-- Rebuild the whole rollup; returns the number of district rows written.
+-- Rows are replaced per district under the same locks as the triggers take
+-- (no TRUNCATE, whose table lock would deadlock against them), then rows of
+-- districts that no longer exist are dropped.
+CREATE OR REPLACE FUNCTION si_refresh_state_rollup()
+RETURNS INT
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    ids INT[] := ARRAY(SELECT id FROM si_districts UNION SELECT 0);
+    refreshed INT;
+BEGIN
+    PERFORM si_refresh_district_rollup(ids);
+    DELETE FROM si_district_rollup       WHERE NOT district_id = ANY(ids);
+    DELETE FROM si_district_infra_rollup WHERE NOT district_id = ANY(ids);
+    SELECT COUNT(*) INTO refreshed FROM si_district_rollup;
+    RETURN refreshed;
+END;
+$$;
+
+-- 3. Trigger functions (statement-level, reading the transition tables)
+-- Tables keyed by school_id: demand plans, enrolment history, priority scores
+CREATE OR REPLACE FUNCTION si_rollup_school_rows_changed()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    ids INT[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(DISTINCT COALESCE(s.district_id, 0)) INTO ids
+        FROM (SELECT DISTINCT school_id FROM new_rows) r
+        JOIN si_schools s ON s.id = r.school_id;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(DISTINCT COALESCE(s.district_id, 0)) INTO ids
+        FROM (SELECT DISTINCT school_id FROM old_rows) r
+        JOIN si_schools s ON s.id = r.school_id;
+    ELSE
+        -- Only rows where one of the trigger's column arguments changed
+        SELECT array_agg(DISTINCT COALESCE(s.district_id, 0)) INTO ids
+        FROM new_rows n
+        JOIN old_rows o ON o.id = n.id
+        JOIN si_schools s ON s.id IN (n.school_id, o.school_id)
+        WHERE EXISTS (SELECT 1 FROM unnest(TG_ARGV) AS c(col)
+                       WHERE to_jsonb(n) -> c.col IS DISTINCT FROM to_jsonb(o) -> c.col);
+    END IF;
+    IF ids IS NOT NULL THEN
+        PERFORM si_refresh_district_rollup(ids);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Tables keyed by district_id: schools, mandals
+CREATE OR REPLACE FUNCTION si_rollup_district_rows_changed()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    ids INT[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(DISTINCT COALESCE(district_id, 0)) INTO ids FROM new_rows;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(DISTINCT COALESCE(district_id, 0)) INTO ids FROM old_rows;
+    ELSE
+        SELECT array_agg(DISTINCT COALESCE(r.district_id, 0)) INTO ids
+        FROM new_rows n
+        JOIN old_rows o ON o.id = n.id
+        CROSS JOIN LATERAL (VALUES (n.district_id), (o.district_id)) AS r(district_id)
+        WHERE EXISTS (SELECT 1 FROM unnest(TG_ARGV) AS c(col)
+                       WHERE to_jsonb(n) -> c.col IS DISTINCT FROM to_jsonb(o) -> c.col);
+    END IF;
+    IF ids IS NOT NULL THEN
+        PERFORM si_refresh_district_rollup(ids);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- si_districts itself
+CREATE OR REPLACE FUNCTION si_rollup_districts_changed()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    ids INT[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(id) INTO ids FROM new_rows;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(id) INTO ids FROM old_rows;
+    ELSE
+        SELECT array_agg(n.id) INTO ids
+        FROM new_rows n
+        JOIN old_rows o ON o.id = n.id
+        WHERE EXISTS (SELECT 1 FROM unnest(TG_ARGV) AS c(col)
+                       WHERE to_jsonb(n) -> c.col IS DISTINCT FROM to_jsonb(o) -> c.col);
+    END IF;
+    IF ids IS NOT NULL THEN
+        PERFORM si_refresh_district_rollup(ids);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- 4. Triggers (update triggers pass the columns the rollup depends on, so
+--    e.g. validation status write-backs do not refresh anything)
+DROP TRIGGER IF EXISTS si_rollup_demand_ins ON si_demand_plans;
+DROP TRIGGER IF EXISTS si_rollup_demand_upd ON si_demand_plans;
+DROP TRIGGER IF EXISTS si_rollup_demand_del ON si_demand_plans;
+CREATE TRIGGER si_rollup_demand_ins AFTER INSERT ON si_demand_plans
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_school_rows_changed();
+CREATE TRIGGER si_rollup_demand_upd AFTER UPDATE ON si_demand_plans
+    REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_school_rows_changed('school_id', 'infra_type', 'physical_count', 'financial_amount');
+CREATE TRIGGER si_rollup_demand_del AFTER DELETE ON si_demand_plans
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_school_rows_changed();
+
+DROP TRIGGER IF EXISTS si_rollup_enrolment_ins ON si_enrolment_history;
+DROP TRIGGER IF EXISTS si_rollup_enrolment_upd ON si_enrolment_history;
+DROP TRIGGER IF EXISTS si_rollup_enrolment_del ON si_enrolment_history;
+CREATE TRIGGER si_rollup_enrolment_ins AFTER INSERT ON si_enrolment_history
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_school_rows_changed();
+CREATE TRIGGER si_rollup_enrolment_upd AFTER UPDATE ON si_enrolment_history
+    REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_school_rows_changed('school_id', 'academic_year', 'total');
+CREATE TRIGGER si_rollup_enrolment_del AFTER DELETE ON si_enrolment_history
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_school_rows_changed();
+
+DROP TRIGGER IF EXISTS si_rollup_priority_ins ON si_school_priority_scores;
+DROP TRIGGER IF EXISTS si_rollup_priority_upd ON si_school_priority_scores;
+DROP TRIGGER IF EXISTS si_rollup_priority_del ON si_school_priority_scores;
+CREATE TRIGGER si_rollup_priority_ins AFTER INSERT ON si_school_priority_scores
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_school_rows_changed();
+CREATE TRIGGER si_rollup_priority_upd AFTER UPDATE ON si_school_priority_scores
+    REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_school_rows_changed('school_id', 'score_year', 'priority_level');
+CREATE TRIGGER si_rollup_priority_del AFTER DELETE ON si_school_priority_scores
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_school_rows_changed();
+
+DROP TRIGGER IF EXISTS si_rollup_schools_ins ON si_schools;
+DROP TRIGGER IF EXISTS si_rollup_schools_upd ON si_schools;
+DROP TRIGGER IF EXISTS si_rollup_schools_del ON si_schools;
+CREATE TRIGGER si_rollup_schools_ins AFTER INSERT ON si_schools
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_district_rows_changed();
+CREATE TRIGGER si_rollup_schools_upd AFTER UPDATE ON si_schools
+    REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_district_rows_changed('district_id');
+CREATE TRIGGER si_rollup_schools_del AFTER DELETE ON si_schools
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_district_rows_changed();
+
+DROP TRIGGER IF EXISTS si_rollup_mandals_ins ON si_mandals;
+DROP TRIGGER IF EXISTS si_rollup_mandals_upd ON si_mandals;
+DROP TRIGGER IF EXISTS si_rollup_mandals_del ON si_mandals;
+CREATE TRIGGER si_rollup_mandals_ins AFTER INSERT ON si_mandals
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_district_rows_changed();
+CREATE TRIGGER si_rollup_mandals_upd AFTER UPDATE ON si_mandals
+    REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_district_rows_changed('district_id');
+CREATE TRIGGER si_rollup_mandals_del AFTER DELETE ON si_mandals
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_district_rows_changed();
+
+DROP TRIGGER IF EXISTS si_rollup_districts_ins ON si_districts;
+DROP TRIGGER IF EXISTS si_rollup_districts_upd ON si_districts;
+DROP TRIGGER IF EXISTS si_rollup_districts_del ON si_districts;
+CREATE TRIGGER si_rollup_districts_ins AFTER INSERT ON si_districts
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_districts_changed();
+CREATE TRIGGER si_rollup_districts_upd AFTER UPDATE ON si_districts
+    REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_districts_changed('district_name');
+CREATE TRIGGER si_rollup_districts_del AFTER DELETE ON si_districts
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_districts_changed();
+
+-- 5. Row level security: clients read the rollups; only the refresh
+-- functions (SECURITY DEFINER) write them
+ALTER TABLE si_district_rollup ENABLE ROW LEVEL SECURITY;
+ALTER TABLE si_district_infra_rollup ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "anon_read_district_rollup" ON si_district_rollup;
+CREATE POLICY "anon_read_district_rollup" ON si_district_rollup FOR SELECT USING (true);
+
+DROP POLICY IF EXISTS "anon_read_district_infra_rollup" ON si_district_infra_rollup;
+CREATE POLICY "anon_read_district_infra_rollup" ON si_district_infra_rollup FOR SELECT USING (true);
+
+-- 6. Initial build
+SELECT si_refresh_state_rollup();
@@ -0,0 +1,44 @@
+-- =============================================================================
+-- Migration: Bulk Validation Write-back
+-- Run this against the Supabase SQL editor. The backend's validation endpoints
+-- and batch job write verdicts through si_apply_validation_results(), one RPC
+-- per chunk of results, instead of one UPDATE request per demand plan.
+-- =============================================================================
+
+-- Bulk validation write-back, called over RPC by the backend. Each element of
+-- p_results carries validation_status / validation_score / validation_flags and
+-- either the plan "id" or a "school_id" + "infra_type" pair (which updates every
+-- plan of that school and type). Returns the number of plans updated.
+CREATE OR REPLACE FUNCTION si_apply_validation_results(p_results JSONB)
+RETURNS INT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    by_id     INT;
+    by_school INT;
+BEGIN
+    UPDATE si_demand_plans dp
+       SET validation_status = r.validation_status,
+           validation_score  = r.validation_score,
+           validation_flags  = COALESCE(r.validation_flags, '[]'::jsonb)
+      FROM jsonb_to_recordset(p_results) AS r(
+               id INT, validation_status TEXT, validation_score DOUBLE PRECISION, validation_flags JSONB)
+     WHERE r.id IS NOT NULL
+       AND dp.id = r.id;
+    GET DIAGNOSTICS by_id = ROW_COUNT;
+
+    UPDATE si_demand_plans dp
+       SET validation_status = r.validation_status,
+           validation_score  = r.validation_score,
+           validation_flags  = COALESCE(r.validation_flags, '[]'::jsonb)
+      FROM jsonb_to_recordset(p_results) AS r(
+               id INT, school_id INT, infra_type TEXT,
+               validation_status TEXT, validation_score DOUBLE PRECISION, validation_flags JSONB)
+     WHERE r.id IS NULL
+       AND dp.school_id = r.school_id
+       AND dp.infra_type = r.infra_type;
+    GET DIAGNOSTICS by_school = ROW_COUNT;
+
+    RETURN by_id + by_school;
+END;
+$$;
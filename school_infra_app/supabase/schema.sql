@@ -169,8 +169,9 @@ CREATE TABLE IF NOT EXISTS si_enrolment_forecasts (
     grade            TEXT NOT NULL,
     predicted_total  INT DEFAULT 0,
     confidence       DOUBLE PRECISION,
-    model_used       TEXT,
-    created_at       TIMESTAMP WITH TIME ZONE DEFAULT now()
+    model_used       TEXT NOT NULL DEFAULT 'LinearRegression',
+    created_at       TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    UNIQUE (school_id, forecast_year, grade, model_used)
 );
 
 -- ---------------------------------------------------------------------------
@@ -211,6 +212,34 @@ CREATE TABLE IF NOT EXISTS si_school_priority_scores (
     UNIQUE (school_id, score_year)
 );
 
+-- ---------------------------------------------------------------------------
+-- 9. ANALYTICS ROLLUPS
+-- ---------------------------------------------------------------------------
+-- Per-district aggregates behind GET /api/analytics/state, kept current by the
+-- triggers below. district_id 0 holds schools without a district.
+
+CREATE TABLE IF NOT EXISTS si_district_rollup (
+    district_id            INT PRIMARY KEY,
+    district_name          TEXT,
+    total_mandals          INT NOT NULL DEFAULT 0,
+    total_schools          INT NOT NULL DEFAULT 0,
+    total_enrolment        BIGINT NOT NULL DEFAULT 0,
+    critical_schools       INT NOT NULL DEFAULT 0,
+    high_schools           INT NOT NULL DEFAULT 0,
+    priority_distribution  JSONB NOT NULL DEFAULT '{}'::jsonb,
+    refreshed_at           TIMESTAMP WITH TIME ZONE DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS si_district_infra_rollup (
+    district_id       INT NOT NULL,
+    infra_type        TEXT NOT NULL,
+    plan_count        INT NOT NULL DEFAULT 0,
+    physical_count    BIGINT NOT NULL DEFAULT 0,
+    financial_amount  DOUBLE PRECISION NOT NULL DEFAULT 0,
+    refreshed_at      TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    PRIMARY KEY (district_id, infra_type)
+);
+
 -- =============================================================================
 -- INDEXES
 -- =============================================================================
@@ -244,6 +273,10 @@ CREATE INDEX IF NOT EXISTS idx_si_priority_scores_school   ON si_school_priority
 CREATE INDEX IF NOT EXISTS idx_si_priority_scores_year     ON si_school_priority_scores(score_year);
 CREATE INDEX IF NOT EXISTS idx_si_priority_scores_level    ON si_school_priority_scores(priority_level);
 CREATE INDEX IF NOT EXISTS idx_si_priority_scores_composite ON si_school_priority_scores(composite_score DESC);
+CREATE INDEX IF NOT EXISTS idx_si_schools_updated           ON si_schools(updated_at);
+CREATE INDEX IF NOT EXISTS idx_si_enrolment_history_updated ON si_enrolment_history(updated_at);
+CREATE INDEX IF NOT EXISTS idx_si_demand_plans_updated      ON si_demand_plans(updated_at);
+CREATE INDEX IF NOT EXISTS idx_si_infra_assessments_updated ON si_infra_assessments(updated_at);
 
 -- =============================================================================
 -- VIEWS
@@ -266,7 +299,8 @@ SELECT
     p.composite_score       AS priority_score,
     p.priority_level,
     s.created_at,
-    s.updated_at
+    s.updated_at,
+    p.score_year            AS priority_score_year
 FROM si_schools s
 LEFT JOIN si_districts d ON d.id = s.district_id
 LEFT JOIN si_mandals   m ON m.id = s.mandal_id
@@ -279,7 +313,7 @@ LEFT JOIN LATERAL (
     LIMIT 1
 ) e ON true
 LEFT JOIN LATERAL (
-    SELECT ps.composite_score, ps.priority_level
+    SELECT ps.composite_score, ps.priority_level, ps.score_year
     FROM si_school_priority_scores ps
     WHERE ps.school_id = s.id
     ORDER BY ps.score_year DESC
@@ -329,6 +363,438 @@ LEFT JOIN si_districts d  ON d.id  = s.district_id
 LEFT JOIN si_mandals   m  ON m.id  = s.mandal_id
 LEFT JOIN si_infra_assessments ia ON ia.id = dp.assessment_id;
 
+-- =============================================================================
+-- FUNCTIONS
+-- =============================================================================
+
+-- District dashboard aggregates, called over RPC by the backend
+CREATE OR REPLACE FUNCTION si_district_analytics(p_district_id INT)
+RETURNS JSON
+LANGUAGE sql
+STABLE
+AS $$
+    WITH district_schools AS (
+        -- Latest priority level per school, as in si_schools_view
+        SELECT s.id,
+               (SELECT ps.priority_level
+                  FROM si_school_priority_scores ps
+                 WHERE ps.school_id = s.id
+                 ORDER BY ps.score_year DESC
+                 LIMIT 1) AS priority_level
+        FROM si_schools s
+        WHERE s.district_id = p_district_id
+    ),
+    school_enrolment AS (
+        -- Enrolment of each school's latest academic year, as in si_schools_view
+        SELECT DISTINCT ON (eh.school_id) eh.school_id, SUM(eh.total) AS total_enrolment
+        FROM si_enrolment_history eh
+        JOIN district_schools ds ON ds.id = eh.school_id
+        GROUP BY eh.school_id, eh.academic_year
+        ORDER BY eh.school_id, eh.academic_year DESC
+    ),
+    demand AS (
+        SELECT dp.infra_type,
+               SUM(COALESCE(dp.physical_count, 0))     AS physical,
+               SUM(COALESCE(dp.financial_amount, 0))   AS financial
+        FROM si_demand_plans dp
+        JOIN si_schools s ON s.id = dp.school_id
+        WHERE s.district_id = p_district_id
+        GROUP BY dp.infra_type
+    )
+    SELECT json_build_object(
+        'district_id',            d.id,
+        'district_name',          d.district_name,
+        'total_schools',          (SELECT COUNT(*) FROM district_schools),
+        'total_enrolment',        (SELECT COALESCE(SUM(total_enrolment), 0) FROM school_enrolment),
+        'total_demand_physical',  (SELECT COALESCE(SUM(physical), 0) FROM demand),
+        'total_demand_financial', (SELECT COALESCE(SUM(financial), 0) FROM demand),
+        'priority_distribution',  (SELECT COALESCE(json_object_agg(level, n), '{}'::json)
+                                     FROM (SELECT COALESCE(NULLIF(priority_level, ''), 'UNKNOWN') AS level,
+                                                  COUNT(*) AS n
+                                             FROM district_schools
+                                            GROUP BY 1) p),
+        'infra_gaps',             (SELECT COALESCE(json_object_agg(infra_type, physical), '{}'::json)
+                                     FROM demand)
+    )
+    FROM si_districts d
+    WHERE d.id = p_district_id;
+$$;
+
+-- Bulk validation write-back, called over RPC by the backend. Each element of
+-- p_results carries validation_status / validation_score / validation_flags and
+-- either the plan "id" or a "school_id" + "infra_type" pair (which updates every
+-- plan of that school and type). Returns the number of plans updated.
+CREATE OR REPLACE FUNCTION si_apply_validation_results(p_results JSONB)
+RETURNS INT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    by_id     INT;
+    by_school INT;
+BEGIN
+    UPDATE si_demand_plans dp
+       SET validation_status = r.validation_status,
+           validation_score  = r.validation_score,
+           validation_flags  = COALESCE(r.validation_flags, '[]'::jsonb)
+      FROM jsonb_to_recordset(p_results) AS r(
+               id INT, validation_status TEXT, validation_score DOUBLE PRECISION, validation_flags JSONB)
+     WHERE r.id IS NOT NULL
+       AND dp.id = r.id;
+    GET DIAGNOSTICS by_id = ROW_COUNT;
+
+    UPDATE si_demand_plans dp
+       SET validation_status = r.validation_status,
+           validation_score  = r.validation_score,
+           validation_flags  = COALESCE(r.validation_flags, '[]'::jsonb)
+      FROM jsonb_to_recordset(p_results) AS r(
+               id INT, school_id INT, infra_type TEXT,
+               validation_status TEXT, validation_score DOUBLE PRECISION, validation_flags JSONB)
+     WHERE r.id IS NULL
+       AND dp.school_id = r.school_id
+       AND dp.infra_type = r.infra_type;
+    GET DIAGNOSTICS by_school = ROW_COUNT;
+
+    RETURN by_id + by_school;
+END;
+$$;
+
+-- Recompute the rollup rows of the given districts (0 = no district).
+-- Runs as the owner, so writes from any role can refresh the RLS-protected
+-- rollup. Concurrent refreshes of a district are serialized by a transaction
+-- advisory lock per district, taken in id order so two refreshes cannot
+-- deadlock; the second one then rebuilds from the first one's committed rows.
+CREATE OR REPLACE FUNCTION si_refresh_district_rollup(p_district_ids INT[])
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    v_district INT;
+BEGIN
+    FOR v_district IN SELECT DISTINCT d FROM unnest(p_district_ids) AS d ORDER BY d LOOP
+        PERFORM pg_advisory_xact_lock(hashtext('si_district_rollup'), v_district);
+    END LOOP;
+
+    DELETE FROM si_district_rollup       WHERE district_id = ANY(p_district_ids);
+    DELETE FROM si_district_infra_rollup WHERE district_id = ANY(p_district_ids);
+
+    WITH schools AS (
+        SELECT s.id, COALESCE(s.district_id, 0) AS district_id
+        FROM si_schools s
+        WHERE s.district_id = ANY(p_district_ids)
+           OR (s.district_id IS NULL AND 0 = ANY(p_district_ids))
+    ),
+    latest_priority AS (
+        -- Latest priority level per school, as in si_schools_view
+        SELECT DISTINCT ON (ps.school_id) ps.school_id, ps.priority_level
+        FROM si_school_priority_scores ps
+        JOIN schools sc ON sc.id = ps.school_id
+        ORDER BY ps.school_id, ps.score_year DESC
+    ),
+    latest_enrolment AS (
+        -- Enrolment of each school's latest academic year, as in si_schools_view
+        SELECT DISTINCT ON (eh.school_id) eh.school_id, SUM(eh.total) AS total_enrolment
+        FROM si_enrolment_history eh
+        JOIN schools sc ON sc.id = eh.school_id
+        GROUP BY eh.school_id, eh.academic_year
+        ORDER BY eh.school_id, eh.academic_year DESC
+    ),
+    school_rows AS (
+        SELECT sc.district_id,
+               COALESCE(le.total_enrolment, 0)                   AS total_enrolment,
+               COALESCE(NULLIF(lp.priority_level, ''), 'UNKNOWN') AS level
+        FROM schools sc
+        LEFT JOIN latest_priority  lp ON lp.school_id = sc.id
+        LEFT JOIN latest_enrolment le ON le.school_id = sc.id
+    ),
+    levels AS (
+        SELECT district_id, jsonb_object_agg(level, n) AS priority_distribution
+        FROM (SELECT district_id, level, COUNT(*) AS n
+                FROM school_rows
+               GROUP BY district_id, level) l
+        GROUP BY district_id
+    ),
+    totals AS (
+        SELECT district_id,
+               COUNT(*)                                         AS total_schools,
+               SUM(total_enrolment)                             AS total_enrolment,
+               COUNT(*) FILTER (WHERE upper(level) = 'CRITICAL') AS critical_schools,
+               COUNT(*) FILTER (WHERE upper(level) = 'HIGH')     AS high_schools
+        FROM school_rows
+        GROUP BY district_id
+    )
+    INSERT INTO si_district_rollup (
+        district_id, district_name, total_mandals, total_schools, total_enrolment,
+        critical_schools, high_schools, priority_distribution
+    )
+    SELECT k.district_id,
+           d.district_name,
+           (SELECT COUNT(*) FROM si_mandals m WHERE m.district_id = k.district_id),
+           COALESCE(t.total_schools, 0),
+           COALESCE(t.total_enrolment, 0),
+           COALESCE(t.critical_schools, 0),
+           COALESCE(t.high_schools, 0),
+           COALESCE(l.priority_distribution, '{}'::jsonb)
+    FROM (SELECT DISTINCT unnest(p_district_ids) AS district_id) k
+    LEFT JOIN si_districts d ON d.id = k.district_id
+    LEFT JOIN totals t ON t.district_id = k.district_id
+    LEFT JOIN levels l ON l.district_id = k.district_id
+    WHERE d.id IS NOT NULL OR t.total_schools > 0;
+
+    INSERT INTO si_district_infra_rollup (
+        district_id, infra_type, plan_count, physical_count, financial_amount
+    )
+    SELECT COALESCE(s.district_id, 0),
+           dp.infra_type,
+           COUNT(*),
+           SUM(COALESCE(dp.physical_count, 0)),
+           SUM(COALESCE(dp.financial_amount, 0))
+    FROM si_demand_plans dp
+    JOIN si_schools s ON s.id = dp.school_id
+    WHERE s.district_id = ANY(p_district_ids)
+       OR (s.district_id IS NULL AND 0 = ANY(p_district_ids))
+    GROUP BY 1, 2;
+END;
+$$;
+
+-- Rebuild the whole rollup; returns the number of district rows written.
+-- Rows are replaced per district under the same locks as the triggers take
+-- (no TRUNCATE, whose table lock would deadlock against them), then rows of
+-- districts that no longer exist are dropped.
+CREATE OR REPLACE FUNCTION si_refresh_state_rollup()
+RETURNS INT
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+    ids INT[] := ARRAY(SELECT id FROM si_districts UNION SELECT 0);
+    refreshed INT;
+BEGIN
+    PERFORM si_refresh_district_rollup(ids);
+    DELETE FROM si_district_rollup       WHERE NOT district_id = ANY(ids);
+    DELETE FROM si_district_infra_rollup WHERE NOT district_id = ANY(ids);
+    SELECT COUNT(*) INTO refreshed FROM si_district_rollup;
+    RETURN refreshed;
+END;
+$$;
+
+-- State rollup triggers (statement-level, reading the transition tables)
+-- Tables keyed by school_id: demand plans, enrolment history, priority scores
+CREATE OR REPLACE FUNCTION si_rollup_school_rows_changed()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    ids INT[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(DISTINCT COALESCE(s.district_id, 0)) INTO ids
+        FROM (SELECT DISTINCT school_id FROM new_rows) r
+        JOIN si_schools s ON s.id = r.school_id;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(DISTINCT COALESCE(s.district_id, 0)) INTO ids
+        FROM (SELECT DISTINCT school_id FROM old_rows) r
+        JOIN si_schools s ON s.id = r.school_id;
+    ELSE
+        -- Only rows where one of the trigger's column arguments changed
+        SELECT array_agg(DISTINCT COALESCE(s.district_id, 0)) INTO ids
+        FROM new_rows n
+        JOIN old_rows o ON o.id = n.id
+        JOIN si_schools s ON s.id IN (n.school_id, o.school_id)
+        WHERE EXISTS (SELECT 1 FROM unnest(TG_ARGV) AS c(col)
+                       WHERE to_jsonb(n) -> c.col IS DISTINCT FROM to_jsonb(o) -> c.col);
+    END IF;
+    IF ids IS NOT NULL THEN
+        PERFORM si_refresh_district_rollup(ids);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Tables keyed by district_id: schools, mandals
+CREATE OR REPLACE FUNCTION si_rollup_district_rows_changed()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    ids INT[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(DISTINCT COALESCE(district_id, 0)) INTO ids FROM new_rows;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(DISTINCT COALESCE(district_id, 0)) INTO ids FROM old_rows;
+    ELSE
+        SELECT array_agg(DISTINCT COALESCE(r.district_id, 0)) INTO ids
+        FROM new_rows n
+        JOIN old_rows o ON o.id = n.id
+        CROSS JOIN LATERAL (VALUES (n.district_id), (o.district_id)) AS r(district_id)
+        WHERE EXISTS (SELECT 1 FROM unnest(TG_ARGV) AS c(col)
+                       WHERE to_jsonb(n) -> c.col IS DISTINCT FROM to_jsonb(o) -> c.col);
+    END IF;
+    IF ids IS NOT NULL THEN
+        PERFORM si_refresh_district_rollup(ids);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- si_districts itself
+CREATE OR REPLACE FUNCTION si_rollup_districts_changed()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    ids INT[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(id) INTO ids FROM new_rows;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(id) INTO ids FROM old_rows;
+    ELSE
+        SELECT array_agg(n.id) INTO ids
+        FROM new_rows n
+        JOIN old_rows o ON o.id = n.id
+        WHERE EXISTS (SELECT 1 FROM unnest(TG_ARGV) AS c(col)
+                       WHERE to_jsonb(n) -> c.col IS DISTINCT FROM to_jsonb(o) -> c.col);
+    END IF;
+    IF ids IS NOT NULL THEN
+        PERFORM si_refresh_district_rollup(ids);
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+-- Priority watermark: stamp updated_at when a row changes (or, given column
+-- arguments, when one of those columns changes) so the backend re-scores only
+-- the schools written since its last pass
+CREATE OR REPLACE FUNCTION si_touch_updated_at()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_NARGS = 0 OR EXISTS (SELECT 1 FROM unnest(TG_ARGV) AS c(col)
+                                WHERE to_jsonb(NEW) -> c.col IS DISTINCT FROM to_jsonb(OLD) -> c.col) THEN
+        NEW.updated_at := now();
+    END IF;
+    RETURN NEW;
+END;
+$$;
+
+-- =============================================================================
+-- TRIGGERS
+-- =============================================================================
+-- Refresh the state rollup for the districts touched by each statement. Update
+-- triggers pass the columns the rollup depends on, so e.g. validation status
+-- write-backs do not refresh anything.
+
+DROP TRIGGER IF EXISTS si_rollup_demand_ins ON si_demand_plans;
+DROP TRIGGER IF EXISTS si_rollup_demand_upd ON si_demand_plans;
+DROP TRIGGER IF EXISTS si_rollup_demand_del ON si_demand_plans;
+CREATE TRIGGER si_rollup_demand_ins AFTER INSERT ON si_demand_plans
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_school_rows_changed();
+CREATE TRIGGER si_rollup_demand_upd AFTER UPDATE ON si_demand_plans
+    REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_school_rows_changed('school_id', 'infra_type', 'physical_count', 'financial_amount');
+CREATE TRIGGER si_rollup_demand_del AFTER DELETE ON si_demand_plans
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_school_rows_changed();
+
+DROP TRIGGER IF EXISTS si_rollup_enrolment_ins ON si_enrolment_history;
+DROP TRIGGER IF EXISTS si_rollup_enrolment_upd ON si_enrolment_history;
+DROP TRIGGER IF EXISTS si_rollup_enrolment_del ON si_enrolment_history;
+CREATE TRIGGER si_rollup_enrolment_ins AFTER INSERT ON si_enrolment_history
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_school_rows_changed();
+CREATE TRIGGER si_rollup_enrolment_upd AFTER UPDATE ON si_enrolment_history
+    REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_school_rows_changed('school_id', 'academic_year', 'total');
+CREATE TRIGGER si_rollup_enrolment_del AFTER DELETE ON si_enrolment_history
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_school_rows_changed();
+
+DROP TRIGGER IF EXISTS si_rollup_priority_ins ON si_school_priority_scores;
+DROP TRIGGER IF EXISTS si_rollup_priority_upd ON si_school_priority_scores;
+DROP TRIGGER IF EXISTS si_rollup_priority_del ON si_school_priority_scores;
+CREATE TRIGGER si_rollup_priority_ins AFTER INSERT ON si_school_priority_scores
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_school_rows_changed();
+CREATE TRIGGER si_rollup_priority_upd AFTER UPDATE ON si_school_priority_scores
+    REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_school_rows_changed('school_id', 'score_year', 'priority_level');
+CREATE TRIGGER si_rollup_priority_del AFTER DELETE ON si_school_priority_scores
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_school_rows_changed();
+
+DROP TRIGGER IF EXISTS si_rollup_schools_ins ON si_schools;
+DROP TRIGGER IF EXISTS si_rollup_schools_upd ON si_schools;
+DROP TRIGGER IF EXISTS si_rollup_schools_del ON si_schools;
+CREATE TRIGGER si_rollup_schools_ins AFTER INSERT ON si_schools
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_district_rows_changed();
+CREATE TRIGGER si_rollup_schools_upd AFTER UPDATE ON si_schools
+    REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_district_rows_changed('district_id');
+CREATE TRIGGER si_rollup_schools_del AFTER DELETE ON si_schools
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_district_rows_changed();
+
+DROP TRIGGER IF EXISTS si_rollup_mandals_ins ON si_mandals;
+DROP TRIGGER IF EXISTS si_rollup_mandals_upd ON si_mandals;
+DROP TRIGGER IF EXISTS si_rollup_mandals_del ON si_mandals;
+CREATE TRIGGER si_rollup_mandals_ins AFTER INSERT ON si_mandals
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_district_rows_changed();
+CREATE TRIGGER si_rollup_mandals_upd AFTER UPDATE ON si_mandals
+    REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_district_rows_changed('district_id');
+CREATE TRIGGER si_rollup_mandals_del AFTER DELETE ON si_mandals
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_district_rows_changed();
+
+DROP TRIGGER IF EXISTS si_rollup_districts_ins ON si_districts;
+DROP TRIGGER IF EXISTS si_rollup_districts_upd ON si_districts;
+DROP TRIGGER IF EXISTS si_rollup_districts_del ON si_districts;
+CREATE TRIGGER si_rollup_districts_ins AFTER INSERT ON si_districts
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_districts_changed();
+CREATE TRIGGER si_rollup_districts_upd AFTER UPDATE ON si_districts
+    REFERENCING NEW TABLE AS new_rows OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_districts_changed('district_name');
+CREATE TRIGGER si_rollup_districts_del AFTER DELETE ON si_districts
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION si_rollup_districts_changed();
+
+-- Keep updated_at current for incremental priority scoring. Demand plans are
+-- only touched by the plan's own columns, so validation and officer review
+-- write-backs (stamped in validated_at / officer_reviewed_at) do not dirty
+-- every school.
+
+DROP TRIGGER IF EXISTS si_touch_schools ON si_schools;
+CREATE TRIGGER si_touch_schools BEFORE UPDATE ON si_schools
+    FOR EACH ROW WHEN (OLD.* IS DISTINCT FROM NEW.*)
+    EXECUTE FUNCTION si_touch_updated_at();
+
+DROP TRIGGER IF EXISTS si_touch_enrolment ON si_enrolment_history;
+CREATE TRIGGER si_touch_enrolment BEFORE UPDATE ON si_enrolment_history
+    FOR EACH ROW WHEN (OLD.* IS DISTINCT FROM NEW.*)
+    EXECUTE FUNCTION si_touch_updated_at();
+
+DROP TRIGGER IF EXISTS si_touch_demand ON si_demand_plans;
+CREATE TRIGGER si_touch_demand BEFORE UPDATE ON si_demand_plans
+    FOR EACH ROW
+    EXECUTE FUNCTION si_touch_updated_at('school_id', 'plan_year', 'infra_type', 'physical_count', 'financial_amount');
+
+DROP TRIGGER IF EXISTS si_touch_assessments ON si_infra_assessments;
+CREATE TRIGGER si_touch_assessments BEFORE UPDATE ON si_infra_assessments
+    FOR EACH ROW WHEN (OLD.* IS DISTINCT FROM NEW.*)
+    EXECUTE FUNCTION si_touch_updated_at();
+
+-- Rebuild the rollup from existing data (no-op cost on a fresh database)
+SELECT si_refresh_state_rollup();
+
 -- =============================================================================
 -- RLS POLICIES
 -- =============================================================================
@@ -338,6 +804,8 @@ ALTER TABLE si_enrolment_history ENABLE ROW LEVEL SECURITY;
 ALTER TABLE si_demand_plans ENABLE ROW LEVEL SECURITY;
 ALTER TABLE si_infra_assessments ENABLE ROW LEVEL SECURITY;
 ALTER TABLE si_school_priority_scores ENABLE ROW LEVEL SECURITY;
+ALTER TABLE si_district_rollup ENABLE ROW LEVEL SECURITY;
+ALTER TABLE si_district_infra_rollup ENABLE ROW LEVEL SECURITY;
 
 -- Allow anon read access for demo mode
 DROP POLICY IF EXISTS "anon_read_schools" ON si_schools;
@@ -355,6 +823,13 @@ CREATE POLICY "anon_read_assessments" ON si_infra_assessments FOR SELECT USING (
 DROP POLICY IF EXISTS "anon_read_priority" ON si_school_priority_scores;
 CREATE POLICY "anon_read_priority" ON si_school_priority_scores FOR SELECT USING (true);
 
+-- Rollups are read-only to clients; only the (owner-run) refresh functions write them
+DROP POLICY IF EXISTS "anon_read_district_rollup" ON si_district_rollup;
+CREATE POLICY "anon_read_district_rollup" ON si_district_rollup FOR SELECT USING (true);
+
+DROP POLICY IF EXISTS "anon_read_district_infra_rollup" ON si_district_infra_rollup;
+CREATE POLICY "anon_read_district_infra_rollup" ON si_district_infra_rollup FOR SELECT USING (true);
+
 -- Allow authenticated users to insert/update
 DROP POLICY IF EXISTS "auth_write_demands" ON si_demand_plans;
 CREATE POLICY "auth_write_demands" ON si_demand_plans FOR ALL USING (true);
@@ -2,20 +2,48 @@
 Seed script: Parse Excel datasets and insert into Supabase.
 
 Usage:
-    pip install openpyxl pandas supabase
+    pip install openpyxl supabase pyarrow   # pyarrow optional (sheet cache)
     export SUPABASE_SERVICE_KEY='your-service-role-key'
+    export BACKEND_URL='http://localhost:8000'   # optional: refresh backend cache
     python seed_data.py
 
 Expects these Excel files in ../Reference / folder:
   - "Sample Demand Plan Data for 2025.xlsx"
   - "School Enrolment for Sample Data.xlsx"
+
+Workbooks are streamed in chunks of SEED_CHUNK_ROWS rows (openpyxl read-only
+mode, so memory stays flat for full-state UDISE exports). Each chunk is
+converted to column lists and written with multi-row requests of up to
+SEED_BATCH_SIZE rows; every phase reports its rows per second.
+
+With pyarrow installed, each parsed sheet is also written to an Arrow IPC
+file in SEED_CACHE_DIR, keyed by the workbook's hash; re-runs on an unchanged
+workbook memory-map that file instead of parsing the Excel file again.
 """
 
+import glob
+import hashlib
+import json
+import math
 import os
+import random
 import sys
-import pandas as pd
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import openpyxl
+from postgrest import APIError, ReturnMethod
 from supabase import create_client, Client
 
+try:  # optional: columnar cache of parsed workbooks
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
 # ---------------------------------------------------------------------------
 # Configuration
 # ---------------------------------------------------------------------------
@@ -29,8 +57,33 @@ if not SUPABASE_KEY:
 
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
+# Optional: running backend (e.g. http://localhost:8000) whose enrolment and
+# analytics caches should be dropped once new data has been seeded
+BACKEND_URL = os.environ.get("BACKEND_URL", "").rstrip("/")
+
+# Sheet rows read and processed at a time
+SEED_CHUNK_ROWS = int(os.environ.get("SEED_CHUNK_ROWS", "5000"))
+
+# Rows per multi-row insert / upsert request
+SEED_BATCH_SIZE = int(os.environ.get("SEED_BATCH_SIZE", "1000"))
+
+# Worker threads writing district partitions concurrently (1 = sequential),
+# and the most batches queued or in flight at once
+SEED_WORKERS = int(os.environ.get("SEED_WORKERS", "4"))
+SEED_MAX_IN_FLIGHT = int(os.environ.get("SEED_MAX_IN_FLIGHT", str(2 * SEED_WORKERS)))
+
+# Retries of a batch that failed with a transient error, with exponential
+# backoff (seconds before the first retry, doubling each time, plus jitter)
+SEED_RETRIES = int(os.environ.get("SEED_RETRIES", "3"))
+SEED_RETRY_BACKOFF = float(os.environ.get("SEED_RETRY_BACKOFF", "0.5"))
+
 # Paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Parsed workbooks are cached here as Arrow IPC files (needs pyarrow; set
+# SEED_CACHE=0 to always parse the Excel files)
+SEED_CACHE = os.environ.get("SEED_CACHE", "1") != "0"
+SEED_CACHE_DIR = os.environ.get("SEED_CACHE_DIR", os.path.join(BASE_DIR, ".seed_cache"))
 PARENT_DIR = os.path.dirname(os.path.dirname(BASE_DIR))
 REF_DIR = os.path.join(PARENT_DIR, "Reference ")  # Note: trailing space in folder name
 
@@ -83,14 +136,42 @@ ENROLMENT_GRADES = {
     "C12": ("C12B", "C12G", "C12T"),
 }
 
+ENROLMENT_CONFLICT_KEY = ("school_id", "academic_year", "grade")
+
+# HTTP statuses and Postgres SQLSTATEs of failures that may succeed on retry:
+# rate limiting / gateway errors, serialization failure, deadlock, too many
+# connections, lock not available, statement timeout, connection failures
+TRANSIENT_ERROR_CODES = {
+    "429", "500", "502", "503", "504",
+    "40001", "40P01", "53300", "55P03", "57014", "08000", "08003", "08006",
+}
+
+# Transient failures that may arrive after the write committed: a gateway 5xx,
+# or a timeout / dropped connection once the request was sent. Upserts are
+# retried through them; plain inserts are not, as a retry would duplicate rows.
+AMBIGUOUS_ERROR_CODES = {"500", "502", "504"}
+
+# Cell texts that mean "no value" (pandas' default NA markers, e.g. Excel's #N/A)
+NA_STRINGS = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+}
+
 
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
 
+def is_missing(val):
+    """True for empty cells (None, NaN or an NA marker such as #N/A)."""
+    if isinstance(val, str):
+        return val in NA_STRINGS
+    return val is None or (isinstance(val, float) and math.isnan(val))
+
+
 def safe_int(val, default=0):
     """Safely convert a value to int."""
-    if pd.isna(val):
+    if is_missing(val):
         return default
     try:
         return int(float(val))
@@ -100,7 +181,7 @@ def safe_int(val, default=0):
 
 def safe_float(val, default=0.0):
     """Safely convert a value to float."""
-    if pd.isna(val):
+    if is_missing(val):
         return default
     try:
         return float(val)
@@ -110,7 +191,7 @@ def safe_float(val, default=0.0):
 
 def safe_str(val, default=""):
     """Safely convert to stripped string."""
-    if pd.isna(val):
+    if is_missing(val):
         return default
     return str(val).strip()
 
@@ -129,6 +210,359 @@ def extract_name(val):
     return parts[0].strip()
 
 
+class SheetChunk:
+    """A run of consecutive sheet rows, stored column by column."""
+
+    def __init__(self, header, rows):
+        self.header = header
+        self.n_rows = len(rows)
+        self.columns = [list(col) for col in zip(*rows)] if rows else [[] for _ in header]
+        self._index = {}
+        for i, name in enumerate(header):
+            self._index.setdefault(name, i)
+
+    @classmethod
+    def from_columns(cls, header, columns):
+        chunk = cls(header, [])
+        chunk.columns = columns
+        chunk.n_rows = len(columns[0]) if columns else 0
+        return chunk
+
+    def column(self, *names):
+        """Values of the first of ``names`` present in the header (all None if none is)."""
+        for name in names:
+            if name in self._index:
+                return self.columns[self._index[name]]
+        return [None] * self.n_rows
+
+    def at(self, index):
+        """Values of the column at ``index`` (all None past the last column)."""
+        return self.columns[index] if index < len(self.columns) else [None] * self.n_rows
+
+
+def read_sheet_chunks(path, skip_rows=0, chunk_rows=None):
+    """Stream the first sheet of a workbook as SheetChunks.
+
+    Row 1 is the header; ``skip_rows`` data rows after it are dropped (e.g. a
+    sub-header). Fully empty rows are skipped.
+
+    With pyarrow installed, the parsed sheet is cached in SEED_CACHE_DIR,
+    keyed by the workbook's SHA-256; later runs memory-map the cache instead
+    of parsing the Excel file.
+    """
+    chunk_rows = chunk_rows or SEED_CHUNK_ROWS
+    if pa is None or not SEED_CACHE:
+        yield from _parse_sheet_chunks(path, skip_rows, chunk_rows)
+        return
+
+    cache_path = sheet_cache_path(path, skip_rows)
+    if os.path.exists(cache_path):
+        print(f"  Reading cached sheet {os.path.basename(cache_path)}")
+        yield from _read_cached_chunks(cache_path, chunk_rows)
+    else:
+        yield from _parse_and_cache_chunks(path, skip_rows, chunk_rows, cache_path)
+
+
+def _parse_sheet_chunks(path, skip_rows, chunk_rows):
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, ())
+        width = len(header)
+        header = [safe_str(h) or f"Unnamed: {i}" for i, h in enumerate(header)]
+
+        chunk = []
+        for n, row in enumerate(rows):
+            if n < skip_rows or all(is_missing(v) for v in row):
+                continue
+            chunk.append(row[:width] + (None,) * (width - len(row)))
+            if len(chunk) == chunk_rows:
+                yield SheetChunk(header, chunk)
+                chunk = []
+        if chunk:
+            yield SheetChunk(header, chunk)
+    finally:
+        wb.close()
+
+
+# ---------------------------------------------------------------------------
+# Columnar sheet cache
+# ---------------------------------------------------------------------------
+
+# Bump when the cached layout or cell normalization changes
+SHEET_CACHE_VERSION = 1
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def sheet_cache_path(path, skip_rows=0):
+    """Cache file of a workbook's first sheet: <name>-<skip rows>-<sha256 prefix>.arrow."""
+    stem = os.path.splitext(os.path.basename(path))[0].replace(" ", "_")
+    key = f"{file_sha256(path)}:{skip_rows}:{SHEET_CACHE_VERSION}"
+    return os.path.join(SEED_CACHE_DIR, f"{stem}-{skip_rows}-{hashlib.sha256(key.encode()).hexdigest()[:16]}.arrow")
+
+
+def _cache_value(v):
+    """A cell as cached: missing cells (None, NaN, NA markers) become None and
+    numbers stored as text become numbers when they read back identically, so
+    the seeder's safe_* helpers give the same results either way."""
+    if is_missing(v):
+        return None
+    if isinstance(v, str):
+        for number in (int, float):
+            try:
+                parsed = number(v)
+            except ValueError:
+                continue
+            if str(parsed) == v and abs(parsed) < 2 ** 53:
+                return parsed
+    return v
+
+
+def _column_kind(values):
+    """Narrowest cache type of normalized values: "null", "int", "float" or "string"."""
+    kind = "null"
+    for v in values:
+        if v is None:
+            continue
+        if isinstance(v, int) and not isinstance(v, bool):
+            kind = "int" if kind in ("null", "int") else kind
+        elif isinstance(v, float):
+            kind = "float" if kind != "string" else kind
+        else:
+            return "string"
+    return kind
+
+
+_KIND_ORDER = {"null": 0, "int": 1, "float": 2, "string": 3}
+_ARROW_TYPES = {"null": "string", "int": "int64", "float": "float64", "string": "string"}
+
+
+def _arrow_column(values, kind):
+    if kind == "string":
+        values = [None if v is None else str(v) for v in values]
+    elif kind == "float":
+        values = [None if v is None else float(v) for v in values]
+    return pa.array(values, type=getattr(pa, _ARROW_TYPES[kind])())
+
+
+def _parse_and_cache_chunks(path, skip_rows, chunk_rows, cache_path):
+    """Parse the workbook, yielding its chunks while writing them to the cache.
+
+    Column types are only known once every row has been seen, so chunks are
+    spilled to a temporary Arrow stream with their own types and rewritten
+    with the widest type of each column (int < float < string) at the end.
+    """
+    os.makedirs(SEED_CACHE_DIR, exist_ok=True)
+    spill_path = f"{cache_path}.{os.getpid()}.spill"
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    header, kinds, spilled = None, None, []
+    try:
+        with pa.OSFile(spill_path, "wb") as spill:
+            for chunk in _parse_sheet_chunks(path, skip_rows, chunk_rows):
+                if header is None:
+                    header, kinds = chunk.header, ["null"] * len(chunk.header)
+                columns = [[_cache_value(v) for v in col] for col in chunk.columns]
+                chunk_kinds = [_column_kind(col) for col in columns]
+                kinds = [max(k, c, key=_KIND_ORDER.get) for k, c in zip(kinds, chunk_kinds)]
+                batch = pa.record_batch(
+                    [_arrow_column(col, k) for col, k in zip(columns, chunk_kinds)],
+                    names=[f"{i}" for i in range(len(header))],
+                )
+                start = spill.tell()
+                with pa.ipc.new_stream(spill, batch.schema) as writer:
+                    writer.write_batch(batch)
+                spilled.append((start, spill.tell() - start, chunk_kinds))
+                yield chunk
+
+        if header is None:
+            return
+        schema = pa.schema([pa.field(name, getattr(pa, _ARROW_TYPES[k])()) for name, k in zip(header, kinds)])
+        with pa.memory_map(spill_path) as spill, pa.OSFile(tmp_path, "wb") as out:
+            data = spill.read_buffer()
+            with pa.ipc.new_file(out, schema) as writer:
+                for start, size, chunk_kinds in spilled:
+                    batch = pa.ipc.open_stream(data.slice(start, size)).read_next_batch()
+                    writer.write_batch(pa.record_batch([
+                        col if ck == k else _arrow_column(col.to_pylist(), k)
+                        for col, ck, k in zip(batch.columns, chunk_kinds, kinds)
+                    ], schema=schema))
+        os.replace(tmp_path, cache_path)
+        _prune_sheet_cache(cache_path)
+        print(f"  Cached sheet as {os.path.basename(cache_path)}")
+    finally:
+        for leftover in (spill_path, tmp_path):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+
+def _prune_sheet_cache(cache_path):
+    """Remove caches of earlier versions of the same workbook."""
+    prefix = cache_path.rsplit("-", 1)[0]
+    for stale in glob.glob(glob.escape(prefix) + "-*.arrow"):
+        if stale != cache_path:
+            os.remove(stale)
+
+
+def _read_cached_chunks(cache_path, chunk_rows):
+    with pa.memory_map(cache_path) as source:
+        table = pa.ipc.open_file(source).read_all()
+        for start in range(0, table.num_rows, chunk_rows):
+            part = table.slice(start, chunk_rows)
+            yield SheetChunk.from_columns(table.column_names, [col.to_pylist() for col in part.columns])
+
+
+class PhaseStats:
+    """Row counts and throughput of one seeding phase."""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows_read = 0
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.rows_uncertain = 0  # in batches that failed ambiguously and were not retried
+        self.started = time.perf_counter()
+        self.finished = None
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    def report(self):
+        elapsed = max(self.elapsed, 1e-9)
+        print(f"  {self.name}: {self.rows_read:,} sheet rows -> {self.rows_written:,} rows written"
+              f" ({self.rows_failed:,} failed, {self.rows_uncertain:,} uncertain) in {elapsed:.1f}s"
+              f" [{self.rows_read / elapsed:,.0f} sheet rows/s, {self.rows_written / elapsed:,.0f} rows written/s]")
+
+
+def is_transient(error):
+    """True for failures worth retrying: network errors, timeouts, overload, lock conflicts."""
+    if isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, APIError):
+        return str(error.code) in TRANSIENT_ERROR_CODES
+    return False
+
+
+def is_unapplied(error):
+    """True for transient failures after which the write certainly did not happen.
+
+    The request never left (connect / pool timeouts), was refused (429, 503),
+    or Postgres rolled the statement back (a SQLSTATE).
+    """
+    if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+        return True
+    if isinstance(error, APIError):
+        code = str(error.code)
+        return code in TRANSIENT_ERROR_CODES and code not in AMBIGUOUS_ERROR_CODES
+    return False
+
+
+class PartitionWriter:
+    """Writes a table's rows partitioned by district, on a bounded pool of workers.
+
+    Each partition is pinned to one of SEED_WORKERS worker threads, so its
+    batches are written in order (a later upsert of the same key still wins)
+    while different districts are written concurrently. At most
+    SEED_MAX_IN_FLIGHT batches are queued or running; the reader blocks
+    beyond that instead of buffering the workbook in memory.
+
+    Upserts are retried on any transient error. A plain insert is retried
+    only when the failure shows it was not applied; after an ambiguous one
+    its rows are counted as uncertain rather than risk writing them twice.
+    """
+
+    def __init__(self, table, stats, on_conflict=None):
+        self.table = table
+        self.stats = stats
+        self.on_conflict = on_conflict
+        self.partitions = {}  # partition -> {"rows", "failed", "uncertain", "batches", "retries", "seconds"}
+        self._workers = [ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"seed-{n}")
+                         for n in range(max(SEED_WORKERS, 1))]
+        self._slots = threading.BoundedSemaphore(max(SEED_MAX_IN_FLIGHT, 1))
+        self._lock = threading.Lock()
+
+    def write(self, rows_by_partition):
+        """Queue multi-row inserts (or upserts on ``on_conflict``) of SEED_BATCH_SIZE rows.
+
+        Upsert rows are de-duplicated on the conflict key first, keeping the
+        last: Postgres rejects a statement that updates the same row twice.
+        """
+        for partition, rows in rows_by_partition.items():
+            if self.on_conflict:
+                key = self.on_conflict.split(",")
+                rows = list({tuple(r[k] for k in key): r for r in rows}.values())
+            for i in range(0, len(rows), SEED_BATCH_SIZE):
+                self._slots.acquire()
+                worker = self._workers[partition % len(self._workers)]
+                future = worker.submit(self._write_batch, partition, rows[i:i + SEED_BATCH_SIZE])
+                future.add_done_callback(lambda _: self._slots.release())
+
+    def close(self):
+        """Wait for every queued batch."""
+        for worker in self._workers:
+            worker.shutdown(wait=True)
+
+    def report(self, partition_names):
+        print(f"  Per-district summary ({self.table}):")
+        print(f"    {'district':<30} {'rows':>9} {'failed':>7} {'uncertain':>9} {'batches':>8}"
+              f" {'retries':>8} {'seconds':>8}")
+        for partition, p in sorted(self.partitions.items(), key=lambda item: -item[1]["rows"]):
+            name = partition_names.get(partition, "(no district)")
+            print(f"    {name[:30]:<30} {p['rows']:>9,} {p['failed']:>7,} {p['uncertain']:>9,} {p['batches']:>8,}"
+                  f" {p['retries']:>8,} {p['seconds']:>8.1f}")
+
+    def _write_batch(self, partition, batch):
+        started = time.perf_counter()
+        retries = failed = uncertain = 0
+        while True:
+            query = supabase.table(self.table)
+            if self.on_conflict:
+                query = query.upsert(batch, on_conflict=self.on_conflict, returning=ReturnMethod.minimal)
+            else:
+                query = query.insert(batch, returning=ReturnMethod.minimal)
+            try:
+                query.execute()
+                break
+            except Exception as e:
+                if is_transient(e) and not self.on_conflict and not is_unapplied(e):
+                    uncertain = len(batch)
+                    print(f"    Warning: {self.table} batch of {len(batch)} rows not retried, it may"
+                          f" have been written before the error (check for duplicates): {e}")
+                    break
+                if retries < SEED_RETRIES and is_transient(e):
+                    retries += 1
+                    time.sleep(SEED_RETRY_BACKOFF * 2 ** (retries - 1) * (1 + random.random()))
+                    continue
+                failed = len(batch)
+                print(f"    Warning: {self.table} batch of {len(batch)} rows failed"
+                      f" after {retries} retries: {e}")
+                break
+
+        with self._lock:
+            p = self.partitions.setdefault(
+                partition, {"rows": 0, "failed": 0, "uncertain": 0, "batches": 0, "retries": 0, "seconds": 0.0}
+            )
+            p["rows"] += len(batch) - failed - uncertain
+            p["failed"] += failed
+            p["uncertain"] += uncertain
+            p["batches"] += 1
+            p["retries"] += retries
+            p["seconds"] += time.perf_counter() - started
+            self.stats.rows_written += len(batch) - failed - uncertain
+            self.stats.rows_failed += failed
+            self.stats.rows_uncertain += uncertain
+
+
 # ---------------------------------------------------------------------------
 # Seed functions
 # ---------------------------------------------------------------------------
@@ -145,247 +579,270 @@ def seed_state():
     return result.data[0]["id"]
 
 
-def seed_districts_and_mandals(state_id, demand_df, enrolment_df):
-    """Extract and seed unique districts and mandals from both files."""
-    district_cache = {}  # name -> id
-    mandal_cache = {}    # (district_name, mandal_name) -> id
+class Dimensions:
+    """Districts, mandals and schools in the database, keyed as in the workbooks."""
 
-    # --- From Demand Plan: "District Name" and "Mandal" columns ---
-    districts_demand = demand_df["District Name"].dropna().unique()
-    for d_raw in districts_demand:
-        d_name = safe_str(d_raw)
-        if not d_name or d_name in district_cache:
-            continue
-        result = supabase.table("si_districts").select("id").eq("district_name", d_name).eq("state_id", state_id).execute()
-        if result.data:
-            district_cache[d_name] = result.data[0]["id"]
-        else:
-            result = supabase.table("si_districts").insert({
-                "state_id": state_id,
-                "district_name": d_name,
-            }).execute()
-            district_cache[d_name] = result.data[0]["id"]
-        print(f"  District (demand): {d_name} -> ID {district_cache[d_name]}")
-
-    # Mandals from demand plan
-    if "Mandal" in demand_df.columns:
-        for _, row in demand_df[["District Name", "Mandal"]].drop_duplicates().iterrows():
-            d_name = safe_str(row["District Name"])
-            m_name = safe_str(row["Mandal"])
-            if not d_name or not m_name or d_name not in district_cache:
-                continue
-            key = (d_name, m_name)
-            if key in mandal_cache:
-                continue
-            district_id = district_cache[d_name]
-            result = supabase.table("si_mandals").select("id").eq("mandal_name", m_name).eq("district_id", district_id).execute()
-            if result.data:
-                mandal_cache[key] = result.data[0]["id"]
-            else:
-                result = supabase.table("si_mandals").insert({
-                    "district_id": district_id,
-                    "mandal_name": m_name,
-                }).execute()
-                mandal_cache[key] = result.data[0]["id"]
-
-    # --- From Enrolment: "district_name & code" and "block_name & code" ---
-    if "district_name & code" in enrolment_df.columns:
-        for d_raw in enrolment_df["district_name & code"].dropna().unique():
-            d_name = extract_name(d_raw)
-            if not d_name or d_name in district_cache:
-                continue
-            result = supabase.table("si_districts").select("id").eq("district_name", d_name).eq("state_id", state_id).execute()
-            if result.data:
-                district_cache[d_name] = result.data[0]["id"]
-            else:
-                result = supabase.table("si_districts").insert({
-                    "state_id": state_id,
-                    "district_name": d_name,
-                }).execute()
-                district_cache[d_name] = result.data[0]["id"]
-            print(f"  District (enrolment): {d_name} -> ID {district_cache[d_name]}")
-
-    if "block_name & code" in enrolment_df.columns and "district_name & code" in enrolment_df.columns:
-        for _, row in enrolment_df[["district_name & code", "block_name & code"]].drop_duplicates().iterrows():
-            d_name = extract_name(row["district_name & code"])
-            m_name = extract_name(row["block_name & code"])
-            if not d_name or not m_name or d_name not in district_cache:
-                continue
-            key = (d_name, m_name)
-            if key in mandal_cache:
-                continue
-            district_id = district_cache[d_name]
-            result = supabase.table("si_mandals").select("id").eq("mandal_name", m_name).eq("district_id", district_id).execute()
-            if result.data:
-                mandal_cache[key] = result.data[0]["id"]
-            else:
-                result = supabase.table("si_mandals").insert({
-                    "district_id": district_id,
-                    "mandal_name": m_name,
-                }).execute()
-                mandal_cache[key] = result.data[0]["id"]
+    def __init__(self, state_id):
+        self.state_id = state_id
+        self.districts = {}  # district_name -> id
+        self.mandals = {}    # (district_name, mandal_name) -> id
+        self.schools = {}    # udise_code -> id
+        self.school_districts = {}  # school id -> district id (None if unknown)
+        self.added = {"districts": 0, "mandals": 0, "schools": 0}
 
-    print(f"  Total districts: {len(district_cache)}, mandals: {len(mandal_cache)}")
-    return district_cache, mandal_cache
+    def partition(self, school_id):
+        """Write partition of a school's rows: its district id, 0 if it has none."""
+        return self.school_districts.get(school_id) or 0
 
+    def district_names(self):
+        return {district_id: name for name, district_id in self.districts.items()}
 
-def seed_demand_plans(demand_df, district_cache, mandal_cache):
-    """Parse demand plan Excel and seed schools + demand plans.
 
-    The demand plan Excel has a sub-header row at index 0 with Physical/Financial labels.
-    Real data starts at index 1.
-    """
-    print("\n--- Seeding Schools & Demand Plans ---")
+def fetch_all(build_query, page_size=1000):
+    """Every row of a query, paging past the PostgREST row cap.
 
-    # Skip the sub-header row (row 0 has "Physical"/"Financial" labels)
-    df = demand_df.iloc[1:].reset_index(drop=True)
-    col_names = list(demand_df.columns)
-    print(f"  Data rows: {len(df)}, Columns: {len(col_names)}")
+    ``build_query`` must return a fresh, deterministically ordered builder.
+    """
+    rows = []
+    while True:
+        page = build_query().range(len(rows), len(rows) + page_size - 1).execute().data or []
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+
+
+def insert_returning(table, rows):
+    """Multi-row insert in SEED_BATCH_SIZE batches; returns the inserted rows (with ids)."""
+    inserted = []
+    for i in range(0, len(rows), SEED_BATCH_SIZE):
+        inserted.extend(supabase.table(table).insert(rows[i:i + SEED_BATCH_SIZE]).execute().data)
+    return inserted
+
+
+def load_dimensions(state_id):
+    """Read the state's existing districts and mandals, and all schools, into hash maps."""
+    dims = Dimensions(state_id)
+    for d in fetch_all(lambda: supabase.table("si_districts").select("id,district_name")
+                       .eq("state_id", state_id).order("id")):
+        dims.districts[d["district_name"]] = d["id"]
+
+    district_names = dims.district_names()
+    for m in fetch_all(lambda: supabase.table("si_mandals").select("id,district_id,mandal_name").order("id")):
+        if m["district_id"] in district_names:
+            dims.mandals[(district_names[m["district_id"]], m["mandal_name"])] = m["id"]
+
+    for s in fetch_all(lambda: supabase.table("si_schools").select("id,udise_code,district_id").order("id")):
+        dims.schools[s["udise_code"]] = s["id"]
+        dims.school_districts[s["id"]] = s["district_id"]
+
+    print(f"  Existing: {len(dims.districts)} districts, {len(dims.mandals)} mandals, {len(dims.schools)} schools")
+    return dims
+
+
+def seed_districts_and_mandals(dims, pairs, source):
+    """Bulk-insert the districts and mandals of (district_name, mandal_name) pairs missing from dims."""
+    new_districts = list(dict.fromkeys(d for d, _ in pairs if d and d not in dims.districts))
+    if new_districts:
+        rows = insert_returning("si_districts", [
+            {"state_id": dims.state_id, "district_name": d} for d in new_districts
+        ])
+        for row in rows:
+            dims.districts[row["district_name"]] = row["id"]
+            print(f"  District ({source}): {row['district_name']} -> ID {row['id']}")
+        dims.added["districts"] += len(rows)
+
+    new_mandals = list(dict.fromkeys((d, m) for d, m in pairs if d and m and (d, m) not in dims.mandals))
+    if new_mandals:
+        rows = insert_returning("si_mandals", [
+            {"district_id": dims.districts[d], "mandal_name": m} for d, m in new_mandals
+        ])
+        district_names = {dims.districts[d]: d for d, _ in new_mandals}
+        for row in rows:
+            dims.mandals[(district_names[row["district_id"]], row["mandal_name"])] = row["id"]
+        dims.added["mandals"] += len(rows)
+
+
+def seed_schools(dims, schools):
+    """Bulk-insert the schools (udise_code -> column values) missing from dims.
+
+    Returns the number of schools inserted.
+    """
+    rows = insert_returning("si_schools", [
+        {"udise_code": udise, **data} for udise, data in schools.items() if udise not in dims.schools
+    ])
+    for row in rows:
+        dims.schools[row["udise_code"]] = row["id"]
+        dims.school_districts[row["id"]] = row["district_id"]
+    dims.added["schools"] += len(rows)
+    return len(rows)
 
-    school_cache = {}  # udise_code -> school_id
 
-    for idx, row in df.iterrows():
-        # School Code is in column "School Code" (may be float like 2.82214e+10)
-        udise = safe_int(row.get("School Code"))
-        if udise == 0:
-            continue
+def seed_demand_plans(dims, path):
+    """Stream the demand plan workbook and seed districts, mandals, schools + demand plans.
 
-        school_name = safe_str(row.get("School Name"), f"School {udise}")
-        district_name = safe_str(row.get("District Name"))
-        mandal_name = safe_str(row.get("Mandal"))
-        management = safe_str(row.get("School Management"))
+    The demand plan Excel has a sub-header row right below the header with
+    Physical/Financial labels; real data starts after it.
+    """
+    print("\n--- Seeding Schools & Demand Plans ---")
+    stats = PhaseStats("Demand plans")
+    writer = PartitionWriter("si_demand_plans", stats)
+    try:
+        _seed_demand_chunks(dims, path, stats, writer)
+    finally:
+        writer.close()
+
+    stats.finish()
+    stats.report()
+    writer.report(dims.district_names())
+    print(f"  Done. Schools added from demand plan: {dims.added['schools']}")
+    return stats
+
+
+def _seed_demand_chunks(dims, path, stats, writer):
+    for chunk in read_sheet_chunks(path, skip_rows=1):
+        udise_codes = [safe_int(v) for v in chunk.column("School Code")]
+        district_names = [safe_str(v) for v in chunk.column("District Name")]
+        mandal_names = [safe_str(v) for v in chunk.column("Mandal")]
+        school_names = chunk.column("School Name")
+        managements = [safe_str(v) for v in chunk.column("School Management")]
         # Note: "School category " has trailing space in Excel
-        category = safe_str(row.get("School category ", row.get("School category", "")))
-        lat = safe_float(row.get("Latitude")) if pd.notna(row.get("Latitude")) else None
-        lon = safe_float(row.get("Longitude")) if pd.notna(row.get("Longitude")) else None
-
-        district_id = district_cache.get(district_name)
-        mandal_key = (district_name, mandal_name)
-        mandal_id = mandal_cache.get(mandal_key)
-
-        # Upsert school
-        if udise not in school_cache:
-            result = supabase.table("si_schools").select("id").eq("udise_code", udise).execute()
-            if result.data:
-                school_cache[udise] = result.data[0]["id"]
-            else:
-                school_data = {
-                    "udise_code": udise,
-                    "school_name": school_name,
-                    "district_id": district_id,
-                    "mandal_id": mandal_id,
-                    "school_management": management or None,
-                    "school_category": category or None,
-                    "latitude": lat,
-                    "longitude": lon,
+        categories = [safe_str(v) for v in chunk.column("School category ", "School category")]
+        latitudes = chunk.column("Latitude")
+        longitudes = chunk.column("Longitude")
+        physical = [[safe_int(v) for v in chunk.at(p)] for p, _, _ in INFRA_COL_PAIRS]
+        financial = [[safe_float(v) for v in chunk.at(f)] for _, f, _ in INFRA_COL_PAIRS]
+
+        seed_districts_and_mandals(dims, list(zip(district_names, mandal_names)), "demand")
+
+        # A school's first row in the chunk describes it
+        schools = {}
+        for i, udise in enumerate(udise_codes):
+            if udise != 0 and udise not in schools:
+                schools[udise] = {
+                    "school_name": safe_str(school_names[i], f"School {udise}"),
+                    "district_id": dims.districts.get(district_names[i]),
+                    "mandal_id": dims.mandals.get((district_names[i], mandal_names[i])),
+                    "school_management": managements[i] or None,
+                    "school_category": categories[i] or None,
+                    "latitude": None if is_missing(latitudes[i]) else safe_float(latitudes[i]),
+                    "longitude": None if is_missing(longitudes[i]) else safe_float(longitudes[i]),
                 }
-                result = supabase.table("si_schools").insert(school_data).execute()
-                school_cache[udise] = result.data[0]["id"]
-
-        school_id = school_cache[udise]
+        seed_schools(dims, schools)
 
-        # Insert demand plans using column index pairs
-        for phys_idx, fin_idx, infra_type in INFRA_COL_PAIRS:
-            if phys_idx >= len(col_names) or fin_idx >= len(col_names):
+        plans = {}
+        for i, udise in enumerate(udise_codes):
+            if udise == 0:
                 continue
-            phys_col = col_names[phys_idx]
-            fin_col = col_names[fin_idx]
-
-            phys_count = safe_int(row.iloc[phys_idx] if phys_idx < len(row) else 0)
-            fin_amount = safe_float(row.iloc[fin_idx] if fin_idx < len(row) else 0)
-
-            if phys_count > 0 or fin_amount > 0:
-                try:
-                    supabase.table("si_demand_plans").insert({
+            for k, (_, _, infra_type) in enumerate(INFRA_COL_PAIRS):
+                if physical[k][i] > 0 or financial[k][i] > 0:
+                    school_id = dims.schools[udise]
+                    plans.setdefault(dims.partition(school_id), []).append({
                         "school_id": school_id,
                         "plan_year": 2025,
                         "infra_type": infra_type,
-                        "physical_count": phys_count,
-                        "financial_amount": fin_amount,
+                        "physical_count": physical[k][i],
+                        "financial_amount": financial[k][i],
                         "validation_status": "PENDING",
-                    }).execute()
-                except Exception as e:
-                    print(f"    Warning: demand plan insert failed for school {udise}, {infra_type}: {e}")
-
-        if (idx + 1) % 50 == 0:
-            print(f"  Processed {idx + 1} schools...")
+                    })
 
-    print(f"  Done. Total schools from demand plan: {len(school_cache)}")
-    return school_cache
+        writer.write(plans)
+        stats.rows_read += chunk.n_rows
+        print(f"  Processed {stats.rows_read:,} demand rows ({stats.rows_read / stats.elapsed:,.0f} rows/s)...")
 
 
-def seed_enrolment(enrolment_df, district_cache, mandal_cache, school_cache):
-    """Parse enrolment Excel and seed enrolment_history.
+def seed_enrolment(dims, path):
+    """Stream the enrolment workbook and seed enrolment_history.
 
     Enrolment data is in semi-long format:
     - One row per school per academic year (956 rows ≈ 319 schools × 3 years)
     - Grade columns are wide: PP3_B, PP3_G, PP3_T, C1B, C1G, C1T, ... C12B, C12G, C12T
     """
     print("\n--- Seeding Enrolment Data ---")
-    df = enrolment_df
-    print(f"  Rows: {len(df)}")
-
-    new_schools = 0
-
-    for idx, row in df.iterrows():
-        udise = safe_int(row.get("UDISE_Code"))
-        if udise == 0:
-            continue
+    stats = PhaseStats("Enrolment")
+    writer = PartitionWriter("si_enrolment_history", stats, on_conflict=",".join(ENROLMENT_CONFLICT_KEY))
+    try:
+        new_schools = _seed_enrolment_chunks(dims, path, stats, writer)
+    finally:
+        writer.close()
 
-        academic_year = safe_str(row.get("Academic_Year"))
-        if not academic_year:
-            continue
+    stats.finish()
+    stats.report()
+    writer.report(dims.district_names())
+    print(f"  Done. New schools from enrolment: {new_schools}")
+    print(f"  Total schools overall: {len(dims.schools)}")
+    return stats
 
-        # Find or create school
-        if udise not in school_cache:
-            result = supabase.table("si_schools").select("id").eq("udise_code", udise).execute()
-            if result.data:
-                school_cache[udise] = result.data[0]["id"]
-            else:
-                school_name = safe_str(row.get("School_Name"), f"School {udise}")
-                d_name = extract_name(row.get("district_name & code", ""))
-                m_name = extract_name(row.get("block_name & code", ""))
-                district_id = district_cache.get(d_name)
-                mandal_id = mandal_cache.get((d_name, m_name))
-
-                result = supabase.table("si_schools").insert({
-                    "udise_code": udise,
-                    "school_name": school_name,
-                    "district_id": district_id,
-                    "mandal_id": mandal_id,
-                }).execute()
-                school_cache[udise] = result.data[0]["id"]
-                new_schools += 1
-
-        school_id = school_cache[udise]
-
-        # Insert enrolment for each grade
-        for grade_label, (boys_col, girls_col, total_col) in ENROLMENT_GRADES.items():
-            boys = safe_int(row.get(boys_col))
-            girls = safe_int(row.get(girls_col))
-            total = safe_int(row.get(total_col))
-            if total == 0:
-                total = boys + girls
-            if total == 0:
-                continue
 
-            try:
-                supabase.table("si_enrolment_history").upsert({
+def _seed_enrolment_chunks(dims, path, stats, writer):
+    new_schools = 0
+    for chunk in read_sheet_chunks(path):
+        udise_codes = [safe_int(v) for v in chunk.column("UDISE_Code")]
+        academic_years = [safe_str(v) for v in chunk.column("Academic_Year")]
+        school_names = chunk.column("School_Name")
+        district_names = [extract_name(v) for v in chunk.column("district_name & code")]
+        mandal_names = [extract_name(v) for v in chunk.column("block_name & code")]
+        grades = [
+            (grade_label,
+             [safe_int(v) for v in chunk.column(boys_col)],
+             [safe_int(v) for v in chunk.column(girls_col)],
+             [safe_int(v) for v in chunk.column(total_col)])
+            for grade_label, (boys_col, girls_col, total_col) in ENROLMENT_GRADES.items()
+        ]
+
+        seed_districts_and_mandals(dims, list(zip(district_names, mandal_names)), "enrolment")
+
+        rows = [i for i, udise in enumerate(udise_codes) if udise != 0 and academic_years[i]]
+        schools = {}
+        for i in rows:
+            schools.setdefault(udise_codes[i], {
+                "school_name": safe_str(school_names[i], f"School {udise_codes[i]}"),
+                "district_id": dims.districts.get(district_names[i]),
+                "mandal_id": dims.mandals.get((district_names[i], mandal_names[i])),
+            })
+        new_schools += seed_schools(dims, schools)
+
+        records = {}
+        for i in rows:
+            school_id = dims.schools[udise_codes[i]]
+            partition = records.setdefault(dims.partition(school_id), [])
+            for grade_label, boys, girls, totals in grades:
+                total = totals[i] or boys[i] + girls[i]
+                if total == 0:
+                    continue
+                partition.append({
                     "school_id": school_id,
-                    "academic_year": academic_year,
+                    "academic_year": academic_years[i],
                     "grade": grade_label,
-                    "boys": boys,
-                    "girls": girls,
+                    "boys": boys[i],
+                    "girls": girls[i],
                     "total": total,
-                }, on_conflict="school_id,academic_year,grade").execute()
-            except Exception as e:
-                print(f"    Warning: enrolment upsert failed for school {udise}, {academic_year}, {grade_label}: {e}")
-
-        if (idx + 1) % 100 == 0:
-            print(f"  Processed {idx + 1} enrolment rows...")
-
-    print(f"  Done. New schools from enrolment: {new_schools}")
-    print(f"  Total schools overall: {len(school_cache)}")
+                })
+
+        writer.write(records)
+        stats.rows_read += chunk.n_rows
+        print(f"  Processed {stats.rows_read:,} enrolment rows ({stats.rows_read / stats.elapsed:,.0f} rows/s)...")
+    return new_schools
+
+
+def invalidate_backend_cache():
+    """Tell a running backend to drop its cached enrolment history and analytics responses."""
+    if not BACKEND_URL:
+        return
+    for path, body, label in (
+        ("/api/forecast/cache/invalidate", {}, "enrolment cache"),
+        ("/api/analytics/cache/invalidate", None, "analytics cache"),
+    ):
+        req = urllib.request.Request(
+            f"{BACKEND_URL}{path}",
+            data=json.dumps(body).encode() if body is not None else b"",
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=10) as resp:
+                print(f"  Backend {label} invalidated: {json.load(resp)}")
+        except Exception as e:
+            print(f"  Warning: could not invalidate backend {label}: {e}")
 
 
 def main():
@@ -393,6 +850,7 @@ def main():
     print(f"  Supabase URL: {SUPABASE_URL}")
     print(f"  Demand file:  {DEMAND_FILE}")
     print(f"  Enrolment file: {ENROLMENT_FILE}")
+    print(f"  Chunk rows: {SEED_CHUNK_ROWS}, batch size: {SEED_BATCH_SIZE}")
 
     if not os.path.exists(DEMAND_FILE):
         print(f"ERROR: Demand plan file not found: {DEMAND_FILE}")
@@ -401,33 +859,33 @@ def main():
         print(f"ERROR: Enrolment file not found: {ENROLMENT_FILE}")
         sys.exit(1)
 
+    started = time.perf_counter()
+
     # Step 1: Seed AP state
     print("\n--- Step 1: Seed State ---")
     state_id = seed_state()
     print(f"  State ID: {state_id}")
 
-    # Step 2: Load both files
-    print("\n--- Step 2: Load Excel Files ---")
-    demand_df = pd.read_excel(DEMAND_FILE)
-    enrolment_df = pd.read_excel(ENROLMENT_FILE)
-    print(f"  Demand plan: {demand_df.shape[0]} rows x {demand_df.shape[1]} cols")
-    print(f"  Enrolment:   {enrolment_df.shape[0]} rows x {enrolment_df.shape[1]} cols")
-
-    # Step 3: Seed districts & mandals from both files
-    print("\n--- Step 3: Seed Districts & Mandals ---")
-    district_cache, mandal_cache = seed_districts_and_mandals(state_id, demand_df, enrolment_df)
+    # Step 2: Existing dimensions, resolved in memory from here on; missing
+    # districts, mandals and schools are bulk-inserted chunk by chunk
+    print("\n--- Step 2: Load Districts, Mandals & Schools ---")
+    dims = load_dimensions(state_id)
 
-    # Step 4: Seed schools + demand plans
-    school_cache = seed_demand_plans(demand_df, district_cache, mandal_cache)
+    # Step 3: Stream the demand plan: districts, mandals, schools + demand plans
+    demand_stats = seed_demand_plans(dims, DEMAND_FILE)
 
-    # Step 5: Seed enrolment history
-    seed_enrolment(enrolment_df, district_cache, mandal_cache, school_cache)
+    # Step 4: Stream enrolment history
+    enrolment_stats = seed_enrolment(dims, ENROLMENT_FILE)
+    invalidate_backend_cache()
 
     # Summary
     print("\n=== Seeding Complete ===")
-    print(f"  Districts: {len(district_cache)}")
-    print(f"  Mandals:   {len(mandal_cache)}")
-    print(f"  Schools:   {len(school_cache)}")
+    print(f"  Districts: {len(dims.districts)} ({dims.added['districts']} new)")
+    print(f"  Mandals:   {len(dims.mandals)} ({dims.added['mandals']} new)")
+    print(f"  Schools:   {len(dims.schools)} ({dims.added['schools']} new)")
+    demand_stats.report()
+    enrolment_stats.report()
+    print(f"  Total time: {time.perf_counter() - started:.1f}s")
 
 
 if __name__ == "__main__":